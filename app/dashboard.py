@@ -7,13 +7,19 @@ import pandas as pd
 import plotly.express as px
 import plotly.graph_objects as go
 from datetime import datetime, timedelta
+import json
 import sys
 from pathlib import Path
 
 sys.path.append(str(Path(__file__).parent.parent))
 
 from integrations.sheets_connector import SheetsConnector
+from integrations.leads_replica import LeadsReplica
 from core.models import Tier
+from core.scoring_engine import scoring_engine
+from core.classifier import archetype_classifier, ARQUETIPOS
+from core.close_model import close_model
+from core.outcome_store import outcome_store, OUTCOME_STAGES
 
 # Configuración de página
 st.set_page_config(
@@ -27,16 +33,36 @@ def check_password():
     """Sin password - acceso directo"""
     return True
 
-def load_data():
-    """Cargar datos desde Google Sheets"""
+REPLICA_SYNC_INTERVAL = timedelta(seconds=60)
+
+@st.cache_resource
+def get_replica() -> LeadsReplica:
+    """Réplica local compartida entre reruns y sesiones"""
+    return LeadsReplica()
+
+def sync_replica(replica: LeadsReplica, force: bool = False):
+    """Traer de Sheets solo las filas nuevas (como mucho una vez por intervalo)"""
+    last_synced = replica.last_synced_at()
+    if not force and last_synced and datetime.now() - last_synced < REPLICA_SYNC_INTERVAL:
+        return
+
     try:
         connector = SheetsConnector()
-        diagnostics = connector.get_all_diagnostics()
-        analytics = connector.get_analytics_summary()
-        return diagnostics, analytics
+        replica.sync(connector.get_rows_since)
+    except Exception as e:
+        st.warning(f"No se pudo sincronizar con Google Sheets, mostrando datos locales: {e}")
+
+def load_data(force_sync: bool = False):
+    """Cargar datos desde la réplica local (sincronizada con Google Sheets)"""
+    try:
+        replica = get_replica()
+        sync_replica(replica, force=force_sync)
+        diagnostics = replica.get_all_diagnostics()
+        analytics = replica.get_analytics_summary()
+        return diagnostics, analytics, replica.last_synced_at()
     except Exception as e:
         st.error(f"Error cargando datos: {e}")
-        return [], {}
+        return [], {}, None
 
 def show_kpi_cards(analytics):
     """Mostrar tarjetas de KPIs principales"""
@@ -96,6 +122,105 @@ def show_score_distribution(df):
 
     st.plotly_chart(fig, use_container_width=True)
 
+def show_reclassification(df):
+    """Re-calcular score y arquetipo de todos los prospectos con las reglas actuales"""
+    st.subheader("🔁 Re-clasificar Todos")
+
+    if not st.button("Re-clasificar todos los prospectos"):
+        return
+
+    responses = get_replica().get_all_responses()
+    if not responses:
+        st.info("No hay respuestas en la réplica local")
+        return
+
+    scores = scoring_engine.score_batch(responses)
+    batch = archetype_classifier.classify_batch(responses, scores)
+
+    recalculado = pd.DataFrame({
+        'diagnostic_id': [str(row.get('diagnostic_id', '')) for row in responses],
+        'score_recalculado': scores.score_final,
+        'tier_recalculado': scores.tier,
+        'arquetipo_recalculado': batch.tipo,
+        'confianza_recalculada': batch.confianza.round(2),
+        'margen_recalculado': batch.margen.round(2)
+    })
+    if close_model is not None:
+        recalculado['prob_cierre_recalculada'] = close_model.predict_batch(responses, scores)
+    recalculado = recalculado.drop_duplicates('diagnostic_id', keep='last')
+
+    actual = df[['diagnostic_id', 'nombre_empresa', 'score_final', 'tier', 'arquetipo_tipo']].copy()
+    actual['diagnostic_id'] = actual['diagnostic_id'].astype(str)
+    comparacion = actual.merge(recalculado, on='diagnostic_id', how='inner')
+
+    cambios = comparacion[
+        (comparacion['arquetipo_tipo'] != comparacion['arquetipo_recalculado']) |
+        (comparacion['tier'] != comparacion['tier_recalculado'])
+    ]
+
+    col1, col2 = st.columns(2)
+    with col1:
+        st.metric("Prospectos re-clasificados", len(comparacion))
+    with col2:
+        st.metric("Cambian de tier o arquetipo", len(cambios))
+
+    if len(cambios) > 0:
+        st.dataframe(cambios, use_container_width=True, height=400)
+
+def lead_labels(df):
+    """diagnostic_id -> "Empresa · fecha" para los selectores (dos empresas pueden llamarse igual)"""
+    return dict(zip(df['diagnostic_id'], df['nombre_empresa'].astype(str) + " · " + df['timestamp'].astype(str)))
+
+def show_outcome_funnel(df):
+    """Embudo real por tier / arquetipo / sector (contadores del outcome store)"""
+    st.subheader("💰 Embudo Real de Conversión")
+
+    dimension = st.radio(
+        "Agrupar por",
+        options=['tier', 'arquetipo', 'sector', 'all'],
+        format_func=lambda d: {'tier': 'Tier', 'arquetipo': 'Arquetipo', 'sector': 'Sector', 'all': 'Total'}[d],
+        horizontal=True
+    )
+
+    funnel = outcome_store.funnel(dimension)
+    if not funnel:
+        st.info("Aún no hay leads registrados en el embudo")
+    else:
+        funnel_df = pd.DataFrame.from_dict(funnel, orient='index')
+        funnel_df['conversion_rate'] = (funnel_df['conversion_rate'] * 100).round(1)
+        funnel_df['win_rate'] = (funnel_df['win_rate'] * 100).round(1)
+        funnel_df = funnel_df[['leads', *OUTCOME_STAGES, 'won_amount', 'conversion_rate', 'win_rate']]
+        funnel_df.columns = [
+            'Leads', 'Contactados', 'Reunión', 'Propuesta', 'Ganados', 'Perdidos',
+            'Monto Ganado', 'Conversión %', 'Win Rate %'
+        ]
+        st.dataframe(funnel_df.sort_index(), use_container_width=True)
+
+    st.markdown("#### Registrar resultado")
+    col1, col2, col3 = st.columns(3)
+    # Se elige por diagnostic_id: empresa y fecha son solo la etiqueta (puede haber homónimos)
+    leads = df.assign(diagnostic_id=df['diagnostic_id'].astype(str)).drop_duplicates('diagnostic_id', keep='last')
+    labels = lead_labels(leads)
+    with col1:
+        diagnostic_id = st.selectbox(
+            "Prospecto",
+            options=list(labels.keys()),
+            format_func=labels.get,
+            key="outcome_diagnostic_id"
+        )
+    with col2:
+        stage = st.selectbox("Etapa", options=list(OUTCOME_STAGES), key="outcome_stage")
+    with col3:
+        monto = st.number_input("Monto del negocio (COP)", min_value=0, step=1000000, key="outcome_monto")
+
+    if st.button("Guardar resultado"):
+        row = leads[leads['diagnostic_id'] == diagnostic_id].iloc[0]
+        # Leads anteriores al registro de outcomes: registrarlos con los datos de scores
+        outcome_store.register(diagnostic_id, str(row['tier']), str(row['arquetipo_tipo']), str(row['sector']))
+        outcome_store.record_outcome(diagnostic_id, stage, monto=float(monto) if monto else None)
+        st.success(f"✅ {row['nombre_empresa']}: {stage}")
+        st.rerun()
+
 def show_tier_a_table(df):
     """Mostrar tabla de prospectos Tier A"""
     st.subheader("🌟 Prospectos Tier A - ACCIÓN INMEDIATA")
@@ -129,13 +254,23 @@ def show_tier_a_table(df):
     )
 
     # Botón para ver detalles
-    selected_empresa = st.selectbox(
+    tier_a = tier_a.assign(diagnostic_id=tier_a['diagnostic_id'].astype(str))
+    labels = lead_labels(tier_a)
+    selected_id = st.selectbox(
         "Ver detalles de:",
-        options=tier_a['nombre_empresa'].tolist()
+        options=list(labels.keys()),
+        format_func=labels.get
     )
 
-    if selected_empresa:
-        show_prospect_detail(tier_a[tier_a['nombre_empresa'] == selected_empresa].iloc[0])
+    if selected_id:
+        show_prospect_detail(tier_a[tier_a['diagnostic_id'] == selected_id].iloc[0])
+
+def parse_ranking(value):
+    """Columna arquetipo_ranking (JSON {tipo: puntaje}) -> lista (tipo, puntaje); vacía en filas antiguas"""
+    try:
+        return list(json.loads(value).items()) if value else []
+    except (TypeError, ValueError, AttributeError):
+        return []
 
 def show_prospect_detail(row):
     """Mostrar detalles completos de un prospecto"""
@@ -197,6 +332,16 @@ def show_prospect_detail(row):
             **Probabilidad de Cierre:** {row['probabilidad_cierre']}%
             """)
 
+            alternativas = [
+                (tipo, puntaje) for tipo, puntaje in parse_ranking(row.get('arquetipo_ranking'))[1:]
+                if puntaje > 0
+            ]
+            if alternativas:
+                st.markdown(f"**Arquetipos alternativos** (margen del ganador: {row.get('arquetipo_margen', 0)})")
+                for tipo, puntaje in alternativas:
+                    nombre = ARQUETIPOS[tipo].nombre if tipo in ARQUETIPOS else tipo
+                    st.markdown(f"- {nombre}: {puntaje:.2f}")
+
             st.markdown("### 📞 Contacto")
             st.markdown(f"""
             - **Email:** {row['contacto_email']}
@@ -210,15 +355,60 @@ def show_prospect_detail(row):
             if row['red_flags_count'] > 0:
                 st.warning(f"⚠️ {row['red_flags_count']} red flags identificados")
 
+        show_reunion_prep(str(row['diagnostic_id']))
+
+def show_reunion_prep(diagnostic_id):
+    """Preparación de reunión: se genera al abrir el lead y queda memorizada en la réplica"""
+    st.markdown("### 🤝 Preparación de Reunión")
+
+    regenerate = st.button("🔄 Regenerar con reglas actuales", key=f"regenerar_prep_{diagnostic_id}")
+    with st.spinner("Preparando reunión..."):
+        prep = get_replica().get_reunion_prep(diagnostic_id, regenerate=regenerate)
+
+    if prep is None:
+        st.info("Las respuestas de este diagnóstico aún no están en la réplica local")
+        return
+
+    st.success(f"💡 {prep.insight_clave}")
+
+    col1, col2 = st.columns(2)
+    with col1:
+        st.markdown("**Preguntas clave**")
+        for pregunta in prep.preguntas_clave:
+            st.markdown(f"- {pregunta}")
+
+        st.markdown("**Investigación previa**")
+        for item in prep.investigacion_previa:
+            st.markdown(f"- {item}")
+
+    with col2:
+        st.markdown("**Objeciones probables**")
+        for objecion, respuesta in prep.objeciones_probables.items():
+            st.markdown(f"- *{objecion}* → {respuesta}")
+
+        st.markdown("**Materiales a llevar**")
+        for item in prep.materiales_llevar:
+            st.markdown(f"- {item}")
+
 def main():
     if not check_password():
         return
 
     st.title("📊 Dashboard AI Readiness - Gestión de Leads")
 
+    col_sync, col_button = st.columns([4, 1])
+    with col_button:
+        force_sync = st.button("🔄 Sincronizar")
+
     # Cargar datos
     with st.spinner("Cargando datos..."):
-        diagnostics, analytics = load_data()
+        diagnostics, analytics, last_synced = load_data(force_sync=force_sync)
+
+    with col_sync:
+        if last_synced:
+            st.caption(f"🕒 Última sincronización con Google Sheets: {last_synced.strftime('%d/%m/%Y %H:%M:%S')}")
+        else:
+            st.caption("🕒 Réplica local aún sin sincronizar")
 
     if not diagnostics:
         st.warning("No hay datos disponibles aún")
@@ -233,11 +423,12 @@ def main():
     st.markdown("---")
 
     # Tabs para diferentes vistas
-    tab1, tab2, tab3, tab4 = st.tabs([
+    tab1, tab2, tab3, tab4, tab5 = st.tabs([
         "🌟 Tier A (Acción Inmediata)",
         "📊 Análisis General",
         "🔍 Todos los Prospectos",
-        "📈 Tendencias"
+        "📈 Tendencias",
+        "💰 Embudo Real"
     ])
 
     with tab1:
@@ -263,6 +454,9 @@ def main():
         )
         st.plotly_chart(fig, use_container_width=True)
 
+        st.markdown("---")
+        show_reclassification(df)
+
     with tab3:
         st.subheader("📋 Todos los Prospectos")
 
@@ -338,5 +532,8 @@ def main():
 
         st.plotly_chart(fig, use_container_width=True)
 
+    with tab5:
+        show_outcome_funnel(df)
+
 if __name__ == "__main__":
     main()
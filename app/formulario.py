@@ -1,6 +1,6 @@
 """
 Formulario de Diagnóstico AI Readiness - Aplicación Principal
-Version: 5.7 PRODUCTION - Micro-optimizations Layer
+Version: 5.8 PRODUCTION - Micro-optimizations Layer
 Autor: Andrés - AI Consultant
 
 ARCHITECTURE:
@@ -12,6 +12,10 @@ ARCHITECTURE:
   * Circuit breaker pattern
   * Staleness detection
 
+CHANGELOG v5.8:
+- Local queue fallback moved from failed_submissions.pkl to the SQLite outbox
+  (core/outbox.py) with a background drainer replaying to Sheets
+
 CHANGELOG v5.7:
 - Added submission hash for idempotency (prevents duplicates)
 - Implemented exponential backoff with circuit breaker for Google Sheets API
@@ -30,15 +34,16 @@ import sys
 import traceback
 from typing import Optional
 from dataclasses import dataclass
-import pickle
 
 # Agregar path del proyecto
 sys.path.append(str(Path(__file__).parent.parent))
 
 from app.config import *
 from core.models import ProspectInfo, DiagnosticResponses, DiagnosticResult
-from core.scoring_engine import ScoringEngine
-from core.classifier import ArchetypeClassifier, InsightGenerator
+from core.classifier import InsightGenerator
+from core.answer_tables import evaluate_diagnostic
+from core.outbox import DiagnosticOutbox, OutboxDrainer
+from core.outcome_store import outcome_store
 from integrations.sheets_connector import SheetsConnector
 from integrations.pdf_generator import PDFGenerator
 from integrations.email_sender import EmailSender
@@ -141,26 +146,28 @@ class SheetsCircuitBreaker:
 
     def save_to_local_queue(self, result: DiagnosticResult):
         """
-        Fallback: guarda resultado en local queue para retry manual
+        Fallback: guarda resultado en el outbox local (SQLite)
+        El drainer lo reenvía a Sheets en lotes cuando la API se recupere
         """
-        queue_path = Path(__file__).parent.parent / "data" / "failed_submissions.pkl"
-        queue_path.parent.mkdir(exist_ok=True)
-
-        queue = []
-        if queue_path.exists():
-            with open(queue_path, 'rb') as f:
-                queue = pickle.load(f)
+        get_outbox_drainer().outbox.enqueue(result)
 
-        queue.append({
-            'timestamp': datetime.now().isoformat(),
-            'result': result,
-            'hash': generate_submission_hash(result.prospect_info.contacto_email)
-        })
+        print(f"[CIRCUIT BREAKER] Guardado en outbox: {result.prospect_info.nombre_empresa}")
 
-        with open(queue_path, 'wb') as f:
-            pickle.dump(queue, f)
+@st.cache_resource
+def get_outbox_drainer() -> OutboxDrainer:
+    """
+    Outbox + drainer compartidos por todas las sesiones del proceso Streamlit
+    (OUTBOX_PATH permite apuntar al mismo archivo que el backend FastAPI)
+    """
+    outbox = DiagnosticOutbox()
+    outbox.import_legacy_queue(Path(__file__).parent.parent / "data" / "failed_submissions.pkl")
 
-        print(f"[CIRCUIT BREAKER] Guardado en local queue: {result.prospect_info.nombre_empresa}")
+    drainer = OutboxDrainer(
+        outbox,
+        send_batch=lambda results: SheetsConnector().save_diagnostics_batch(results)
+    )
+    drainer.start()
+    return drainer
 
 def safe_sheets_save(result: DiagnosticResult) -> tuple[bool, str]:
     """
@@ -1147,17 +1154,13 @@ def process_diagnostic():
         presupuesto_rango=st.session_state.Q15
     )
 
-    engine = ScoringEngine()
-    score = engine.calculate_full_score(responses, prospect_info)
-
-    classifier = ArchetypeClassifier()
-    arquetipo = classifier.classify(score, responses, prospect_info)
+    score, arquetipo, quick_wins = evaluate_diagnostic(responses, prospect_info)
 
     insight_gen = InsightGenerator()
-    quick_wins = insight_gen.generate_quick_wins(score, responses, arquetipo)
     red_flags = insight_gen.generate_red_flags(score, responses, prospect_info)
     insights = insight_gen.generate_insights(score, responses, arquetipo)
-    reunion_prep = insight_gen.generate_reunion_prep(score, responses, arquetipo, prospect_info)
+    # Preparación de reunión: bajo demanda al abrir el lead (dashboard)
+    probabilidad_cierre = insight_gen.estimate_close_probability(score, responses)
 
     if score.tier.value == "A":
         servicio = "Implementación Completa"
@@ -1180,7 +1183,7 @@ def process_diagnostic():
         servicio_sugerido=servicio,
         monto_sugerido_min=monto_min,
         monto_sugerido_max=monto_max,
-        reunion_prep=reunion_prep
+        probabilidad_cierre=probabilidad_cierre
     )
 
     print(f"[PROCESS END] Result created for {prospect_info.nombre_empresa}")
@@ -1304,6 +1307,12 @@ def main():
 
                     result = process_diagnostic()
 
+                    # Lead para el embudo de outcomes del dashboard
+                    try:
+                        outcome_store.register_lead(result)
+                    except Exception as e:
+                        print(f"[OUTCOMES] ⚠️ No se pudo registrar el lead: {str(e)}")
+
                     # MICRO-FUNCIÓN #2: Circuit breaker con exponential backoff
                     save_success, error_msg = safe_sheets_save(result)
 
@@ -1322,15 +1331,16 @@ def main():
                         st.stop()
 
                     pdf_success = False
-                    pdf_path = None
+                    pdf_content = None
                     if save_success:
                         try:
                             print(f"[PDF] Generando...")
                             pdf_gen = PDFGenerator()
-                            pdf_path = pdf_gen.generate_prospect_pdf(result)
+                            # En memoria: el adjunto del email usa los mismos bytes
+                            pdf_content = pdf_gen.render_prospect_pdf(result)
                             pdf_success = True
                             st.success("✅ PDF generado")
-                            print(f"[PDF] ✅ Generado: {pdf_path}")
+                            print(f"[PDF] ✅ Generado ({len(pdf_content)} bytes)")
                         except Exception as e:
                             st.warning(f"⚠️ PDF no disponible: {str(e)}")
                             print(f"[PDF] ⚠️ ERROR: {str(e)}")
@@ -1341,7 +1351,7 @@ def main():
                         try:
                             print(f"[EMAIL] Enviando...")
                             email_sender = EmailSender()
-                            email_sender.send_confirmation_email(result, pdf_path)
+                            email_sender.send_confirmation_email(result, pdf_content)
                             email_success = True
                             st.success(f"✅ Email enviado a {result.prospect_info.contacto_email}")
                             print(f"[EMAIL] ✅ Enviado a {result.prospect_info.contacto_email}")
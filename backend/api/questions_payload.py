@@ -0,0 +1,168 @@
+"""
+api/questions_payload.py
+Payload de /api/questions precalculado (bytes + ETag + variantes comprimidas)
+
+questions.json solo cambia entre deploys: se aplana al formato del
+frontend una vez (al arrancar o cuando cambia su mtime), se serializa a
+bytes y se comprime con gzip y brotli. Cada request solo compara el
+If-None-Match y elige la variante según Accept-Encoding.
+
+brotli es opcional: sin el paquete se sirven gzip e identity.
+"""
+
+import gzip
+import hashlib
+import json
+import threading
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+try:
+    import brotli
+except ImportError:  # brotli opcional
+    brotli = None
+
+DEFAULT_QUESTIONS_PATH = Path(__file__).parent.parent / "data" / "questions.json"
+
+QUESTIONS_RELOAD_INTERVAL = 2.0  # segundos entre chequeos de mtime
+QUESTIONS_CACHE_CONTROL = "public, max-age=300, must-revalidate"
+
+# Preferencia del servidor cuando el cliente acepta varias
+ENCODING_PREFERENCE = ("br", "gzip", "identity")
+
+
+def flatten_questions(data: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Estructura de bloques de questions.json -> array plano para el frontend"""
+    questions_list = []
+
+    for bloque_key, bloque_data in data.items():
+        if "preguntas" in bloque_data:
+            for pregunta in bloque_data["preguntas"]:
+                question_obj = {
+                    "id": pregunta["id"],
+                    "text": pregunta["pregunta"],
+                    "type": "multi-select" if pregunta["tipo"] == "multiselect" else "radio",
+                    "options": pregunta["opciones"],
+                    "required": pregunta.get("requerido", True)
+                }
+
+                if "helper" in pregunta:
+                    question_obj["helper"] = pregunta["helper"]
+
+                if pregunta.get("tiene_otro", False):
+                    question_obj["has_other"] = True
+
+                questions_list.append(question_obj)
+
+    return questions_list
+
+
+def accepted_encodings(accept_encoding: Optional[str]) -> List[str]:
+    """Codificaciones aceptadas por el cliente (sin las de q=0)"""
+    accepted = []
+    for part in (accept_encoding or "").split(","):
+        name, _, params = part.strip().partition(";")
+        name = name.strip().lower()
+        if not name:
+            continue
+        q = params.strip()
+        if q.startswith("q="):
+            try:
+                if float(q[2:]) == 0:
+                    continue
+            except ValueError:
+                continue
+        accepted.append(name)
+    return accepted
+
+
+@dataclass
+class QuestionsVariants:
+    """Cuerpo serializado una vez + variantes comprimidas"""
+    etag: str  # strong ETag del contenido (sin comillas)
+    bodies: Dict[str, bytes] = field(default_factory=dict)  # encoding -> bytes
+
+    def etag_for(self, encoding: str) -> str:
+        """ETag fuerte por representación (cada codificación tiene bytes distintos)"""
+        return f'"{self.etag}"' if encoding == "identity" else f'"{self.etag}-{encoding}"'
+
+    def matches(self, if_none_match: Optional[str]) -> bool:
+        """If-None-Match contiene alguna de nuestras representaciones"""
+        if not if_none_match:
+            return False
+        if if_none_match.strip() == "*":
+            return True
+        tags = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+        return any(self.etag_for(encoding) in tags for encoding in self.bodies)
+
+    def negotiate(self, accept_encoding: Optional[str]) -> str:
+        """Mejor variante disponible que el cliente acepta"""
+        accepted = accepted_encodings(accept_encoding)
+        for encoding in ENCODING_PREFERENCE:
+            if encoding in self.bodies and (encoding in accepted or encoding == "identity"):
+                return encoding
+        return "identity"
+
+
+def build_variants(data: Dict[str, Any]) -> QuestionsVariants:
+    """Aplanar, serializar y comprimir el payload completo"""
+    body = json.dumps(
+        {"success": True, "questions": flatten_questions(data)},
+        ensure_ascii=False, separators=(",", ":")
+    ).encode("utf-8")
+
+    variants = QuestionsVariants(etag=hashlib.sha256(body).hexdigest()[:32])
+    variants.bodies["identity"] = body
+    variants.bodies["gzip"] = gzip.compress(body, compresslevel=9, mtime=0)
+    if brotli is not None:
+        variants.bodies["br"] = brotli.compress(body, quality=11)
+    return variants
+
+
+class QuestionsPayload:
+    """Variantes de /api/questions con recarga por mtime de questions.json"""
+
+    def __init__(self, path: Optional[Path] = None, reload_interval: float = QUESTIONS_RELOAD_INTERVAL):
+        self.path = Path(path or DEFAULT_QUESTIONS_PATH)
+        self.reload_interval = reload_interval
+        self._lock = threading.Lock()
+        self._checked_at = 0.0
+        self._mtime: Optional[float] = None
+        self._variants: Optional[QuestionsVariants] = None
+
+    def get(self) -> QuestionsVariants:
+        """
+        Variantes vigentes (FileNotFoundError / json.JSONDecodeError si el
+        archivo no se puede cargar y no hay una versión anterior)
+        """
+        if self._variants is None or time.monotonic() - self._checked_at >= self.reload_interval:
+            self.refresh()
+        return self._variants
+
+    def refresh(self):
+        with self._lock:
+            self._checked_at = time.monotonic()
+            try:
+                mtime = self.path.stat().st_mtime
+                if self._variants is not None and mtime == self._mtime:
+                    return
+                with open(self.path, 'r', encoding='utf-8') as f:
+                    variants = build_variants(json.load(f))
+            except (OSError, ValueError) as e:
+                if self._variants is None:
+                    raise
+                print(f"[QUESTIONS] ❌ No se pudo recargar {self.path.name}, se mantiene la versión anterior: {e}")
+                return
+
+            reloaded = self._variants is not None
+            self._variants = variants
+            self._mtime = mtime
+
+        sizes = ", ".join(f"{encoding} {len(body)} B" for encoding, body in variants.bodies.items())
+        print(f"[QUESTIONS] {'♻️ Recargado' if reloaded else '✓ Precalculado'} ({sizes})")
+
+
+# Singleton global del proceso
+questions_payload = QuestionsPayload()
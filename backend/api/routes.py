@@ -1,9 +1,11 @@
-from fastapi import APIRouter, HTTPException
-from fastapi.responses import FileResponse
+from fastapi import APIRouter, HTTPException, Request
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import Response
 from pydantic import BaseModel, EmailStr
-from typing import List, Optional
+from typing import Dict, List, Literal, Optional
 from datetime import datetime
-import hashlib
+import asyncio
+from concurrent.futures import wait
 import time
 import sys
 import json
@@ -14,32 +16,55 @@ from pathlib import Path
 sys.path.append(str(Path(__file__).parent.parent))
 
 from core.models import ProspectInfo, DiagnosticResponses, DiagnosticResult
-from core.scoring_engine import ScoringEngine
-from core.classifier import ArchetypeClassifier, InsightGenerator
-from integrations.sheets_connector import SheetsConnector
+from core.classifier import InsightGenerator
+from core.answer_tables import evaluate_diagnostic
+from integrations.sheets_connector import SheetsConnector, sheets_write_buffer
 from integrations.email_sender import EmailSender
-from integrations.pdf_generator import PDFGenerator
+from integrations.pdf_pool import pdf_render_pool
+from integrations.pdf_store import pdf_store
+from core.jobs import pipeline
+from core.outbox import DiagnosticOutbox, OutboxDrainer
+from core.outcome_store import outcome_store, OUTCOME_STAGES
+from api.questions_payload import questions_payload, QUESTIONS_CACHE_CONTROL
+from core.metrics import metrics, STAGE_SECONDS, STAGE_FAILURES, REQUEST_SECONDS, RETRIES
+from core.idempotency import idempotency_store, submission_key, IdempotencyRecord, STATUS_DONE
 
 router = APIRouter()
 
+# Outbox local: diagnósticos que no llegaron a Sheets se reenvían en lotes
+outbox = DiagnosticOutbox()
+
+def _resend_outbox_batch(results: List[DiagnosticResult]):
+    """Reintento a Sheets de diagnósticos pendientes (cuenta para /metrics)"""
+    RETRIES.inc(len(results), kind="outbox")
+    try:
+        with STAGE_SECONDS.time(stage="sheets_retry"):
+            SheetsConnector().save_diagnostics_batch(results)
+    except Exception:
+        STAGE_FAILURES.inc(stage="sheets_retry")
+        raise
+
+outbox_drainer = OutboxDrainer(outbox, send_batch=_resend_outbox_batch)
+
+# Profundidad de colas, leída en cada scrape de /metrics
+metrics.gauge("outbox_pending", "Diagnósticos en el outbox pendientes de Sheets", outbox.count_pending)
+metrics.gauge("outbox_dead", "Diagnósticos descartados del outbox tras agotar reintentos", outbox.count_dead)
+metrics.gauge(
+    "pipeline_stages", "Etapas en background (sheets, pdf, email) por estado",
+    pipeline.stage_counts, ("status",)
+)
+metrics.gauge(
+    "sheets_write_buffer_queue_depth", "Filas en el write buffer esperando flush a Sheets",
+    lambda: sheets_write_buffer.stats()["queue_depth"]
+)
+
 # ==================================================
 # IDEMPOTENCY (Micro-función #1)
 # ==================================================
-processed_hashes = set()
-
-def generate_submission_hash(email: str) -> str:
-    window = int(time.time() / 300)
-    key = f"{email}:{window}"
-    return hashlib.sha256(key.encode()).hexdigest()[:16]
-
-def check_idempotency(email: str) -> bool:
-    submission_hash = generate_submission_hash(email)
-    if submission_hash in processed_hashes:
-        return False
-    processed_hashes.add(submission_hash)
-    if len(processed_hashes) > 20:
-        processed_hashes.clear()
-    return True
+# Store SQLite compartido entre workers (core/idempotency.py): un envío
+# idéntico dentro del TTL recibe la respuesta original en vez de un 429
+IDEMPOTENCY_WAIT_SECONDS = 10  # espera máxima de un duplicado mientras el original procesa
+IDEMPOTENCY_POLL_SECONDS = 0.2
 
 # ==================================================
 # PYDANTIC MODELS
@@ -84,6 +109,82 @@ class DiagnosticResponse(BaseModel):
     timestamp: str
     email_sent: bool
     pdf_generated: bool
+    status_url: str = ""
+
+class OutcomeRequest(BaseModel):
+    stage: Literal["contacted", "meeting", "proposal", "won", "lost"]
+    monto: Optional[float] = None
+    nota: Optional[str] = ""
+    # Solo para leads anteriores al registro de outcomes (no están en el store)
+    tier: Optional[str] = None
+    arquetipo: Optional[str] = None
+    sector: Optional[str] = None
+
+# ==================================================
+# ETAPAS EN BACKGROUND (Sheets, PDF, Email)
+# ==================================================
+SHEETS_FLUSH_TIMEOUT = 60  # segundos que la etapa espera el flush del write buffer
+
+def _run_sheets_stage(result: DiagnosticResult) -> bool:
+    """Guardar en Google Sheets (corre en el thread pool del pipeline)"""
+    try:
+        print(f"\n{'='*70}")
+        print(f"[SHEETS] Iniciando guardado en Google Sheets...")
+        print(f"  Empresa: {result.prospect_info.nombre_empresa}")
+        print(f"  Email: {result.prospect_info.contacto_email}")
+        print(f"  Diagnostic ID: {result.diagnostic_id}")
+        print(f"{'='*70}")
+
+        # Las filas quedan en el journal del write buffer; si el flush a Sheets
+        # falla, el diagnóstico pasa al outbox antes de que falle la etapa
+        connector = SheetsConnector()
+        saved = connector.save_diagnostic(result, on_write_failed=outbox.enqueue)
+        done, not_done = wait(saved, timeout=SHEETS_FLUSH_TIMEOUT)
+        if not_done:
+            raise TimeoutError(
+                f"Sheets no confirmó la escritura en {SHEETS_FLUSH_TIMEOUT}s (las filas siguen en el journal)"
+            )
+        for future in done:
+            future.result()
+
+        print(f"[SHEETS] ✅ GUARDADO EXITOSAMENTE")
+        print(f"  Score: {result.score.score_final} | Tier: {result.score.tier.value}")
+        print(f"{'='*70}\n")
+        return True
+
+    except Exception as e:
+        print(f"\n{'='*70}")
+        print(f"[SHEETS] ❌ ERROR CRÍTICO AL GUARDAR")
+        print(f"  Empresa: {result.prospect_info.nombre_empresa}")
+        print(f"  Error: {str(e)}")
+        print(f"{'='*70}\n")
+        # Queda en el outbox; el drainer lo reenvía cuando Sheets responda.
+        # En un timeout las filas siguen en el journal y el flush decide.
+        if not isinstance(e, TimeoutError):
+            outbox.enqueue(result)
+        raise
+
+def _run_pdf_stage(result: DiagnosticResult) -> bytes:
+    """Generar el PDF del prospecto en el pool de procesos de render (bytes en memoria)"""
+    print(f"[PDF] Generando reporte PDF...")
+    # El diagnóstico queda guardado: si el PDF se desaloja, la descarga lo regenera
+    pdf_store.remember(result)
+    pdf = pdf_render_pool.render(result).result()
+    # Disponible ya para la descarga; el disco se escribe en background
+    pdf_store.put(result, pdf)
+    print(f"[PDF] ✅ Generado exitosamente ({len(pdf)} bytes)")
+    return pdf
+
+def _run_email_stage(result: DiagnosticResult, pdf: Optional[bytes]) -> bool:
+    """Enviar email de confirmación (adjunta el PDF si la etapa previa lo generó)"""
+    print(f"[EMAIL] Iniciando envío con Resend...")
+    email_sender = EmailSender()
+
+    if not email_sender.send_confirmation_email(result, pdf):
+        raise RuntimeError("Email no se pudo enviar (ver detalles arriba)")
+
+    print(f"[EMAIL] ✅ Email enviado exitosamente a {result.prospect_info.contacto_email}")
+    return True
 
 # ==================================================
 # ENDPOINTS
@@ -93,49 +194,14 @@ async def test():
     return {"message": "API funcionando"}
 
 @router.get("/questions")
-async def get_questions():
+async def get_questions(request: Request):
     """
     Retorna las preguntas del diagnóstico desde questions.json
-    Transforma estructura de bloques a array plano para el frontend
+    Payload aplanado y comprimido una sola vez (api/questions_payload.py);
+    con If-None-Match vigente responde 304 sin cuerpo
     """
     try:
-        questions_path = Path(__file__).parent.parent / "data" / "questions.json"
-
-        if not questions_path.exists():
-            raise HTTPException(
-                status_code=404,
-                detail=f"Questions file not found at {questions_path}"
-            )
-
-        with open(questions_path, 'r', encoding='utf-8') as f:
-            data = json.load(f)
-
-        questions_list = []
-
-        for bloque_key, bloque_data in data.items():
-            if "preguntas" in bloque_data:
-                for pregunta in bloque_data["preguntas"]:
-                    question_obj = {
-                        "id": pregunta["id"],
-                        "text": pregunta["pregunta"],
-                        "type": "multi-select" if pregunta["tipo"] == "multiselect" else "radio",
-                        "options": pregunta["opciones"],
-                        "required": pregunta.get("requerido", True)
-                    }
-
-                    if "helper" in pregunta:
-                        question_obj["helper"] = pregunta["helper"]
-
-                    if pregunta.get("tiene_otro", False):
-                        question_obj["has_other"] = True
-
-                    questions_list.append(question_obj)
-
-        return {
-            "success": True,
-            "questions": questions_list
-        }
-
+        variants = questions_payload.get()
     except FileNotFoundError:
         raise HTTPException(
             status_code=404,
@@ -152,18 +218,87 @@ async def get_questions():
             detail=f"Error loading questions: {str(e)}"
         )
 
+    encoding = variants.negotiate(request.headers.get("accept-encoding"))
+    headers = {
+        "ETag": variants.etag_for(encoding),
+        "Cache-Control": QUESTIONS_CACHE_CONTROL,
+        "Vary": "Accept-Encoding"
+    }
+
+    if variants.matches(request.headers.get("if-none-match")):
+        return Response(status_code=304, headers=headers)
+
+    if encoding != "identity":
+        headers["Content-Encoding"] = encoding
+    return Response(content=variants.bodies[encoding], media_type="application/json", headers=headers)
+
 @router.post("/diagnostic", response_model=DiagnosticResponse)
 async def process_diagnostic(request: DiagnosticRequest):
-    """Procesa diagnóstico completo"""
+    """Procesa diagnóstico completo (un reintento idéntico recibe la respuesta original)"""
+
+    start = time.perf_counter()
+
+    # Idempotency check (SQLite en el threadpool: BEGIN IMMEDIATE puede esperar el lock)
+    key = submission_key(request.model_dump())
+    existing = await run_in_threadpool(idempotency_store.claim, key, IDEMPOTENCY_WAIT_SECONDS)
+    if existing is not None:
+        response = await _replay_diagnostic(request, key, existing)
+        REQUEST_SECONDS.observe(time.perf_counter() - start, outcome="replayed")
+        return response
+
+    return await _process_claimed(request, key, start)
 
-    # Idempotency check
-    if not check_idempotency(request.contacto_email):
+async def _process_claimed(request: DiagnosticRequest, key: str, start: float) -> DiagnosticResponse:
+    """Procesar un envío cuya clave de idempotencia ya es de este request"""
+    try:
+        response = await _process_diagnostic(request)
+    except Exception:
+        await run_in_threadpool(idempotency_store.release, key)
+        REQUEST_SECONDS.observe(time.perf_counter() - start, outcome="error")
+        raise
+
+    await run_in_threadpool(idempotency_store.complete, key, response.model_dump())
+    REQUEST_SECONDS.observe(time.perf_counter() - start, outcome="processed")
+    return response
+
+async def _replay_diagnostic(request: DiagnosticRequest, key: str, record: IdempotencyRecord) -> DiagnosticResponse:
+    """Responder a un duplicado con la respuesta del envío original"""
+    waited = 0.0
+    while record is not None and record.status != STATUS_DONE and waited < IDEMPOTENCY_WAIT_SECONDS:
+        # El original sigue procesando (doble click / reintento inmediato)
+        await asyncio.sleep(IDEMPOTENCY_POLL_SECONDS)
+        waited += IDEMPOTENCY_POLL_SECONDS
+        record = await run_in_threadpool(idempotency_store.get, key)
+
+    if record is None:
+        # El original falló y liberó la clave: procesar este envío
+        return await process_diagnostic(request)
+
+    if record.status != STATUS_DONE:
+        # Reserva más vieja que la espera: el worker original murió, este envío la toma
+        record = await run_in_threadpool(idempotency_store.claim, key, IDEMPOTENCY_WAIT_SECONDS)
+        if record is None:
+            return await _process_claimed(request, key, time.perf_counter())
+
+    if record.status != STATUS_DONE:
         raise HTTPException(
-            status_code=429,
-            detail="Diagnóstico procesado recientemente. Espere 5 minutos."
+            status_code=409,
+            detail="Diagnóstico en proceso. Consulte de nuevo en unos segundos."
         )
 
+    RETRIES.inc(kind="replay")
+    print(f"[IDEMPOTENCY] ♻️ Duplicado de {record.response['diagnostic_id']}, respuesta original reenviada")
+    return DiagnosticResponse(**record.response)
+
+async def _process_diagnostic(request: DiagnosticRequest) -> DiagnosticResponse:
+    """Score, insights y encolado de Sheets/PDF/email de un envío nuevo"""
+    # Segundos por etapa para /metrics (el body ya llega validado por Pydantic;
+    # "validation" mide la construcción de los objetos del modelo)
+    timings: Dict[str, float] = {}
+    stage = "validation"
     try:
+        stage_start = time.perf_counter()
+
         # Construir objetos del modelo
         prospect_info = ProspectInfo(
             nombre_empresa=request.nombre_empresa,
@@ -197,24 +332,25 @@ async def process_diagnostic(request: DiagnosticRequest):
             presupuesto_rango=request.Q15
         )
 
-        # Scoring Engine
-        print(f"[DIAGNOSTIC] Calculando scores...")
-        engine = ScoringEngine()
-        score = engine.calculate_full_score(responses, prospect_info)
-        print(f"[DIAGNOSTIC] ✅ Score calculado: {score.score_final}/100")
+        timings["validation"] = time.perf_counter() - stage_start
 
-        # Classifier
-        print(f"[DIAGNOSTIC] Clasificando arquetipo...")
-        classifier = ArchetypeClassifier()
-        arquetipo = classifier.classify(score, responses, prospect_info)
+        # Score, arquetipo y quick wins (tablas precalculadas o reglas)
+        stage = "scoring"
+        print(f"[DIAGNOSTIC] Calculando scores y arquetipo...")
+        score, arquetipo, quick_wins = evaluate_diagnostic(responses, prospect_info, timings)
+        print(f"[DIAGNOSTIC] ✅ Score calculado: {score.score_final}/100")
         print(f"[DIAGNOSTIC] ✅ Arquetipo: {arquetipo.nombre} (Tier {score.tier.value})")
 
         # Insight Generator
+        stage = "insights"
+        stage_start = time.perf_counter()
         insight_gen = InsightGenerator()
-        quick_wins = insight_gen.generate_quick_wins(score, responses, arquetipo)
         red_flags = insight_gen.generate_red_flags(score, responses, prospect_info)
         insights = insight_gen.generate_insights(score, responses, arquetipo)
-        reunion_prep = insight_gen.generate_reunion_prep(score, responses, arquetipo, prospect_info)
+        # Preparación de reunión: bajo demanda al abrir el lead (dashboard)
+        probabilidad_cierre = insight_gen.estimate_close_probability(score, responses)
+        timings["insights"] = timings.get("insights", 0.0) + time.perf_counter() - stage_start
+        stage = "dispatch"
 
         # Determinar servicio y rango de inversión
         if score.tier.value == "A":
@@ -239,72 +375,31 @@ async def process_diagnostic(request: DiagnosticRequest):
             servicio_sugerido=servicio,
             monto_sugerido_min=monto_min,
             monto_sugerido_max=monto_max,
-            reunion_prep=reunion_prep
+            probabilidad_cierre=probabilidad_cierre
         )
 
-        # ===== INTEGRACIÓN GOOGLE SHEETS (CON LOGS DETALLADOS) =====
-        sheets_success = False
-        try:
-            print(f"\n{'='*70}")
-            print(f"[SHEETS] Iniciando guardado en Google Sheets...")
-            print(f"  Empresa: {prospect_info.nombre_empresa}")
-            print(f"  Email: {prospect_info.contacto_email}")
-            print(f"  Diagnostic ID: {result.diagnostic_id}")
-            print(f"{'='*70}")
-
-            connector = SheetsConnector()
-            connector.save_diagnostic(result)
-            sheets_success = True
-
-            print(f"[SHEETS] ✅ GUARDADO EXITOSO")
-            print(f"  Score: {score.score_final} | Tier: {score.tier.value}")
-            print(f"{'='*70}\n")
-
-        except Exception as e:
-            print(f"\n{'='*70}")
-            print(f"[SHEETS] ❌ ERROR CRÍTICO AL GUARDAR")
-            print(f"  Empresa: {prospect_info.nombre_empresa}")
-            print(f"  Error: {str(e)}")
-            print(f"{'='*70}")
-            print(f"[SHEETS] Stack trace completo:")
-            traceback.print_exc()
-            print(f"{'='*70}\n")
-            # NO re-lanzar para que el diagnóstico continúe
-
-        # ===== GENERACIÓN PDF (CON LOGS DETALLADOS) =====
-        pdf_success = False
-        pdf_path = None
+        # Lead para el embudo de outcomes (contadores por tier/arquetipo/sector)
         try:
-            print(f"[PDF] Generando reporte PDF...")
-            pdf_gen = PDFGenerator()
-            pdf_path = pdf_gen.generate_prospect_pdf(result)
-            pdf_success = True
-            print(f"[PDF] ✅ Generado exitosamente: {pdf_path}")
+            await run_in_threadpool(outcome_store.register_lead, result)
         except Exception as e:
-            print(f"[PDF] ❌ ERROR: {str(e)}")
-            traceback.print_exc()
+            print(f"[OUTCOMES] ⚠️ No se pudo registrar el lead: {str(e)}")
 
-        # ===== EMAIL (TEMPORALMENTE DESHABILITADO) =====
-        email_success = False
-        try:
-            print(f"[EMAIL] Iniciando envío con Resend...")
-            email_sender = EmailSender()
-            email_success = email_sender.send_confirmation_email(result, pdf_path)
-
-            if email_success:
-                print(f"[EMAIL] ✅ Email enviado exitosamente a {result.prospect_info.contacto_email}")
-            else:
-                print(f"[EMAIL] ⚠️ Email no se pudo enviar (ver detalles arriba)")
-
-        except Exception as e:
-            print(f"[EMAIL] ❌ ERROR CRÍTICO: {str(e)}")
-            import traceback
-            traceback.print_exc()
+        # ===== SHEETS, PDF Y EMAIL EN BACKGROUND =====
+        # Sheets corre en su propia cadena; el email espera al PDF para adjuntarlo
+        await run_in_threadpool(pipeline.submit, result.diagnostic_id, [
+            [("sheets", lambda job: _run_sheets_stage(result))],
+            [
+                ("pdf", lambda job: _run_pdf_stage(result)),
+                ("email", lambda job: _run_email_stage(result, job.results.get("pdf")))
+            ]
+        ])
 
+        for stage_name, seconds in timings.items():
+            STAGE_SECONDS.observe(seconds, stage=stage_name)
 
         # ===== RESPUESTA AL FRONTEND =====
         return DiagnosticResponse(
-            success=sheets_success,
+            success=True,
             diagnostic_id=result.diagnostic_id,
             tier=score.tier.value,
             score_total=score.score_final,
@@ -317,11 +412,13 @@ async def process_diagnostic(request: DiagnosticRequest):
             monto_min=monto_min,
             monto_max=monto_max,
             timestamp=datetime.now().isoformat(),
-            email_sent=email_success,
-            pdf_generated=pdf_success
+            email_sent=False,
+            pdf_generated=False,
+            status_url=f"/api/diagnostic/{result.diagnostic_id}/status"
         )
 
     except Exception as e:
+        STAGE_FAILURES.inc(stage=stage)
         print(f"\n{'='*70}")
         print(f"[DIAGNOSTIC] ❌ ERROR CRÍTICO EN PROCESAMIENTO")
         print(f"  Error: {str(e)}")
@@ -330,16 +427,76 @@ async def process_diagnostic(request: DiagnosticRequest):
         print(f"{'='*70}\n")
         raise HTTPException(status_code=500, detail=str(e))
 
-@router.get("/diagnostic/{diagnostic_id}/pdf")
-async def download_pdf(diagnostic_id: str):
-    """Descargar PDF del diagnóstico"""
-    pdf_path = Path(f"/tmp/ai_diagnostics/diagnostico_{diagnostic_id}.pdf")
+@router.get("/diagnostic/{diagnostic_id}/status")
+async def get_diagnostic_status(diagnostic_id: str):
+    """Estado de las etapas en background (sheets, pdf, email) de un diagnóstico"""
+    job = await run_in_threadpool(pipeline.get, diagnostic_id)
+
+    if job is None:
+        raise HTTPException(status_code=404, detail="Diagnóstico no encontrado")
+
+    return {
+        "success": True,
+        **job.to_dict()
+    }
+
+@router.post("/diagnostic/{diagnostic_id}/outcome")
+async def record_outcome(diagnostic_id: str, request: OutcomeRequest):
+    """Registrar el resultado comercial real de un lead (contacted, meeting, proposal, won, lost)"""
+    if request.tier and request.arquetipo and request.sector:
+        await run_in_threadpool(
+            outcome_store.register, diagnostic_id, request.tier, request.arquetipo, request.sector
+        )
+
+    try:
+        lead = await run_in_threadpool(
+            outcome_store.record_outcome,
+            diagnostic_id, request.stage, monto=request.monto, nota=request.nota or ""
+        )
+    except KeyError:
+        raise HTTPException(
+            status_code=404,
+            detail="Lead no registrado: enviar tier, arquetipo y sector para registrarlo"
+        )
+
+    return {
+        "success": True,
+        **lead
+    }
 
-    if not pdf_path.exists():
-        raise HTTPException(status_code=404, detail="PDF no encontrado")
+@router.get("/outcomes/funnel")
+async def get_outcomes_funnel(dimension: str = "all"):
+    """Embudo real (leads, etapas, won/lost, montos y tasas) por tier, arquetipo o sector"""
+    try:
+        funnel = await run_in_threadpool(outcome_store.funnel, dimension)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    return {
+        "success": True,
+        "dimension": dimension,
+        "stages": list(OUTCOME_STAGES),
+        "funnel": funnel
+    }
 
-    return FileResponse(
-        path=str(pdf_path),
+@router.get("/diagnostic/{diagnostic_id}/pdf")
+async def download_pdf(diagnostic_id: str):
+    """Descargar PDF del diagnóstico (el mismo buffer que se adjuntó al email)"""
+    pdf = await run_in_threadpool(pdf_store.get, diagnostic_id)
+
+    if pdf is None:
+        # Desalojado o perdido: regenerar desde el DiagnosticResult guardado
+        result = await run_in_threadpool(pdf_store.result, diagnostic_id)
+        if result is None:
+            raise HTTPException(status_code=404, detail="PDF no encontrado")
+
+        print(f"[PDF] ♻️ Regenerando PDF de {diagnostic_id}")
+        with STAGE_SECONDS.time(stage="pdf_regenerate"):
+            pdf = await asyncio.wrap_future(pdf_render_pool.render(result))
+        pdf_store.put(result, pdf)
+
+    return Response(
+        content=pdf,
         media_type='application/pdf',
-        filename=f'Diagnostico_AI_{diagnostic_id}.pdf'
+        headers={"Content-Disposition": f'attachment; filename="Diagnostico_AI_{diagnostic_id}.pdf"'}
     )
@@ -0,0 +1,560 @@
+"""
+core/answer_tables.py
+Tablas precalculadas (memory-mappable) de score, tier, arquetipo y quick wins
+
+El espacio completo de respuestas (Q4-Q15 x sector x facturación x
+empleados) ronda las 10^10 combinaciones, así que no se enumera entero:
+se factoriza en tablas pequeñas con clave entera empaquetada por factor
+(madurez, capacidad, viabilidad, motivación, sector, tamaño) cuyos
+valores son sub-scores y máscaras de bits de las condiciones de cada
+arquetipo. El request path hace un número fijo de lookups + OR de
+máscaras, sin evaluar reglas.
+
+Build offline (verifica contra el código de reglas antes de escribir):
+    python -m core.answer_tables build
+
+Si las tablas no existen, están desactualizadas (cambió questions.json,
+scoring_engine.py, classifier.py, insight_rules.py/.json o este archivo)
+o la respuesta trae texto libre en una pregunta con reglas por
+substring, se usa el código de reglas de siempre.
+"""
+
+import hashlib
+import json
+import os
+import random
+import time
+from dataclasses import asdict
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from core.models import (
+    DiagnosticScore, DiagnosticResponses, ProspectInfo, Arquetipo, QuickWin,
+    MadurezDigital, CapacidadInversion, ViabilidadComercial, Tier
+)
+from core.scoring_engine import (
+    scoring_engine, QUESTIONS_PATH,
+    FACTURACION_OPCIONES, FACTURACION_PUNTOS, EMPLEADOS_OPCIONES, EMPLEADOS_PUNTOS
+)
+from core.classifier import (
+    archetype_classifier, InsightGenerator, ARCHETYPE_CONDITIONS, ARCHETYPE_ORDER
+)
+from core.insight_rules import insight_rules
+
+DEFAULT_TABLES_DIR = Path(__file__).parent.parent / "data" / "answer_tables"
+
+SECTORES = (
+    "🏦 Banca",
+    "🛡️ Seguros",
+    "🛒 Retail",
+    "🏭 Manufactura",
+    "💼 Servicios Profesionales",
+    "🏥 Salud",
+    "📚 Educación",
+    "🏛️ Gobierno",
+    "🚚 Logística/Transporte",
+    "🏗️ Construcción",
+    "Otro"
+)
+
+# Preguntas con reglas por substring: una respuesta fuera de las opciones
+# no se puede resolver con la tabla y va por el código de reglas
+FALLBACK_FIELDS = ("procesos_criticos", "inversion_reciente")
+
+SLOT_BITS = 5  # hasta 5 condiciones por arquetipo -> 30 bits
+
+# Condiciones de calculate_confidence, bits 32+ de la máscara
+CONFIDENCE_CONDITIONS: List[Tuple[str, Callable[[Any], bool]]] = [
+    ("score_final", lambda s: s >= 80 or s <= 30),
+    ("tareas_repetitivas", lambda r: r == "No tengo idea"),
+    ("presupuesto_rango", lambda r: r == "Prefiero no decirlo / No lo sé aún"),
+    ("madurez", lambda m: m >= 30),
+    ("capacidad", lambda c: c >= 20),
+    ("viabilidad", lambda v: v >= 20),
+    ("urgencia_real", lambda u: u >= 7)
+]
+CONFIDENCE_SHIFT = 32
+
+# Campos de respuesta que entran como factor, con su pregunta
+RESPONSE_FACTORS = {
+    "tareas_repetitivas": "Q7",
+    "procesos_criticos": "Q6",
+    "inversion_reciente": "Q11",
+    "frustracion_principal": "Q12",
+    "urgencia": "Q13",
+    "proceso_aprobacion": "Q14",
+    "presupuesto_rango": "Q15"
+}
+
+# Totales de score que entran como factor -> rango de valores posibles
+TOTAL_FACTORS = ("madurez", "capacidad", "viabilidad", "urgencia_real", "score_final")
+
+_UNKNOWN = "\x00"  # valor centinela para "fuera de las opciones"
+
+
+def _fingerprint() -> str:
+    """Hash de todo lo que define las tablas: si cambia, hay que reconstruir"""
+    core_dir = Path(__file__).parent
+    digest = hashlib.sha256()
+    for path in (
+        QUESTIONS_PATH,
+        core_dir / "scoring_engine.py",
+        core_dir / "classifier.py",
+        core_dir / "insight_rules.py",
+        Path(__file__)
+    ):
+        digest.update(path.read_bytes())
+    return digest.hexdigest()
+
+
+def _code(options: Tuple[str, ...], value: Any) -> int:
+    """Código 1..n para opciones conocidas, 0 para vacío/texto libre"""
+    return options.index(value) + 1 if value in options else 0
+
+
+def _domain(options: Tuple[str, ...]) -> List[str]:
+    """Valores por código: 0 = centinela, 1..n = opciones"""
+    return [_UNKNOWN] + list(options)
+
+
+# ==================================================
+# BUILD
+# ==================================================
+def _factor_masks(factor: str, values: List[Any]) -> np.ndarray:
+    """Máscara uint64 de condiciones verdaderas para cada valor del factor"""
+    masks = np.zeros(len(values), dtype=np.uint64)
+    for i, value in enumerate(values):
+        mask = 0
+        for a, archetype in enumerate(ARCHETYPE_ORDER):
+            for j, (_, cond_factor, predicate) in enumerate(ARCHETYPE_CONDITIONS[archetype]):
+                if cond_factor == factor and predicate(value):
+                    mask |= 1 << (a * SLOT_BITS + j)
+        for k, (cond_factor, predicate) in enumerate(CONFIDENCE_CONDITIONS):
+            if cond_factor == factor and predicate(value):
+                mask |= 1 << (CONFIDENCE_SHIFT + k)
+        masks[i] = mask
+    return masks
+
+
+def _archetype_points() -> np.ndarray:
+    """Puntos por arquetipo y sub-máscara, sumados en el orden de las reglas"""
+    table = np.zeros((len(ARCHETYPE_ORDER), 1 << SLOT_BITS), dtype=np.float64)
+    for a, archetype in enumerate(ARCHETYPE_ORDER):
+        conditions = ARCHETYPE_CONDITIONS[archetype]
+        for submask in range(1 << len(conditions)):
+            points = 0.0
+            for j, (weight, _, _) in enumerate(conditions):
+                if submask & (1 << j):
+                    points += weight
+            table[a, submask] = min(1.0, points)
+    return table
+
+
+def _confidence_table() -> np.ndarray:
+    """Confianza por combinación de flags, con los pasos de calculate_confidence"""
+    table = np.zeros(1 << len(CONFIDENCE_CONDITIONS), dtype=np.float64)
+    for flags in range(len(table)):
+        extremo, no_sabe_tareas, no_sabe_presupuesto, m30, c20, v20, u7 = (
+            bool(flags & (1 << k)) for k in range(len(CONFIDENCE_CONDITIONS))
+        )
+        confidence = 0.5
+        if extremo:
+            confidence += 0.2
+        if no_sabe_tareas:
+            confidence -= 0.1
+        if no_sabe_presupuesto:
+            confidence -= 0.1
+        if m30 and c20:
+            confidence += 0.1
+        if v20 and u7:
+            confidence += 0.1
+        table[flags] = max(0.0, min(1.0, confidence))
+    return table
+
+
+def _quick_wins_table(insights: InsightGenerator) -> Tuple[np.ndarray, List[Dict[str, str]]]:
+    """
+    Quick wins por (Q12, decisiones <= 5, integración <= 5), generados con
+    InsightGenerator.generate_quick_wins (solo depende de esos tres datos)
+    """
+    frustraciones = _domain(scoring_engine.frustracion.options)
+    table = np.full((len(frustraciones), 2, 2, 3), -1, dtype=np.int8)
+    catalog: List[Dict[str, str]] = []
+
+    for f, frustracion in enumerate(frustraciones):
+        for dec_baja in (0, 1):
+            for int_baja in (0, 1):
+                score = DiagnosticScore(
+                    madurez_digital=MadurezDigital(0 if dec_baja else 10, 0, 0 if int_baja else 10, 0),
+                    capacidad_inversion=CapacidadInversion(0, 0, 0),
+                    viabilidad_comercial=ViabilidadComercial(0, 0, 0),
+                    score_final=0,
+                    tier=Tier.C
+                )
+                responses = DiagnosticResponses(
+                    motivacion=[], toma_decisiones="", procesos_criticos="",
+                    tareas_repetitivas="", compartir_informacion="", equipo_tecnico="",
+                    capacidad_implementacion="", inversion_reciente="",
+                    frustracion_principal=frustracion, urgencia="",
+                    proceso_aprobacion="", presupuesto_rango=""
+                )
+                for k, quick_win in enumerate(insights.generate_quick_wins(score, responses, None)):
+                    entry = asdict(quick_win)
+                    if entry not in catalog:
+                        catalog.append(entry)
+                    table[f, dec_baja, int_baja, k] = catalog.index(entry)
+
+    return table, catalog
+
+
+def build_tables(tables_dir: Optional[Path] = None, verify_samples: int = 20000) -> Path:
+    """Generar las tablas .npy + manifest.json y verificarlas contra las reglas"""
+    tables_dir = Path(tables_dir or os.getenv("ANSWER_TABLES_DIR", DEFAULT_TABLES_DIR))
+    engine = scoring_engine
+    insights = InsightGenerator()
+
+    q5, q6, q7, q8 = (engine.table[q] for q in ("Q5", "Q6", "Q7", "Q8"))
+    q11, q12, q13, q14, q15 = (engine.table[q] for q in ("Q11", "Q12", "Q13", "Q14", "Q15"))
+
+    def points(question, code: int) -> int:
+        return question.points[code - 1] if code else question.default
+
+    # Sub-scores por factor (clave = códigos en base mixta)
+    madurez = np.array([
+        [points(q5, a), points(q6, b), points(q8, d), points(q7, c)]
+        for a in range(len(q5.options) + 1)
+        for b in range(len(q6.options) + 1)
+        for c in range(len(q7.options) + 1)
+        for d in range(len(q8.options) + 1)
+    ], dtype=np.int16)
+
+    capacidad = np.array([
+        [points(q15, a), points(q11, b), max(
+            FACTURACION_PUNTOS.get(fact, 0), EMPLEADOS_PUNTOS.get(emp, 0)
+        )]
+        for a in range(len(q15.options) + 1)
+        for b in range(len(q11.options) + 1)
+        for fact in _domain(FACTURACION_OPCIONES)
+        for emp in _domain(EMPLEADOS_OPCIONES)
+    ], dtype=np.int16)
+
+    viabilidad = np.array([
+        [points(q12, a), points(q13, b), points(q14, c)]
+        for a in range(len(q12.options) + 1)
+        for b in range(len(q13.options) + 1)
+        for c in range(len(q14.options) + 1)
+    ], dtype=np.int16)
+
+    bonus = np.asarray(engine._batch_bonus, dtype=np.int16)
+
+    # Máscaras de condiciones por factor
+    motivacion_masks = _factor_masks("motivacion", [
+        engine._decode_motivacion(mask) for mask in range(len(bonus))
+    ])
+    tamano_masks = _factor_masks("tamano", [
+        (fact, emp)
+        for fact in _domain(FACTURACION_OPCIONES)
+        for emp in _domain(EMPLEADOS_OPCIONES)
+    ])
+
+    max_totals = {
+        "madurez": int(madurez.sum(axis=1).max()),
+        "capacidad": int(capacidad.sum(axis=1).max()),
+        "viabilidad": int(viabilidad.sum(axis=1).max()),
+        "urgencia_real": int(viabilidad[:, 1].max()),
+        "score_final": 100
+    }
+
+    arrays = {
+        "madurez": madurez,
+        "capacidad": capacidad,
+        "viabilidad": viabilidad,
+        "bonus": bonus,
+        "mask_sector": _factor_masks("sector", _domain(SECTORES)),
+        "mask_tamano": tamano_masks,
+        "mask_motivacion": motivacion_masks,
+        "archetype_points": _archetype_points(),
+        "confidence": _confidence_table()
+    }
+    for field_name, question_id in RESPONSE_FACTORS.items():
+        arrays[f"mask_{field_name}"] = _factor_masks(
+            field_name, _domain(engine.table[question_id].options)
+        )
+    for factor in TOTAL_FACTORS:
+        arrays[f"mask_{factor}"] = _factor_masks(factor, list(range(max_totals[factor] + 1)))
+
+    quick_wins, catalog = _quick_wins_table(insights)
+    arrays["quick_wins"] = quick_wins
+
+    tables_dir.mkdir(parents=True, exist_ok=True)
+    for name, array in arrays.items():
+        np.save(tables_dir / f"{name}.npy", array)
+
+    manifest = {
+        "fingerprint": _fingerprint(),
+        "built_at": datetime.now().isoformat(),
+        "quick_wins": catalog,
+        "insight_rules_digest": insight_rules.digest,
+        "arrays": {name: list(array.shape) for name, array in arrays.items()}
+    }
+    with open(tables_dir / "manifest.json", 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+
+    tables = AnswerTables.load(tables_dir)
+    if tables is None:
+        raise RuntimeError("Las tablas recién generadas no cargaron")
+    mismatches = verify_tables(tables, verify_samples)
+    if mismatches:
+        raise RuntimeError(f"Tablas inconsistentes con las reglas en {mismatches} casos")
+
+    print(f"[ANSWER TABLES] ✅ {len(arrays)} tablas en {tables_dir} (verificadas con {verify_samples} casos)")
+    return tables_dir
+
+
+# ==================================================
+# LOOKUP
+# ==================================================
+class AnswerTables:
+    """Tablas cargadas con mmap + lookup de un diagnóstico"""
+
+    def __init__(
+        self,
+        arrays: Dict[str, np.ndarray],
+        quick_wins: List[Dict[str, str]],
+        rules_digest: str
+    ):
+        self.arrays = arrays
+        self.quick_wins_catalog = quick_wins
+        self.rules_digest = rules_digest
+        self.classifier = archetype_classifier
+
+        engine = scoring_engine
+        q = engine.table
+        self._madurez_radix = (
+            len(q["Q6"].options) + 1, len(q["Q7"].options) + 1, len(q["Q8"].options) + 1
+        )
+        self._capacidad_radix = (
+            len(q["Q11"].options) + 1, len(FACTURACION_OPCIONES) + 1, len(EMPLEADOS_OPCIONES) + 1
+        )
+        self._viabilidad_radix = (len(q["Q13"].options) + 1, len(q["Q14"].options) + 1)
+        self._response_options = {
+            field_name: q[question_id].options
+            for field_name, question_id in RESPONSE_FACTORS.items()
+        }
+
+    @classmethod
+    def load(cls, tables_dir: Optional[Path] = None) -> Optional["AnswerTables"]:
+        """Cargar tablas si existen y corresponden al código actual; si no, None"""
+        tables_dir = Path(tables_dir or os.getenv("ANSWER_TABLES_DIR", DEFAULT_TABLES_DIR))
+        manifest_path = tables_dir / "manifest.json"
+
+        if not manifest_path.exists():
+            print(f"[ANSWER TABLES] Sin tablas en {tables_dir}, se usan las reglas")
+            return None
+
+        with open(manifest_path, 'r', encoding='utf-8') as f:
+            manifest = json.load(f)
+
+        if manifest.get("fingerprint") != _fingerprint():
+            print(f"[ANSWER TABLES] ⚠️ Tablas desactualizadas, se usan las reglas "
+                  f"(reconstruir con: python -m core.answer_tables build)")
+            return None
+
+        arrays = {
+            name: np.load(tables_dir / f"{name}.npy", mmap_mode="r")
+            for name in manifest["arrays"]
+        }
+        print(f"[ANSWER TABLES] ✓ Cargadas ({manifest['built_at']})")
+        return cls(arrays, manifest["quick_wins"], manifest["insight_rules_digest"])
+
+    def lookup(
+        self,
+        responses: DiagnosticResponses,
+        prospect_info: ProspectInfo
+    ) -> Optional[Tuple[DiagnosticScore, Arquetipo, List[QuickWin]]]:
+        """Score, arquetipo y quick wins por lookup; None si requiere las reglas"""
+        # Reglas de quick wins editadas (recarga en caliente) después del build
+        insight_rules.refresh()
+        if insight_rules.digest != self.rules_digest:
+            return None
+
+        engine = scoring_engine
+        a = self.arrays
+
+        codes = {
+            field_name: _code(options, getattr(responses, field_name))
+            for field_name, options in self._response_options.items()
+        }
+        if any(codes[field_name] == 0 for field_name in FALLBACK_FIELDS):
+            return None
+
+        c5 = _code(engine.decisiones.options, responses.toma_decisiones)
+        c8 = _code(engine.integracion.options, responses.compartir_informacion)
+        c_fact = _code(FACTURACION_OPCIONES, prospect_info.facturacion_rango)
+        c_emp = _code(EMPLEADOS_OPCIONES, prospect_info.empleados_rango)
+        c_sector = _code(SECTORES, prospect_info.sector)
+        motivacion = engine.encode_motivacion(responses.motivacion)
+
+        r6, r7, r8 = self._madurez_radix
+        madurez = a["madurez"][((c5 * r6 + codes["procesos_criticos"]) * r7 + codes["tareas_repetitivas"]) * r8 + c8]
+        r11, rf, re = self._capacidad_radix
+        capacidad = a["capacidad"][((codes["presupuesto_rango"] * r11 + codes["inversion_reciente"]) * rf + c_fact) * re + c_emp]
+        r13, r14 = self._viabilidad_radix
+        viabilidad = a["viabilidad"][(codes["frustracion_principal"] * r13 + codes["urgencia"]) * r14 + codes["proceso_aprobacion"]]
+
+        madurez_total = int(madurez.sum())
+        capacidad_total = int(capacidad.sum())
+        viabilidad_total = int(viabilidad.sum())
+        urgencia_real = int(viabilidad[1])
+        score_final = min(100, madurez_total + capacidad_total + viabilidad_total + int(a["bonus"][motivacion]))
+
+        mask = (
+            int(a["mask_sector"][c_sector])
+            | int(a["mask_tamano"][c_fact * re + c_emp])
+            | int(a["mask_motivacion"][motivacion])
+            | int(a["mask_madurez"][madurez_total])
+            | int(a["mask_capacidad"][capacidad_total])
+            | int(a["mask_viabilidad"][viabilidad_total])
+            | int(a["mask_urgencia_real"][urgencia_real])
+            | int(a["mask_score_final"][score_final])
+        )
+        for field_name, code in codes.items():
+            mask |= int(a[f"mask_{field_name}"][code])
+
+        if score_final >= 70:
+            tier = Tier.A
+        elif score_final >= 40:
+            tier = Tier.B
+        else:
+            tier = Tier.C
+
+        score = DiagnosticScore(
+            madurez_digital=MadurezDigital(*(int(x) for x in madurez)),
+            capacidad_inversion=CapacidadInversion(*(int(x) for x in capacidad)),
+            viabilidad_comercial=ViabilidadComercial(*(int(x) for x in viabilidad)),
+            score_final=score_final,
+            tier=tier,
+            confianza_clasificacion=float(
+                a["confidence"][(mask >> CONFIDENCE_SHIFT) & ((1 << len(CONFIDENCE_CONDITIONS)) - 1)]
+            )
+        )
+
+        # Arquetipo: ranking completo con el mismo desempate que classify()
+        arquetipo = self.classifier.build_arquetipo({
+            archetype: float(a["archetype_points"][i, (mask >> (i * SLOT_BITS)) & ((1 << SLOT_BITS) - 1)])
+            for i, archetype in enumerate(ARCHETYPE_ORDER)
+        })
+
+        quick_wins = [
+            QuickWin(**self.quick_wins_catalog[i])
+            for i in a["quick_wins"][
+                codes["frustracion_principal"],
+                int(madurez[0] <= 5),
+                int(madurez[2] <= 5)
+            ]
+            if i >= 0
+        ]
+
+        return score, arquetipo, quick_wins
+
+
+def verify_tables(tables: AnswerTables, samples: int, seed: int = 7) -> int:
+    """Comparar lookup vs reglas en respuestas aleatorias; retorna cantidad de diferencias"""
+    rng = random.Random(seed)
+    engine = scoring_engine
+    classifier = archetype_classifier
+    insights = InsightGenerator()
+    motivaciones = list(engine.motivacion_opciones) + ["Otra motivación"]
+
+    def pick(options: Tuple[str, ...], extra: str = "Otro: texto libre") -> str:
+        return rng.choice(list(options) + [extra, ""])
+
+    mismatches = 0
+    for _ in range(samples):
+        prospect_info = ProspectInfo(
+            nombre_empresa="", sector=pick(SECTORES, "Tecnología"),
+            facturacion_rango=pick(FACTURACION_OPCIONES), empleados_rango=pick(EMPLEADOS_OPCIONES),
+            contacto_nombre="", contacto_email="", contacto_telefono="", cargo="", ciudad=""
+        )
+        responses = DiagnosticResponses(
+            motivacion=rng.sample(motivaciones, rng.randint(0, 3)),
+            **{
+                field_name: pick(engine.table[question_id].options)
+                for question_id, field_name in (
+                    ("Q5", "toma_decisiones"), ("Q6", "procesos_criticos"),
+                    ("Q7", "tareas_repetitivas"), ("Q8", "compartir_informacion"),
+                    ("Q9", "equipo_tecnico"), ("Q10", "capacidad_implementacion"),
+                    ("Q11", "inversion_reciente"), ("Q12", "frustracion_principal"),
+                    ("Q13", "urgencia"), ("Q14", "proceso_aprobacion"),
+                    ("Q15", "presupuesto_rango")
+                )
+            }
+        )
+
+        looked_up = tables.lookup(responses, prospect_info)
+        if looked_up is None:
+            continue
+
+        score = engine.calculate_full_score(responses, prospect_info)
+        arquetipo = classifier.classify(score, responses, prospect_info)
+        quick_wins = insights.generate_quick_wins(score, responses, arquetipo)
+
+        if looked_up != (score, arquetipo, quick_wins):
+            mismatches += 1
+
+    return mismatches
+
+
+# ==================================================
+# API
+# ==================================================
+def evaluate_diagnostic(
+    responses: DiagnosticResponses,
+    prospect_info: ProspectInfo,
+    timings: Optional[Dict[str, float]] = None
+) -> Tuple[DiagnosticScore, Arquetipo, List[QuickWin]]:
+    """
+    Score, arquetipo y quick wins: lookup en tablas, o reglas si no aplica
+
+    timings: si se pasa, se llena con segundos por etapa (answer_tables, o
+    scoring / classification / insights cuando se usan las reglas)
+    """
+    start = time.perf_counter()
+    if answer_tables is not None:
+        result = answer_tables.lookup(responses, prospect_info)
+        if result is not None:
+            if timings is not None:
+                timings["answer_tables"] = time.perf_counter() - start
+            return result
+
+    start = time.perf_counter()
+    score = scoring_engine.calculate_full_score(responses, prospect_info)
+    scored = time.perf_counter()
+    arquetipo = archetype_classifier.classify(score, responses, prospect_info)
+    classified = time.perf_counter()
+    quick_wins = _insights.generate_quick_wins(score, responses, arquetipo)
+
+    if timings is not None:
+        timings["scoring"] = scored - start
+        timings["classification"] = classified - scored
+        timings["insights"] = time.perf_counter() - classified
+    return score, arquetipo, quick_wins
+
+
+_insights = InsightGenerator()
+
+# Singleton global del proceso (None si no hay tablas vigentes)
+answer_tables = AnswerTables.load()
+
+
+if __name__ == '__main__':
+    import sys
+
+    if len(sys.argv) < 2 or sys.argv[1] != "build":
+        print("Uso: python -m core.answer_tables build")
+        sys.exit(1)
+
+    build_tables()
@@ -3,208 +3,331 @@ Clasificador de arquetipos y generador de insights
 Identifica el perfil del prospecto y genera recomendaciones estratégicas
 """
 
-from typing import List, Dict, Tuple
+import json
+from dataclasses import dataclass
+from typing import Any, Callable, List, Dict, Optional, Tuple
+
+import numpy as np
+
 from core.models import (
-    DiagnosticScore, DiagnosticResponses, ProspectInfo,
-    Arquetipo, QuickWin, RedFlag, Insight, ReunionPrep
+    DiagnosticScore, DiagnosticResponses, ProspectInfo, Tier,
+    MadurezDigital, CapacidadInversion, ViabilidadComercial,
+    Arquetipo, ArquetipoDefinicion, QuickWin, RedFlag, Insight, ReunionPrep,
+    definicion_compartida
 )
+from core.close_model import close_model
+from core.insight_rules import insight_rules
+
+COMPETIDORES = "Mis competidores están usando IA y me están dejando atrás"
+CURIOSIDAD = "Curiosidad / exploración general"
+
+# ==================================================
+# CONDICIONES POR ARQUETIPO
+# ==================================================
+# Única definición de las reglas: classify las evalúa por lead y
+# classify_batch como matriz; backend/test_classifier_matrix.py verifica
+# que coinciden fila por fila.
+# Cada condición lee un solo factor: (peso, factor, predicado)
+# Factores: sector, tamano=(facturacion, empleados), motivacion (lista),
+# campos de DiagnosticResponses y totales de score (int)
+Condition = Tuple[float, str, Callable[[Any], bool]]
+
+ARCHETYPE_CONDITIONS: Dict[str, List[Condition]] = {
+    "traditional_giant": [
+        (0.3, "sector", lambda s: s in ["🏦 Banca", "🛡️ Seguros"]),
+        (0.2, "tamano", lambda t: t[0] in ["$2,000M - $10,000M COP", "Más de $10,000M COP"]),
+        (0.2, "madurez", lambda m: 20 <= m <= 30),
+        (0.2, "motivacion", lambda m: COMPETIDORES in m),
+        (0.1, "capacidad", lambda c: c >= 20)
+    ],
+    "ambitious_scaler": [
+        (0.3, "sector", lambda s: s in ["🛒 Retail", "💼 Servicios Profesionales", "🚚 Logística/Transporte"]),
+        (0.2, "tamano", lambda t: t[0] in ["$500M - $2,000M COP", "$2,000M - $10,000M COP"]),
+        (0.3, "frustracion_principal", lambda r: r == "No puedo escalar sin contratar más gente"),
+        (0.1, "inversion_reciente", lambda r: "Sí, inversiones" in r),
+        (0.1, "urgencia_real", lambda u: u >= 7)
+    ],
+    "digital_beginner": [
+        (0.4, "madurez", lambda m: m <= 20),
+        (0.2, "inversion_reciente", lambda r: r == "No, seguimos con lo mismo de siempre"),
+        (0.2, "procesos_criticos", lambda r: "no sabe" in r.lower() or "cambian" in r.lower()),
+        (0.2, "sector", lambda s: s in ["🏭 Manufactura", "🏛️ Gobierno", "🏗️ Construcción"])
+    ],
+    "innovation_theater": [
+        (0.4, "motivacion", lambda m: m == [CURIOSIDAD]),
+        (0.3, "urgencia", lambda r: r in ["Exploración, sin apuro", "Solo estoy mirando opciones"]),
+        (0.2, "presupuesto_rango", lambda r: r == "Prefiero no decirlo / No lo sé aún"),
+        (0.1, "viabilidad", lambda v: v <= 15)
+    ],
+    "distressed_fighter": [
+        (0.3, "urgencia", lambda r: r == "Muy urgente, necesito resolver ya (próximos 3 meses)"),
+        (0.2, "frustracion_principal", lambda r: r in ["Perdemos clientes por servicio lento", "Los costos operativos están muy altos"]),
+        (0.3, "motivacion", lambda m: COMPETIDORES in m),
+        (0.2, "capacidad", lambda c: c >= 15)
+    ],
+    "tire_kicker": [
+        (0.4, "score_final", lambda s: s < 30),
+        (0.2, "presupuesto_rango", lambda r: r == "Menos de $10M COP"),
+        (0.2, "proceso_aprobacion", lambda r: r == "Varias personas (complejo)"),
+        (0.2, "tamano", lambda t: t[0] == "Menos de $500M COP" and t[1] == "1-20")
+    ]
+}
+
+ARCHETYPE_ORDER = tuple(ARCHETYPE_CONDITIONS)
+
+# Margen ganador-segundo bajo el cual la reunión también prepara el segundo arquetipo
+MARGEN_AMBIGUO = 0.2
+
+# Columnas de la matriz de features: una por (arquetipo, condición)
+FEATURE_COLUMNS = [
+    (archetype, j)
+    for archetype in ARCHETYPE_ORDER
+    for j in range(len(ARCHETYPE_CONDITIONS[archetype]))
+]
+
+# Factores que salen de los scores (BatchScores) en vez de las respuestas
+_SCORE_FACTORS = {
+    "madurez": "madurez_digital",
+    "capacidad": "capacidad_inversion",
+    "viabilidad": "viabilidad_comercial",
+    "urgencia_real": "urgencia_real",
+    "score_final": "score_final"
+}
+
+
+@dataclass
+class BatchClassification:
+    """Resultado de classify_batch"""
+    tipo: np.ndarray          # (N,) arquetipo ganador
+    confianza: np.ndarray     # (N,) puntaje del ganador
+    margen: np.ndarray        # (N,) puntaje del ganador - puntaje del segundo
+    scores: np.ndarray        # (N, 6) puntaje por arquetipo (columnas ARCHETYPE_ORDER)
+    order: np.ndarray         # (N, 6) índices de arquetipo de mayor a menor puntaje
+
+    def __len__(self) -> int:
+        return len(self.tipo)
+
+    def ranking(self, i: int) -> Tuple[Tuple[str, float], ...]:
+        """Ranking (tipo, puntaje) de la fila i, mismo formato que Arquetipo.ranking"""
+        return tuple(
+            (ARCHETYPE_ORDER[j], float(self.scores[i, j])) for j in self.order[i]
+        )
+
+
+def _load_archetype_definitions() -> Dict[str, ArquetipoDefinicion]:
+    """Definiciones de los 6 arquetipos (se cargan una sola vez por proceso)"""
+    definitions = {
+        "traditional_giant": {
+            "nombre": "🏦 Traditional Giant",
+            "descripcion": "Empresa grande tradicional con sistemas legacy, bajo presión competitiva",
+            "frustraciones": [
+                "Todo demora semanas en implementarse",
+                "Sistemas no hablan entre sí",
+                "Perdemos clientes por servicio lento",
+                "Competidores más ágiles nos están ganando"
+            ],
+            "motivadores": [
+                "Sobrevivencia competitiva",
+                "Mandato de junta directiva",
+                "Presión regulatoria",
+                "Amenaza de fintechs/startups"
+            ],
+            "objeciones": [
+                "¿Cuánto riesgo tiene esto?",
+                "¿Ya está probado en el sector?",
+                "¿Cuánto tiempo toma?",
+                "¿Qué pasa con nuestros sistemas actuales?"
+            ],
+            "enfoque": [
+                "Mostrar casos de éxito en su sector",
+                "Cuantificar ROI específicamente",
+                "Implementación gradual y de bajo riesgo",
+                "Énfasis en seguridad y compliance",
+                "Integración con sistemas legacy"
+            ],
+            "punto_entrada": "Automatización de procesos back-office críticos",
+            "potencial": "$$$"
+        },
+        "ambitious_scaler": {
+            "nombre": "📈 Ambitious Scaler",
+            "descripcion": "Empresa en crecimiento que no logra escalar operaciones",
+            "frustraciones": [
+                "No puedo crecer sin contratar más gente",
+                "Los márgenes se están reduciendo con el crecimiento",
+                "Procesos manuales nos limitan",
+                "Cometemos errores por ir muy rápido"
+            ],
+            "motivadores": [
+                "Alcanzar objetivos de crecimiento",
+                "Mantener márgenes rentables",
+                "Superar al líder del mercado",
+                "Prepararse para ronda de inversión"
+            ],
+            "objeciones": [
+                "¿Puedo implementar esto rápido?",
+                "¿Funcionará con mi crecimiento acelerado?",
+                "¿Cuánto tiempo de mi equipo necesita?",
+                "¿Y si cambian mis necesidades?"
+            ],
+            "enfoque": [
+                "Velocidad de implementación",
+                "Automatización de procesos que frenan crecimiento",
+                "Quick wins visibles en 60-90 días",
+                "Arquitectura escalable",
+                "ROI en reducción de contrataciones"
+            ],
+            "punto_entrada": "Automatización de operaciones core (pedidos, inventario, atención)",
+            "potencial": "$$"
+        },
+        "digital_beginner": {
+            "nombre": "🐣 Digital Beginner",
+            "descripcion": "Empresa tradicional con procesos manuales, iniciando transformación",
+            "frustraciones": [
+                "Todo es manual y lento",
+                "No tenemos visibilidad de la operación",
+                "Dependemos de personas clave",
+                "Cometemos muchos errores"
+            ],
+            "motivadores": [
+                "Modernización necesaria",
+                "Cambio generacional en liderazgo",
+                "Presión de clientes por mejores servicios",
+                "Reducción de costos operativos"
+            ],
+            "objeciones": [
+                "¿Mi equipo podrá adaptarse?",
+                "¿No es muy costoso?",
+                "¿Realmente necesitamos IA?",
+                "¿Por dónde empezamos?"
+            ],
+            "enfoque": [
+                "Educación en transformación digital primero",
+                "Empezar con digitalización básica",
+                "Cambio cultural y gestión del cambio",
+                "Hitos pequeños y frecuentes",
+                "Capacitación intensiva del equipo"
+            ],
+            "punto_entrada": "Digitalización de procesos críticos + BI básico",
+            "potencial": "$"
+        },
+        "innovation_theater": {
+            "nombre": "🎭 Innovation Theater",
+            "descripcion": "Buscan 'hacer IA' sin problema claro, riesgo alto",
+            "frustraciones": [
+                "Tenemos que innovar",
+                "Todos hablan de IA",
+                "No queremos quedarnos atrás",
+                "La competencia ya tiene IA"
+            ],
+            "motivadores": [
+                "Presión de stakeholders",
+                "FOMO (Fear of Missing Out)",
+                "Marketing / relaciones públicas",
+                "Experimentación sin ROI claro"
+            ],
+            "objeciones": [
+                "¿Podemos hacerlo más barato?",
+                "¿Qué pueden hacer otras consultoras?",
+                "¿Incluye el desarrollo completo?",
+                "¿No podemos solo hacer un piloto?"
+            ],
+            "enfoque": [
+                "Calificar muy bien antes de invertir tiempo",
+                "Alinear expectativas con realidad",
+                "Definir problema específico primero",
+                "Propuesta educativa (workshop) en vez de proyecto",
+                "Evitar compromisos de largo plazo"
+            ],
+            "punto_entrada": "Diagnóstico $12K para validar si hay caso de negocio real",
+            "potencial": "⚠️"
+        },
+        "distressed_fighter": {
+            "nombre": "⚔️ Distressed Fighter",
+            "descripcion": "Bajo presión competitiva extrema, necesita ROI inmediato",
+            "frustraciones": [
+                "Estamos perdiendo participación de mercado",
+                "Los competidores son más eficientes",
+                "Nuestros costos son muy altos",
+                "Clientes se están yendo"
+            ],
+            "motivadores": [
+                "Sobrevivencia",
+                "Recuperar competitividad",
+                "Reducción drástica de costos",
+                "Retener clientes clave"
+            ],
+            "objeciones": [
+                "¿Cuánto tiempo tarda en dar resultados?",
+                "¿El ROI es garantizado?",
+                "¿Podemos pagar en hitos?",
+                "¿Qué pasa si no funciona?"
+            ],
+            "enfoque": [
+                "ROI medible y rápido (90 días)",
+                "Enfoque en reducción de costos inmediata",
+                "Quick wins antes que transformación",
+                "Modelo de pago por resultados si es posible",
+                "Evaluar viabilidad financiera del cliente"
+            ],
+            "punto_entrada": "Automatización de proceso más costoso",
+            "potencial": "$$"
+        },
+        "tire_kicker": {
+            "nombre": "🚫 Tire Kicker",
+            "descripcion": "Solo cotizando, sin presupuesto ni urgencia real",
+            "frustraciones": [
+                "Curiosidad general",
+                "Tarea asignada por jefe",
+                "Comparando opciones sin compromiso",
+                "Estudiante/investigador disfrazado"
+            ],
+            "motivadores": [
+                "Cumplir con tarea asignada",
+                "Educación personal",
+                "Benchmark de mercado",
+                "Posible futuro (sin timeline)"
+            ],
+            "objeciones": [
+                "Todo objeción es válida",
+                "No hay urgencia real",
+                "Probablemente no llegue a contratar"
+            ],
+            "enfoque": [
+                "NO invertir tiempo en reuniones 1-on-1",
+                "Respuesta automatizada con recursos",
+                "Invitar a webinar/workshop grupal",
+                "Nutrir para largo plazo (newsletter)"
+            ],
+            "punto_entrada": "Ninguno - Descalificar cortésmente",
+            "potencial": "🚫"
+        }
+    }
+
+    return {
+        tipo: definicion_compartida(
+            tipo,
+            arch_def["nombre"],
+            arch_def["descripcion"],
+            tuple(arch_def["frustraciones"]),
+            tuple(arch_def["motivadores"]),
+            tuple(arch_def["objeciones"]),
+            tuple(arch_def["enfoque"]),
+            arch_def["punto_entrada"],
+            arch_def["potencial"]
+        )
+        for tipo, arch_def in definitions.items()
+    }
+
+
+# Definiciones compartidas e inmutables
+ARQUETIPOS = _load_archetype_definitions()
 
 
 class ArchetypeClassifier:
     """Clasificador de arquetipos empresariales"""
 
     def __init__(self):
-        self._init_archetype_definitions()
-
-    def _init_archetype_definitions(self):
-        """Definir características de cada arquetipo"""
-
-        self.archetypes = {
-            "traditional_giant": {
-                "nombre": "🏦 Traditional Giant",
-                "descripcion": "Empresa grande tradicional con sistemas legacy, bajo presión competitiva",
-                "frustraciones": [
-                    "Todo demora semanas en implementarse",
-                    "Sistemas no hablan entre sí",
-                    "Perdemos clientes por servicio lento",
-                    "Competidores más ágiles nos están ganando"
-                ],
-                "motivadores": [
-                    "Sobrevivencia competitiva",
-                    "Mandato de junta directiva",
-                    "Presión regulatoria",
-                    "Amenaza de fintechs/startups"
-                ],
-                "objeciones": [
-                    "¿Cuánto riesgo tiene esto?",
-                    "¿Ya está probado en el sector?",
-                    "¿Cuánto tiempo toma?",
-                    "¿Qué pasa con nuestros sistemas actuales?"
-                ],
-                "enfoque": [
-                    "Mostrar casos de éxito en su sector",
-                    "Cuantificar ROI específicamente",
-                    "Implementación gradual y de bajo riesgo",
-                    "Énfasis en seguridad y compliance",
-                    "Integración con sistemas legacy"
-                ],
-                "punto_entrada": "Automatización de procesos back-office críticos",
-                "potencial": "$$$"
-            },
-            "ambitious_scaler": {
-                "nombre": "📈 Ambitious Scaler",
-                "descripcion": "Empresa en crecimiento que no logra escalar operaciones",
-                "frustraciones": [
-                    "No puedo crecer sin contratar más gente",
-                    "Los márgenes se están reduciendo con el crecimiento",
-                    "Procesos manuales nos limitan",
-                    "Cometemos errores por ir muy rápido"
-                ],
-                "motivadores": [
-                    "Alcanzar objetivos de crecimiento",
-                    "Mantener márgenes rentables",
-                    "Superar al líder del mercado",
-                    "Prepararse para ronda de inversión"
-                ],
-                "objeciones": [
-                    "¿Puedo implementar esto rápido?",
-                    "¿Funcionará con mi crecimiento acelerado?",
-                    "¿Cuánto tiempo de mi equipo necesita?",
-                    "¿Y si cambian mis necesidades?"
-                ],
-                "enfoque": [
-                    "Velocidad de implementación",
-                    "Automatización de procesos que frenan crecimiento",
-                    "Quick wins visibles en 60-90 días",
-                    "Arquitectura escalable",
-                    "ROI en reducción de contrataciones"
-                ],
-                "punto_entrada": "Automatización de operaciones core (pedidos, inventario, atención)",
-                "potencial": "$$"
-            },
-            "digital_beginner": {
-                "nombre": "🐣 Digital Beginner",
-                "descripcion": "Empresa tradicional con procesos manuales, iniciando transformación",
-                "frustraciones": [
-                    "Todo es manual y lento",
-                    "No tenemos visibilidad de la operación",
-                    "Dependemos de personas clave",
-                    "Cometemos muchos errores"
-                ],
-                "motivadores": [
-                    "Modernización necesaria",
-                    "Cambio generacional en liderazgo",
-                    "Presión de clientes por mejores servicios",
-                    "Reducción de costos operativos"
-                ],
-                "objeciones": [
-                    "¿Mi equipo podrá adaptarse?",
-                    "¿No es muy costoso?",
-                    "¿Realmente necesitamos IA?",
-                    "¿Por dónde empezamos?"
-                ],
-                "enfoque": [
-                    "Educación en transformación digital primero",
-                    "Empezar con digitalización básica",
-                    "Cambio cultural y gestión del cambio",
-                    "Hitos pequeños y frecuentes",
-                    "Capacitación intensiva del equipo"
-                ],
-                "punto_entrada": "Digitalización de procesos críticos + BI básico",
-                "potencial": "$"
-            },
-            "innovation_theater": {
-                "nombre": "🎭 Innovation Theater",
-                "descripcion": "Buscan 'hacer IA' sin problema claro, riesgo alto",
-                "frustraciones": [
-                    "Tenemos que innovar",
-                    "Todos hablan de IA",
-                    "No queremos quedarnos atrás",
-                    "La competencia ya tiene IA"
-                ],
-                "motivadores": [
-                    "Presión de stakeholders",
-                    "FOMO (Fear of Missing Out)",
-                    "Marketing / relaciones públicas",
-                    "Experimentación sin ROI claro"
-                ],
-                "objeciones": [
-                    "¿Podemos hacerlo más barato?",
-                    "¿Qué pueden hacer otras consultoras?",
-                    "¿Incluye el desarrollo completo?",
-                    "¿No podemos solo hacer un piloto?"
-                ],
-                "enfoque": [
-                    "Calificar muy bien antes de invertir tiempo",
-                    "Alinear expectativas con realidad",
-                    "Definir problema específico primero",
-                    "Propuesta educativa (workshop) en vez de proyecto",
-                    "Evitar compromisos de largo plazo"
-                ],
-                "punto_entrada": "Diagnóstico $12K para validar si hay caso de negocio real",
-                "potencial": "⚠️"
-            },
-            "distressed_fighter": {
-                "nombre": "⚔️ Distressed Fighter",
-                "descripcion": "Bajo presión competitiva extrema, necesita ROI inmediato",
-                "frustraciones": [
-                    "Estamos perdiendo participación de mercado",
-                    "Los competidores son más eficientes",
-                    "Nuestros costos son muy altos",
-                    "Clientes se están yendo"
-                ],
-                "motivadores": [
-                    "Sobrevivencia",
-                    "Recuperar competitividad",
-                    "Reducción drástica de costos",
-                    "Retener clientes clave"
-                ],
-                "objeciones": [
-                    "¿Cuánto tiempo tarda en dar resultados?",
-                    "¿El ROI es garantizado?",
-                    "¿Podemos pagar en hitos?",
-                    "¿Qué pasa si no funciona?"
-                ],
-                "enfoque": [
-                    "ROI medible y rápido (90 días)",
-                    "Enfoque en reducción de costos inmediata",
-                    "Quick wins antes que transformación",
-                    "Modelo de pago por resultados si es posible",
-                    "Evaluar viabilidad financiera del cliente"
-                ],
-                "punto_entrada": "Automatización de proceso más costoso",
-                "potencial": "$$"
-            },
-            "tire_kicker": {
-                "nombre": "🚫 Tire Kicker",
-                "descripcion": "Solo cotizando, sin presupuesto ni urgencia real",
-                "frustraciones": [
-                    "Curiosidad general",
-                    "Tarea asignada por jefe",
-                    "Comparando opciones sin compromiso",
-                    "Estudiante/investigador disfrazado"
-                ],
-                "motivadores": [
-                    "Cumplir con tarea asignada",
-                    "Educación personal",
-                    "Benchmark de mercado",
-                    "Posible futuro (sin timeline)"
-                ],
-                "objeciones": [
-                    "Todo objeción es válida",
-                    "No hay urgencia real",
-                    "Probablemente no llegue a contratar"
-                ],
-                "enfoque": [
-                    "NO invertir tiempo en reuniones 1-on-1",
-                    "Respuesta automatizada con recursos",
-                    "Invitar a webinar/workshop grupal",
-                    "Nutrir para largo plazo (newsletter)"
-                ],
-                "punto_entrada": "Ninguno - Descalificar cortésmente",
-                "potencial": "🚫"
-            }
-        }
+        self.archetypes = ARQUETIPOS
 
     def classify(
         self,
@@ -212,215 +335,211 @@ class ArchetypeClassifier:
         responses: DiagnosticResponses,
         prospect_info: ProspectInfo
     ) -> Arquetipo:
-        """Clasificar arquetipo basado en score y respuestas"""
+        """Clasificar arquetipo basado en score y respuestas (condiciones de ARCHETYPE_CONDITIONS)"""
+        factors = {
+            "sector": prospect_info.sector,
+            "tamano": (prospect_info.facturacion_rango, prospect_info.empleados_rango),
+            "motivacion": list(responses.motivacion),
+            "madurez": score.madurez_digital.score_total,
+            "capacidad": score.capacidad_inversion.score_total,
+            "viabilidad": score.viabilidad_comercial.score_total,
+            "urgencia_real": score.viabilidad_comercial.urgencia_real,
+            "score_final": score.score_final
+        }
 
-        # Scores de compatibilidad con cada arquetipo
+        # Scores de compatibilidad con cada arquetipo: pesos sumados en el
+        # orden de las condiciones, tope 1.0 (igual que classify_batch)
         archetype_scores = {}
+        for archetype, conditions in ARCHETYPE_CONDITIONS.items():
+            points = 0.0
+            for weight, factor, predicate in conditions:
+                value = factors[factor] if factor in factors else getattr(responses, factor)
+                if predicate(value):
+                    points += weight
+            archetype_scores[archetype] = min(1.0, points)
+
+        return self.build_arquetipo(archetype_scores)
+
+    def build_arquetipo(self, archetype_scores: Dict[str, float]) -> Arquetipo:
+        """
+        Resultado por lead a partir del puntaje de cada arquetipo
+
+        Ranking completo de mayor a menor; los empates se resuelven por
+        ARCHETYPE_ORDER (sort estable), igual que el argmax de classify_batch.
+        Ganador = primero del ranking, margen = ganador - segundo.
+        """
+        ranking = tuple(sorted(
+            ((tipo, archetype_scores[tipo]) for tipo in ARCHETYPE_ORDER),
+            key=lambda item: -item[1]
+        ))
+        best_archetype, confidence = ranking[0]
 
-        # TRADITIONAL GIANT
-        archetype_scores["traditional_giant"] = self._score_traditional_giant(
-            score, responses, prospect_info
-        )
-
-        # AMBITIOUS SCALER
-        archetype_scores["ambitious_scaler"] = self._score_ambitious_scaler(
-            score, responses, prospect_info
-        )
-
-        # DIGITAL BEGINNER
-        archetype_scores["digital_beginner"] = self._score_digital_beginner(
-            score, responses, prospect_info
-        )
-
-        # INNOVATION THEATER
-        archetype_scores["innovation_theater"] = self._score_innovation_theater(
-            score, responses, prospect_info
-        )
-
-        # DISTRESSED FIGHTER
-        archetype_scores["distressed_fighter"] = self._score_distressed_fighter(
-            score, responses, prospect_info
+        return Arquetipo(
+            definicion=self.archetypes[best_archetype],
+            confianza=confidence,
+            ranking=ranking,
+            margen=confidence - ranking[1][1]
         )
 
-        # TIRE KICKER
-        archetype_scores["tire_kicker"] = self._score_tire_kicker(
-            score, responses, prospect_info
+    # ==================================================
+    # CLASIFICACIÓN BATCH (forma matricial)
+    # ==================================================
+    @property
+    def weight_matrix(self) -> np.ndarray:
+        """Matriz (features, arquetipos): peso de cada condición en su arquetipo"""
+        weights = np.zeros((len(FEATURE_COLUMNS), len(ARCHETYPE_ORDER)))
+        for f, (archetype, j) in enumerate(FEATURE_COLUMNS):
+            weights[f, ARCHETYPE_ORDER.index(archetype)] = ARCHETYPE_CONDITIONS[archetype][j][0]
+        return weights
+
+    def feature_matrix(self, rows: Any, scores: Any) -> np.ndarray:
+        """
+        Matriz binaria (N, features) de condiciones cumplidas
+
+        rows: DataFrame o lista de dicts con las columnas del worksheet
+        responses (incluye sector, facturacion_rango, empleados_rango).
+        scores: BatchScores de ScoringEngine.score_batch para las mismas filas.
+        Cada predicado se evalúa una vez por valor distinto de su factor.
+        """
+        if hasattr(rows, "to_dict"):
+            rows = rows.to_dict("records")
+
+        factor_values: Dict[str, List[Any]] = {}
+
+        def values_for(factor: str) -> List[Any]:
+            if factor not in factor_values:
+                if factor in _SCORE_FACTORS:
+                    factor_values[factor] = getattr(scores, _SCORE_FACTORS[factor]).tolist()
+                elif factor == "tamano":
+                    factor_values[factor] = [
+                        (row.get("facturacion_rango"), row.get("empleados_rango")) for row in rows
+                    ]
+                elif factor == "motivacion":
+                    factor_values[factor] = [_motivacion_key(row.get("motivacion")) for row in rows]
+                else:
+                    factor_values[factor] = [row.get(factor) for row in rows]
+            return factor_values[factor]
+
+        features = np.zeros((len(rows), len(FEATURE_COLUMNS)), dtype=bool)
+        for f, (archetype, j) in enumerate(FEATURE_COLUMNS):
+            _, factor, predicate = ARCHETYPE_CONDITIONS[archetype][j]
+            if factor == "motivacion":
+                predicate = _on_list(predicate)
+
+            cache: Dict[Any, bool] = {}
+            for i, value in enumerate(values_for(factor)):
+                if value not in cache:
+                    cache[value] = bool(predicate(value))
+                features[i, f] = cache[value]
+
+        return features
+
+    def classify_batch(self, rows: Any, scores: Any) -> BatchClassification:
+        """
+        Clasificar N prospectos: features @ pesos, tope 1.0 y ranking
+
+        El producto se acumula feature por feature en el orden de las
+        condiciones, así cada puntaje suma los mismos pesos en el mismo
+        orden que classify y los empates se resuelven igual que classify()
+        (primer arquetipo con el máximo).
+        """
+        features = self.feature_matrix(rows, scores)
+        weights = self.weight_matrix
+
+        archetype_scores = np.zeros((len(features), len(ARCHETYPE_ORDER)))
+        for f in range(len(FEATURE_COLUMNS)):
+            archetype_scores += np.outer(features[:, f], weights[f])
+        archetype_scores = np.minimum(1.0, archetype_scores)
+
+        # Sort estable: empates por ARCHETYPE_ORDER, igual que build_arquetipo
+        order = np.argsort(-archetype_scores, axis=1, kind="stable")
+        ranked = np.take_along_axis(archetype_scores, order, axis=1)
+        return BatchClassification(
+            tipo=np.array(ARCHETYPE_ORDER)[order[:, 0]],
+            confianza=ranked[:, 0],
+            margen=ranked[:, 0] - ranked[:, 1],
+            scores=archetype_scores,
+            order=order
         )
 
-        # Seleccionar el arquetipo con mayor score
-        best_archetype = max(archetype_scores, key=archetype_scores.get)
-        confidence = archetype_scores[best_archetype]
 
-        arch_def = self.archetypes[best_archetype]
-
-        return Arquetipo(
-            tipo=best_archetype,
-            nombre=arch_def["nombre"],
-            descripcion=arch_def["descripcion"],
-            frustraciones_tipicas=arch_def["frustraciones"],
-            motivadores=arch_def["motivadores"],
-            objeciones_esperadas=arch_def["objeciones"],
-            enfoque_comercial=arch_def["enfoque"],
-            punto_entrada_ideal=arch_def["punto_entrada"],
-            potencial_expansion=arch_def["potencial"],
-            confianza=confidence
+def _motivacion_key(value: Any) -> Tuple[str, ...]:
+    """Motivaciones como tupla (lista o texto separado por comas del worksheet)"""
+    if isinstance(value, str):
+        return tuple(m.strip() for m in value.split(",") if m.strip())
+    if isinstance(value, (list, tuple)):
+        return tuple(value)
+    return ()
+
+
+def _on_list(predicate: Callable[[Any], bool]) -> Callable[[Tuple[str, ...]], bool]:
+    """Los predicados de motivación comparan contra listas (ej. == [CURIOSIDAD])"""
+    return lambda key: predicate(list(key))
+
+
+def _row_number(value: Any) -> float:
+    """Valor numérico de una celda de Sheets ('45', 45, '0.8', '') -> float"""
+    try:
+        return float(str(value).replace("%", "").strip()) if value not in (None, "") else 0.0
+    except ValueError:
+        return 0.0
+
+
+def _score_from_row(row: Dict[str, Any]) -> DiagnosticScore:
+    """DiagnosticScore guardado en una fila del worksheet scores"""
+    def value(column: str) -> int:
+        return int(_row_number(row.get(column)))
+
+    return DiagnosticScore(
+        madurez_digital=MadurezDigital(
+            decisiones_basadas_datos=value("madurez_decisiones"),
+            procesos_estandarizados=value("madurez_procesos"),
+            sistemas_integrados=value("madurez_integracion"),
+            eficiencia_operativa=value("madurez_eficiencia"),
+            score_total=value("madurez_digital_total")
+        ),
+        capacidad_inversion=CapacidadInversion(
+            presupuesto_disponible=value("capacidad_presupuesto"),
+            historial_inversion=value("capacidad_historial"),
+            tamano_empresa=value("capacidad_tamano"),
+            score_total=value("capacidad_inversion_total")
+        ),
+        viabilidad_comercial=ViabilidadComercial(
+            problema_claro=value("viabilidad_problema"),
+            urgencia_real=value("viabilidad_urgencia"),
+            poder_decision=value("viabilidad_decision"),
+            score_total=value("viabilidad_total")
+        ),
+        score_final=value("score_final"),
+        tier=Tier(str(row.get("tier") or "C")),
+        confianza_clasificacion=_row_number(row.get("confianza_clasificacion"))
+    )
+
+
+def _arquetipo_from_row(row: Dict[str, Any]) -> Arquetipo:
+    """Arquetipo guardado en una fila de scores (ranking vacío en filas antiguas)"""
+    tipo = str(row.get("arquetipo_tipo") or "")
+    if tipo not in ARQUETIPOS:
+        raise ValueError(f"Arquetipo desconocido en la fila de scores: '{tipo}'")
+
+    try:
+        ranking = tuple(
+            (str(tipo_rank), float(puntaje))
+            for tipo_rank, puntaje in json.loads(row.get("arquetipo_ranking") or "{}").items()
         )
+    except (TypeError, ValueError, AttributeError):
+        ranking = ()
 
-    def _score_traditional_giant(
-        self, score, responses, prospect_info
-    ) -> float:
-        """Score de compatibilidad con Traditional Giant (0.0-1.0)"""
-        points = 0.0
-
-        # Sector típico
-        if prospect_info.sector in ["🏦 Banca", "🛡️ Seguros"]:
-            points += 0.3
-
-        # Tamaño grande
-        if prospect_info.facturacion_rango in ["$2,000M - $10,000M COP", "Más de $10,000M COP"]:
-            points += 0.2
-
-        # Madurez digital media (tienen sistemas pero no integrados)
-        if 20 <= score.madurez_digital.score_total <= 30:
-            points += 0.2
-
-        # Presión competitiva
-        if "Mis competidores están usando IA y me están dejando atrás" in responses.motivacion:
-            points += 0.2
-
-        # Tiene presupuesto
-        if score.capacidad_inversion.score_total >= 20:
-            points += 0.1
-
-        return min(1.0, points)
-
-    def _score_ambitious_scaler(
-        self, score, responses, prospect_info
-    ) -> float:
-        """Score de compatibilidad con Ambitious Scaler"""
-        points = 0.0
-
-        # Sector típico
-        if prospect_info.sector in ["🛒 Retail", "💼 Servicios Profesionales", "🚚 Logística/Transporte"]:
-            points += 0.3
-
-        # Tamaño mediano-grande
-        if prospect_info.facturacion_rango in ["$500M - $2,000M COP", "$2,000M - $10,000M COP"]:
-            points += 0.2
-
-        # Frustración de escalabilidad
-        if responses.frustracion_principal == "No puedo escalar sin contratar más gente":
-            points += 0.3
-
-        # Invirtieron recientemente
-        if "Sí, inversiones" in responses.inversion_reciente:
-            points += 0.1
-
-        # Urgencia media-alta
-        if score.viabilidad_comercial.urgencia_real >= 7:
-            points += 0.1
-
-        return min(1.0, points)
-
-    def _score_digital_beginner(
-        self, score, responses, prospect_info
-    ) -> float:
-        """Score de compatibilidad con Digital Beginner"""
-        points = 0.0
-
-        # Madurez digital baja
-        if score.madurez_digital.score_total <= 20:
-            points += 0.4
-
-        # Sin inversión previa
-        if responses.inversion_reciente == "No, seguimos con lo mismo de siempre":
-            points += 0.2
-
-        # Procesos no documentados
-        if "no sabe" in responses.procesos_criticos.lower() or "cambian" in responses.procesos_criticos.lower():
-            points += 0.2
-
-        # Sector tradicional
-        if prospect_info.sector in ["🏭 Manufactura", "🏛️ Gobierno", "🏗️ Construcción"]:
-            points += 0.2
-
-        return min(1.0, points)
-
-    def _score_innovation_theater(
-        self, score, responses, prospect_info
-    ) -> float:
-        """Score de compatibilidad con Innovation Theater"""
-        points = 0.0
-
-        # Solo curiosidad
-        if responses.motivacion == ["Curiosidad / exploración general"]:
-            points += 0.4
-
-        # Sin urgencia
-        if responses.urgencia in ["Exploración, sin apuro", "Solo estoy mirando opciones"]:
-            points += 0.3
-
-        # Sin presupuesto claro
-        if responses.presupuesto_rango == "Prefiero no decirlo / No lo sé aún":
-            points += 0.2
-
-        # Viabilidad comercial baja
-        if score.viabilidad_comercial.score_total <= 15:
-            points += 0.1
-
-        return min(1.0, points)
-
-    def _score_distressed_fighter(
-        self, score, responses, prospect_info
-    ) -> float:
-        """Score de compatibilidad con Distressed Fighter"""
-        points = 0.0
-
-        # Urgencia muy alta
-        if responses.urgencia == "Muy urgente, necesito resolver ya (próximos 3 meses)":
-            points += 0.3
-
-        # Frustración de competitividad
-        if responses.frustracion_principal in ["Perdemos clientes por servicio lento", "Los costos operativos están muy altos"]:
-            points += 0.2
-
-        # Motivación competitiva
-        if "Mis competidores están usando IA y me están dejando atrás" in responses.motivacion:
-            points += 0.3
-
-        # Tiene presupuesto (capacidad de inversión)
-        if score.capacidad_inversion.score_total >= 15:
-            points += 0.2
-
-        return min(1.0, points)
-
-    def _score_tire_kicker(
-        self, score, responses, prospect_info
-    ) -> float:
-        """Score de compatibilidad con Tire Kicker"""
-        points = 0.0
-
-        # Score total muy bajo
-        if score.score_final < 30:
-            points += 0.4
-
-        # Sin presupuesto
-        if responses.presupuesto_rango == "Menos de $10M COP":
-            points += 0.2
-
-        # No es decisor
-        if responses.proceso_aprobacion == "Varias personas (complejo)":
-            points += 0.2
-
-        # Empresa muy pequeña
-        if prospect_info.facturacion_rango == "Menos de $500M COP" and prospect_info.empleados_rango == "1-20":
-            points += 0.2
-
-        return min(1.0, points)
+    return Arquetipo(
+        definicion=ARQUETIPOS[tipo],
+        confianza=_row_number(row.get("arquetipo_confianza")),
+        ranking=ranking,
+        margen=_row_number(row.get("arquetipo_margen"))
+    )
 
 
 class InsightGenerator:
-    """Generador de insights y recomendaciones"""
+    """Generador de insights y recomendaciones (quick wins, red flags e insights por reglas declarativas)"""
 
     def generate_quick_wins(
         self,
@@ -428,74 +547,10 @@ class InsightGenerator:
         responses: DiagnosticResponses,
         arquetipo: Arquetipo
     ) -> List[QuickWin]:
-        """Generar quick wins basados en respuestas"""
-
-        quick_wins = []
-
-        # Quick win basado en frustración principal
-        frustracion_map = {
-            "No puedo escalar sin contratar más gente": QuickWin(
-                titulo="Automatización de Proceso Administrativo",
-                descripcion="Automatizar proceso de mayor volumen manual (pedidos, facturación, o reportes) para reducir 30-40% de carga administrativa",
-                impacto_estimado="Equivalente a 2-3 personas FTE",
-                tiempo_implementacion="60-90 días",
-                inversion_aproximada="$15M-25M COP"
-            ),
-            "Perdemos clientes por servicio lento": QuickWin(
-                titulo="Chatbot de Atención al Cliente",
-                descripcion="Implementar asistente virtual para resolver 60-70% de consultas frecuentes 24/7",
-                impacto_estimado="Reducción 50% tiempo de respuesta",
-                tiempo_implementacion="45-60 días",
-                inversion_aproximada="$12M-20M COP"
-            ),
-            "Cometemos muchos errores manuales": QuickWin(
-                titulo="Validación Automática de Datos",
-                descripcion="Sistema de validación y verificación automática en procesos críticos",
-                impacto_estimado="Reducción 80% errores operativos",
-                tiempo_implementacion="30-45 días",
-                inversion_aproximada="$8M-15M COP"
-            ),
-            "No sé qué está pasando en tiempo real": QuickWin(
-                titulo="Dashboard Gerencial en Tiempo Real",
-                descripcion="Panel de control ejecutivo con KPIs críticos actualizados automáticamente",
-                impacto_estimado="Visibilidad inmediata de operación",
-                tiempo_implementacion="30-45 días",
-                inversion_aproximada="$10M-18M COP"
-            ),
-            "Los costos operativos están muy altos": QuickWin(
-                titulo="Optimización de Procesos con IA",
-                descripcion="Identificar y automatizar los 3 procesos más costosos",
-                impacto_estimado="Reducción 15-25% costos operativos",
-                tiempo_implementacion="90-120 días",
-                inversion_aproximada="$20M-35M COP"
-            )
-        }
-
-        primary_qw = frustracion_map.get(responses.frustracion_principal)
-        if primary_qw:
-            quick_wins.append(primary_qw)
-
-        # Quick win secundario basado en madurez de datos
-        if score.madurez_digital.decisiones_basadas_datos <= 5:
-            quick_wins.append(QuickWin(
-                titulo="Fundamentos de Business Intelligence",
-                descripcion="Implementar BI básico para consolidar datos dispersos y generar reportes automáticos",
-                impacto_estimado="Base para decisiones data-driven",
-                tiempo_implementacion="60 días",
-                inversion_aproximada="$8M-12M COP"
-            ))
-
-        # Quick win terciario basado en integración
-        if score.madurez_digital.sistemas_integrados <= 5:
-            quick_wins.append(QuickWin(
-                titulo="Integración de Sistemas Críticos",
-                descripcion="Conectar los 2-3 sistemas más importantes vía APIs para eliminar trabajo manual",
-                impacto_estimado="Reducción 40% tiempo en transferencia de datos",
-                tiempo_implementacion="45-60 días",
-                inversion_aproximada="$10M-15M COP"
-            ))
-
-        return quick_wins[:3]  # Máximo 3 quick wins
+        """Generar quick wins basados en respuestas (máximo 3, ver data/insight_rules.json)"""
+        return insight_rules.evaluate(
+            "quick_wins", score=score, responses=responses, arquetipo=arquetipo
+        )
 
     def generate_red_flags(
         self,
@@ -504,46 +559,9 @@ class InsightGenerator:
         prospect_info: ProspectInfo
     ) -> List[RedFlag]:
         """Identificar red flags potenciales"""
-
-        red_flags = []
-
-        # Red flag: No es decisor y proceso complejo
-        if responses.proceso_aprobacion == "Varias personas (complejo)":
-            red_flags.append(RedFlag(
-                titulo="Proceso de Aprobación Complejo",
-                descripcion="Múltiples aprobadores pueden alargar el ciclo de ventas significativamente",
-                severidad="media",
-                mitigacion="Identificar sponsor ejecutivo early, mapear stakeholders, preparar business case sólido"
-            ))
-
-        # Red flag: Sin presupuesto claro
-        if responses.presupuesto_rango in ["Menos de $10M COP", "Prefiero no decirlo / No lo sé aún"]:
-            red_flags.append(RedFlag(
-                titulo="Presupuesto Indefinido",
-                descripcion="Sin presupuesto claro puede indicar falta de compromiso real",
-                severidad="alta",
-                mitigacion="Validar en primera reunión si hay budget aprobado o timeline de aprobación"
-            ))
-
-        # Red flag: Cultura de resistencia al cambio
-        if responses.procesos_criticos in ["Dependen de quién los ejecute", "Funcionan pero nadie sabe exactamente cómo"]:
-            red_flags.append(RedFlag(
-                titulo="Cultura Resistente al Cambio",
-                descripcion="Procesos dependientes de personas pueden indicar resistencia a estandarización",
-                severidad="media",
-                mitigacion="Incluir módulo de change management, identificar champions internos, piloto pequeño primero"
-            ))
-
-        # Red flag: Solo curiosidad
-        if responses.motivacion == ["Curiosidad / exploración general"] and responses.urgencia == "Solo estoy mirando opciones":
-            red_flags.append(RedFlag(
-                titulo="Falta de Urgencia Real",
-                descripcion="Exploración sin problema específico raramente convierte",
-                severidad="alta",
-                mitigacion="Calificar rigurosamente, ofrecer contenido educativo en vez de consultoría, nutrir para futuro"
-            ))
-
-        return red_flags
+        return insight_rules.evaluate(
+            "red_flags", score=score, responses=responses, prospect_info=prospect_info
+        )
 
     def generate_insights(
         self,
@@ -552,37 +570,9 @@ class InsightGenerator:
         arquetipo: Arquetipo
     ) -> List[Insight]:
         """Generar insights estratégicos"""
-
-        insights = []
-
-        # Insight de fortalezas
-        if score.capacidad_inversion.score_total >= 20:
-            insights.append(Insight(
-                categoria="fortaleza",
-                titulo="Capacidad de Inversión Sólida",
-                descripcion=f"Con score de {score.capacidad_inversion.score_total}/30 en capacidad de inversión, el prospecto tiene músculo financiero para proyectos significativos",
-                recomendacion="Proponer solución robusta ($25K-45K) en vez de aproximación minimalista"
-            ))
-
-        # Insight de oportunidad
-        if score.madurez_digital.score_total <= 25:
-            insights.append(Insight(
-                categoria="oportunidad",
-                titulo="Alto Potencial de Mejora Operativa",
-                descripcion="Baja madurez digital significa múltiples oportunidades de quick wins y ROI alto",
-                recomendacion="Empezar con automatización de proceso más doloroso para demostrar valor rápido"
-            ))
-
-        # Insight de riesgo
-        if score.viabilidad_comercial.score_total <= 15:
-            insights.append(Insight(
-                categoria="riesgo",
-                titulo="Viabilidad Comercial Cuestionable",
-                descripcion=f"Score bajo ({score.viabilidad_comercial.score_total}/30) indica riesgo de que no cierre o ciclo muy largo",
-                recomendacion="Calificar rigurosamente en primera llamada antes de invertir tiempo en propuesta"
-            ))
-
-        return insights
+        return insight_rules.evaluate(
+            "insights", score=score, responses=responses, arquetipo=arquetipo
+        )
 
     def generate_reunion_prep(
         self,
@@ -618,11 +608,21 @@ class InsightGenerator:
             for obj in arquetipo.objeciones_esperadas[:3]
         }
 
+        # Perfil ambiguo: preparar también el segundo arquetipo del ranking
+        alternativo = self._get_arquetipo_alternativo(arquetipo)
+        if alternativo is not None:
+            preguntas.append(
+                f"Validar perfil alternativo {alternativo.nombre} (margen {arquetipo.margen:.2f}): "
+                f"¿aplica '{alternativo.frustraciones_tipicas[0]}'?"
+            )
+            for obj in alternativo.objeciones_esperadas[:2]:
+                objeciones.setdefault(obj, self._get_respuesta_objecion(obj, alternativo))
+
         # Insight clave
         insight_clave = self._get_insight_clave(score, responses, arquetipo)
 
         # Probabilidad de cierre
-        prob_cierre = self._estimate_close_probability(score, responses)
+        prob_cierre = self.estimate_close_probability(score, responses)
 
         return ReunionPrep(
             investigacion_previa=investigacion,
@@ -633,6 +633,43 @@ class InsightGenerator:
             probabilidad_cierre=prob_cierre
         )
 
+    def reunion_prep_from_row(self, row: Dict[str, Any], scores_row: Dict[str, Any]) -> ReunionPrep:
+        """
+        Preparación de reunión a partir de las filas de responses y scores
+
+        Se usa al abrir un lead en el dashboard: score y arquetipo son los
+        guardados al enviar el formulario (lo que vio el prospecto), no se
+        recalculan; solo la preparación usa las reglas actuales.
+        """
+        prospect_info = ProspectInfo(**{
+            field_name: str(row.get(field_name) or "")
+            for field_name in (
+                "nombre_empresa", "sector", "facturacion_rango", "empleados_rango",
+                "contacto_nombre", "contacto_email", "contacto_telefono", "cargo", "ciudad"
+            )
+        })
+        responses = DiagnosticResponses(
+            motivacion=list(_motivacion_key(row.get("motivacion"))),
+            **{field_name: str(row.get(field_name) or "") for field_name in (
+                "toma_decisiones", "procesos_criticos", "tareas_repetitivas",
+                "compartir_informacion", "equipo_tecnico", "capacidad_implementacion",
+                "inversion_reciente", "frustracion_principal", "urgencia",
+                "proceso_aprobacion", "presupuesto_rango"
+            )}
+        )
+
+        score = _score_from_row(scores_row)
+        arquetipo = _arquetipo_from_row(scores_row)
+        return self.generate_reunion_prep(score, responses, arquetipo, prospect_info)
+
+    def _get_arquetipo_alternativo(self, arquetipo: Arquetipo) -> Optional[ArquetipoDefinicion]:
+        """Segundo arquetipo del ranking si el margen es ambiguo (y tiene puntaje)"""
+        if not arquetipo.alternativas or arquetipo.margen >= MARGEN_AMBIGUO:
+            return None
+
+        tipo, puntaje = arquetipo.alternativas[0]
+        return ARQUETIPOS[tipo] if puntaje > 0 else None
+
     def _get_preguntas_por_arquetipo(
         self, arquetipo: Arquetipo, responses: DiagnosticResponses
     ) -> List[str]:
@@ -685,10 +722,13 @@ class InsightGenerator:
         else:
             return f"Enfocarse en resolver el problema específico: {responses.frustracion_principal}"
 
-    def _estimate_close_probability(
+    def estimate_close_probability(
         self, score: DiagnosticScore, responses: DiagnosticResponses
     ) -> int:
-        """Estimar probabilidad de cierre (0-100)"""
+        """Estimar probabilidad de cierre (0-100): modelo entrenado o reglas"""
+
+        if close_model is not None:
+            return close_model.predict(score, responses)
 
         prob = 30  # Base
 
@@ -709,3 +749,7 @@ class InsightGenerator:
             prob += 10
 
         return min(100, prob)
+
+
+# Singleton global del proceso
+archetype_classifier = ArchetypeClassifier()
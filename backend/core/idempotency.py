@@ -0,0 +1,195 @@
+"""
+core/idempotency.py
+Store de idempotencia con TTL (SQLite) compartido entre workers de uvicorn
+
+Reemplaza el set processed_hashes por proceso (que se vaciaba entero al
+pasar de 20 entradas). Cada envío se guarda con la respuesta original
+para que un reintento del frontend reciba la misma DiagnosticResponse en
+vez de un 429.
+
+Expiración por buckets de tiempo: cada clave se guarda con el bucket en
+que llegó (int(t / IDEMPOTENCY_BUCKET_SECONDS)). Una clave es válida
+mientras su bucket esté dentro de los últimos IDEMPOTENCY_TTL_BUCKETS;
+al cambiar de bucket se borran de una vez los buckets vencidos por
+índice, sin recorrer las claves vigentes.
+
+Ciclo de una clave:
+- claim(): la primera petición la reserva en estado "processing" (con
+  claimed_at); si el worker que la reservó murió, un duplicado la toma
+  cuando la reserva supera takeover_after segundos
+- complete(): guarda la respuesta -> los duplicados la reciben tal cual
+- release(): si el procesamiento falla se libera para permitir reintentar
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+DEFAULT_IDEMPOTENCY_PATH = Path(__file__).parent.parent / "data" / "idempotency.db"
+
+IDEMPOTENCY_BUCKET_SECONDS = 60
+IDEMPOTENCY_TTL_BUCKETS = 5  # ~5 minutos, como la ventana anterior
+
+STATUS_PROCESSING = "processing"
+STATUS_DONE = "done"
+
+
+@dataclass
+class IdempotencyRecord:
+    """Estado de una clave ya vista (response solo si status == done)"""
+    status: str
+    response: Optional[Dict[str, Any]]
+
+
+def submission_key(payload: Dict[str, Any]) -> str:
+    """Hash del envío completo (mismo email y mismas respuestas = duplicado)"""
+    canonical = json.dumps(payload, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()[:32]
+
+
+class IdempotencyStore:
+    """Claves con TTL por bucket de tiempo + respuesta para replay"""
+
+    def __init__(
+        self,
+        path: Optional[Path] = None,
+        bucket_seconds: int = IDEMPOTENCY_BUCKET_SECONDS,
+        ttl_buckets: int = IDEMPOTENCY_TTL_BUCKETS
+    ):
+        self.path = Path(path or os.getenv("IDEMPOTENCY_STORE_PATH", DEFAULT_IDEMPOTENCY_PATH))
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.bucket_seconds = bucket_seconds
+        self.ttl_buckets = ttl_buckets
+        self._purged_below = 0  # buckets < este valor ya se borraron (por proceso)
+        self._init_schema()
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(str(self.path), timeout=30, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    def _init_schema(self):
+        conn = self._connect()
+        try:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS idempotency_keys (
+                    key TEXT PRIMARY KEY,
+                    bucket INTEGER NOT NULL,
+                    status TEXT NOT NULL,
+                    response TEXT,
+                    claimed_at REAL NOT NULL DEFAULT 0
+                )
+            """)
+            # Migración: tablas creadas antes de guardar claimed_at
+            columns = {row[1] for row in conn.execute("PRAGMA table_info(idempotency_keys)")}
+            if "claimed_at" not in columns:
+                conn.execute("ALTER TABLE idempotency_keys ADD COLUMN claimed_at REAL NOT NULL DEFAULT 0")
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_idempotency_bucket ON idempotency_keys (bucket)"
+            )
+        finally:
+            conn.close()
+
+    def _current_bucket(self) -> int:
+        return int(time.time() // self.bucket_seconds)
+
+    # ------------------------------------------------------------------
+    # Ciclo de una clave
+    # ------------------------------------------------------------------
+    def claim(self, key: str, takeover_after: Optional[float] = None) -> Optional[IdempotencyRecord]:
+        """
+        Reservar la clave para procesar el envío
+
+        takeover_after: una reserva "processing" más vieja que esto se
+        considera abandonada (worker caído) y pasa a este llamador
+
+        Returns: None si la clave es nueva o se tomó (procesar); el registro
+        existente si es un duplicado (en proceso o con respuesta para replay)
+        """
+        now = time.time()
+        current = self._current_bucket()
+        oldest = current - self.ttl_buckets + 1
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            if oldest > self._purged_below:
+                # Cambio de bucket: borrar los vencidos de una vez (por índice)
+                conn.execute("DELETE FROM idempotency_keys WHERE bucket < ?", (oldest,))
+                self._purged_below = oldest
+
+            row = conn.execute(
+                "SELECT status, response, claimed_at FROM idempotency_keys WHERE key = ? AND bucket >= ?",
+                (key, oldest)
+            ).fetchone()
+            abandoned = (
+                row is not None and takeover_after is not None
+                and row[0] == STATUS_PROCESSING and now - row[2] > takeover_after
+            )
+            if row is None or abandoned:
+                conn.execute(
+                    "INSERT OR REPLACE INTO idempotency_keys (key, bucket, status, claimed_at) VALUES (?, ?, ?, ?)",
+                    (key, current, STATUS_PROCESSING, now)
+                )
+            conn.execute("COMMIT")
+        except Exception:
+            if conn.in_transaction:
+                conn.rollback()
+            raise
+        finally:
+            conn.close()
+
+        if row is None:
+            return None
+        if abandoned:
+            print(f"[IDEMPOTENCY] ♻️ Reserva abandonada hace {now - row[2]:.0f}s, se procesa de nuevo")
+            return None
+        status, response, _ = row
+        return IdempotencyRecord(status, json.loads(response) if response else None)
+
+    def complete(self, key: str, response: Dict[str, Any]):
+        """Guardar la respuesta original para replay de duplicados"""
+        conn = self._connect()
+        try:
+            conn.execute(
+                "UPDATE idempotency_keys SET status = ?, response = ? WHERE key = ?",
+                (STATUS_DONE, json.dumps(response, ensure_ascii=False), key)
+            )
+        finally:
+            conn.close()
+
+    def release(self, key: str):
+        """Liberar una clave cuyo procesamiento falló (el reintento se procesa)"""
+        conn = self._connect()
+        try:
+            conn.execute(
+                "DELETE FROM idempotency_keys WHERE key = ? AND status = ?",
+                (key, STATUS_PROCESSING)
+            )
+        finally:
+            conn.close()
+
+    def get(self, key: str) -> Optional[IdempotencyRecord]:
+        """Estado vigente de una clave (sin reservarla)"""
+        conn = self._connect()
+        try:
+            row = conn.execute(
+                "SELECT status, response FROM idempotency_keys WHERE key = ? AND bucket >= ?",
+                (key, self._current_bucket() - self.ttl_buckets + 1)
+            ).fetchone()
+        finally:
+            conn.close()
+
+        if row is None:
+            return None
+        status, response = row
+        return IdempotencyRecord(status, json.loads(response) if response else None)
+
+
+# Singleton global del proceso (cada worker abre el mismo archivo)
+idempotency_store = IdempotencyStore()
@@ -0,0 +1,247 @@
+"""
+core/insight_rules.py
+Motor de reglas declarativas para InsightGenerator (quick wins, red flags, insights)
+
+Las reglas viven en data/insight_rules.json. Cada regla tiene una lista
+de condiciones ("cuando", todas deben cumplirse) y un "resultado" con los
+campos del dataclass (QuickWin, RedFlag o Insight). Condiciones:
+    {"campo": "responses.urgencia", "igual": "..."}
+    {"campo": "responses.presupuesto_rango", "en": ["...", "..."]}
+    {"campo": "score.madurez_digital.score_total", "max": 25}   (valor <= 25)
+    {"campo": "score.capacidad_inversion.score_total", "min": 20}   (valor >= 20)
+
+La primera condición de cada regla es su disparador y se indexa: igual/en
+en un dict por valor, min/max en umbrales ordenados (bisect). Por
+diagnóstico se lee una vez cada campo indexado y solo se evalúan las
+reglas que ese valor puede disparar. Los resultados sin placeholders se
+construyen una sola vez al cargar.
+
+El archivo se recarga en caliente: se revisa el mtime como máximo cada
+RULES_RELOAD_INTERVAL segundos; si el JSON nuevo es inválido se conservan
+las reglas anteriores.
+"""
+
+import bisect
+import hashlib
+import json
+import operator
+import os
+import threading
+import time
+from dataclasses import dataclass, field
+from functools import partial
+from operator import attrgetter
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from core.models import QuickWin, RedFlag, Insight
+
+DEFAULT_RULES_PATH = Path(__file__).parent.parent / "data" / "insight_rules.json"
+
+RULES_RELOAD_INTERVAL = 2.0  # segundos entre chequeos de mtime
+
+# Sección del archivo -> dataclass del resultado
+SECTIONS = {
+    "quick_wins": QuickWin,
+    "red_flags": RedFlag,
+    "insights": Insight
+}
+
+Getter = Tuple[str, Callable[[Any], Any]]  # (raíz del contexto, attrgetter del resto)
+
+
+def _hashable(value: Any) -> Any:
+    """Listas (p. ej. motivacion) como tuplas para indexar"""
+    return tuple(value) if isinstance(value, list) else value
+
+
+def _getter(campo: str) -> Getter:
+    """'score.madurez_digital.score_total' -> ('score', attrgetter('madurez_digital.score_total'))"""
+    root, _, path = campo.partition(".")
+    if not path:
+        raise ValueError(f"Campo inválido en regla: {campo}")
+    return root, attrgetter(path)
+
+
+def _predicate(condition: Dict[str, Any]) -> Callable[[Any], bool]:
+    """Condición -> función(valor) -> bool (partial / método de C, sin lambdas)"""
+    if "igual" in condition:
+        return partial(operator.eq, condition["igual"])
+    if "en" in condition:
+        return frozenset(_hashable(option) for option in condition["en"]).__contains__
+    if "min" in condition:
+        return partial(operator.le, condition["min"])  # min <= valor
+    if "max" in condition:
+        return partial(operator.ge, condition["max"])  # max >= valor
+    raise ValueError(f"Condición sin operador (igual, en, min, max): {condition}")
+
+
+@dataclass
+class _Rule:
+    id: str
+    position: int
+    extra_conditions: List[Tuple[str, Callable[[Any], Any], Callable[[Any], bool]]]
+    result_fields: Dict[str, str]
+    prebuilt: Any  # instancia compartida (frozen) si no hay placeholders; None si hay que formatear
+
+
+@dataclass
+class _RuleSection:
+    """Reglas de una sección + índices por disparador"""
+    result_type: type
+    rules: List[_Rule] = field(default_factory=list)
+    maximo: Optional[int] = None
+    # campo -> (raíz, getter, {valor: [posiciones]}); valores lista indexados como tupla
+    equals: Dict[str, Tuple[str, Callable[[Any], Any], Dict[Any, List[int]]]] = field(default_factory=dict)
+    # campo -> (raíz, getter, umbrales ordenados, posiciones)
+    upper: Dict[str, Tuple[str, Callable[[Any], Any], List[float], List[int]]] = field(default_factory=dict)  # max
+    lower: Dict[str, Tuple[str, Callable[[Any], Any], List[float], List[int]]] = field(default_factory=dict)  # min
+    list_keys: bool = False  # algún disparador igual/en compara contra una lista
+
+    def add(self, spec: Dict[str, Any]):
+        conditions = spec["cuando"]
+        if not conditions:
+            raise ValueError(f"Regla {spec.get('id')} sin condiciones")
+
+        position = len(self.rules)
+        result_fields = dict(spec["resultado"])
+        templated = any("{" in str(value) for value in result_fields.values())
+        self.rules.append(_Rule(
+            id=spec["id"],
+            position=position,
+            extra_conditions=[(*_getter(c["campo"]), _predicate(c)) for c in conditions[1:]],
+            result_fields=result_fields,
+            prebuilt=None if templated else self.result_type(**result_fields)
+        ))
+
+        trigger = conditions[0]
+        campo = trigger["campo"]
+        if "igual" in trigger or "en" in trigger:
+            values = [trigger["igual"]] if "igual" in trigger else trigger["en"]
+            _, _, index = self.equals.setdefault(campo, (*_getter(campo), {}))
+            for value in values:
+                self.list_keys |= isinstance(value, list)
+                index.setdefault(_hashable(value), []).append(position)
+        elif "max" in trigger or "min" in trigger:
+            bound = "max" if "max" in trigger else "min"
+            target = self.upper if bound == "max" else self.lower
+            _, _, thresholds, positions = target.setdefault(campo, (*_getter(campo), [], []))
+            i = bisect.bisect_right(thresholds, trigger[bound])
+            thresholds.insert(i, trigger[bound])
+            positions.insert(i, position)
+        else:
+            _predicate(trigger)  # lanza ValueError con el detalle
+
+    def candidates(self, context: Dict[str, Any]) -> List[int]:
+        """Posiciones de las reglas cuyo disparador se cumple (orden del archivo)"""
+        found: List[int] = []
+        for root, get, index in self.equals.values():
+            value = get(context[root])
+            if self.list_keys:
+                value = _hashable(value)
+            hits = index.get(value)
+            if hits:
+                found += hits
+        for root, get, thresholds, positions in self.upper.values():
+            # valor <= umbral: todos los umbrales desde el primero >= valor
+            found += positions[bisect.bisect_left(thresholds, get(context[root])):]
+        for root, get, thresholds, positions in self.lower.values():
+            # valor >= umbral: todos los umbrales hasta el último <= valor
+            found += positions[:bisect.bisect_right(thresholds, get(context[root]))]
+        if len(found) > 1:
+            found.sort()
+        return found
+
+    def evaluate(self, context: Dict[str, Any]) -> List[Any]:
+        results = []
+        for position in self.candidates(context):
+            rule = self.rules[position]
+            for root, get, predicate in rule.extra_conditions:
+                if not predicate(get(context[root])):
+                    break
+            else:
+                if rule.prebuilt is not None:
+                    results.append(rule.prebuilt)
+                else:
+                    results.append(self.result_type(**{
+                        name: value.format(**context) if isinstance(value, str) else value
+                        for name, value in rule.result_fields.items()
+                    }))
+                if len(results) == self.maximo:
+                    break
+        return results
+
+
+def compile_rules(document: Dict[str, Any]) -> Dict[str, _RuleSection]:
+    """JSON de reglas -> secciones indexadas (ValueError si es inválido)"""
+    sections = {}
+    try:
+        for name, result_type in SECTIONS.items():
+            section = _RuleSection(result_type, maximo=document[name].get("maximo"))
+            for spec in document[name]["reglas"]:
+                section.add(spec)
+            sections[name] = section
+    except (KeyError, TypeError) as e:
+        raise ValueError(f"Archivo de reglas inválido: {e!r}")
+    return sections
+
+
+class InsightRules:
+    """Reglas cargadas una vez por proceso con recarga en caliente por mtime"""
+
+    def __init__(self, path: Optional[Path] = None, reload_interval: float = RULES_RELOAD_INTERVAL):
+        self.path = Path(path or os.getenv("INSIGHT_RULES_PATH", DEFAULT_RULES_PATH))
+        self.reload_interval = reload_interval
+        self._lock = threading.Lock()
+        self._checked_at = 0.0
+        self._mtime: Optional[float] = None
+        self.digest = ""
+        self.sections: Dict[str, _RuleSection] = {}
+        self.refresh(force=True)
+
+    def refresh(self, force: bool = False) -> bool:
+        """Recargar si el archivo cambió (chequeo limitado a cada reload_interval)"""
+        now = time.monotonic()
+        if not force and now - self._checked_at < self.reload_interval:
+            return False
+
+        with self._lock:
+            self._checked_at = now
+            try:
+                mtime = self.path.stat().st_mtime
+                if not force and mtime == self._mtime:
+                    return False
+                raw = self.path.read_bytes()
+            except OSError as e:
+                # Archivo borrado / a mitad de un deploy: seguir con las reglas cargadas
+                if not self.sections:
+                    raise
+                print(f"[INSIGHT RULES] ❌ No se pudo leer {self.path.name}, se mantienen las reglas anteriores: {e}")
+                return False
+
+            try:
+                sections = compile_rules(json.loads(raw.decode("utf-8")))
+            except ValueError as e:
+                if not self.sections:
+                    raise
+                print(f"[INSIGHT RULES] ❌ {self.path.name} inválido, se mantienen las reglas anteriores: {e}")
+                self._mtime = mtime
+                return False
+
+            self.sections = sections
+            self.digest = hashlib.sha256(raw).hexdigest()
+            self._mtime = mtime
+
+        if not force:
+            print(f"[INSIGHT RULES] ♻️ Reglas recargadas desde {self.path.name}")
+        return True
+
+    def evaluate(self, section: str, **context: Any) -> List[Any]:
+        """Resultados de una sección para un diagnóstico (en el orden del archivo)"""
+        if time.monotonic() - self._checked_at >= self.reload_interval:
+            self.refresh()
+        return self.sections[section].evaluate(context)
+
+
+# Singleton global del proceso
+insight_rules = InsightRules()
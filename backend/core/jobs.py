@@ -0,0 +1,323 @@
+"""
+Pipeline de jobs en background para los efectos secundarios del diagnóstico
+Sheets, PDF y email corren fuera del request path con estado por etapa
+
+El estado de las etapas se escribe en SQLite (JOB_STORE_PATH) compartido
+entre workers de uvicorn: GET /diagnostic/{id}/status responde igual en
+cualquier worker, no solo en el que encoló el job. Los resultados
+intermedios (ej. bytes del PDF) quedan en memoria del proceso que corre
+las cadenas y se descartan cuando terminan todas.
+"""
+import os
+import sqlite3
+import threading
+import time
+import traceback
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from datetime import datetime
+from enum import Enum
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from core.metrics import STAGE_SECONDS, STAGE_FAILURES
+
+DEFAULT_JOB_STORE_PATH = Path(__file__).parent.parent / "data" / "jobs.db"
+
+
+class StageStatus(Enum):
+    """Estado de una etapa del pipeline"""
+    PENDING = "pending"
+    RUNNING = "running"
+    SUCCESS = "success"
+    FAILED = "failed"
+
+
+@dataclass
+class StageState:
+    """Estado y tiempos de una etapa"""
+    status: StageStatus = StageStatus.PENDING
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+    error: Optional[str] = None
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "status": self.status.value,
+            "started_at": self.started_at.isoformat() if self.started_at else None,
+            "finished_at": self.finished_at.isoformat() if self.finished_at else None,
+            "error": self.error
+        }
+
+
+@dataclass
+class DiagnosticJob:
+    """Job de un diagnóstico: etapas + resultados intermedios (ej. bytes del PDF)"""
+    diagnostic_id: str
+    stages: Dict[str, StageState]
+    results: Dict[str, Any] = field(default_factory=dict)
+    created_at: datetime = field(default_factory=datetime.now)
+    chains_left: int = 0
+
+    @property
+    def status(self) -> str:
+        """Estado global: pending, running, completed o failed"""
+        states = [stage.status for stage in self.stages.values()]
+
+        if all(s == StageStatus.PENDING for s in states):
+            return "pending"
+        if any(s in (StageStatus.PENDING, StageStatus.RUNNING) for s in states):
+            return "running"
+        if any(s == StageStatus.FAILED for s in states):
+            return "failed"
+        return "completed"
+
+    @property
+    def finished(self) -> bool:
+        return self.status in ("completed", "failed")
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "diagnostic_id": self.diagnostic_id,
+            "status": self.status,
+            "created_at": self.created_at.isoformat(),
+            "stages": {name: stage.to_dict() for name, stage in self.stages.items()}
+        }
+
+
+def _parse_datetime(value: Optional[str]) -> Optional[datetime]:
+    return datetime.fromisoformat(value) if value else None
+
+
+# Una etapa es (nombre, función). La función recibe el job y su retorno
+# queda en job.results[nombre] para las etapas siguientes de la cadena.
+# Una etapa falla si lanza excepción.
+Stage = Tuple[str, Callable[[DiagnosticJob], Any]]
+
+
+class JobPipeline:
+    """
+    Ejecuta cadenas de etapas en un thread pool y registra su estado
+
+    Cada cadena corre en su propio worker; las etapas dentro de una cadena
+    son secuenciales (ej. PDF -> email) y las cadenas son independientes
+    entre sí (ej. Sheets no bloquea el PDF).
+    """
+
+    def __init__(self, max_workers: int = 4, max_jobs: int = 1000, path: Optional[Path] = None):
+        self.executor = ThreadPoolExecutor(
+            max_workers=max_workers,
+            thread_name_prefix="diagnostic-job"
+        )
+        self.max_jobs = max_jobs
+        self.path = Path(path or os.getenv("JOB_STORE_PATH", DEFAULT_JOB_STORE_PATH))
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._jobs: "OrderedDict[str, DiagnosticJob]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._init_schema()
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(str(self.path), timeout=30, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    def _init_schema(self):
+        conn = self._connect()
+        try:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS job_stages (
+                    diagnostic_id TEXT NOT NULL,
+                    stage TEXT NOT NULL,
+                    position INTEGER NOT NULL,
+                    status TEXT NOT NULL,
+                    started_at TEXT,
+                    finished_at TEXT,
+                    error TEXT,
+                    created_at TEXT NOT NULL,
+                    PRIMARY KEY (diagnostic_id, stage)
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_job_stages_created ON job_stages (created_at)")
+        finally:
+            conn.close()
+
+    def submit(self, diagnostic_id: str, chains: List[List[Stage]]) -> DiagnosticJob:
+        """Registrar el job y encolar sus cadenas de etapas"""
+        stages = {
+            name: StageState()
+            for chain in chains
+            for name, _ in chain
+        }
+        job = DiagnosticJob(diagnostic_id=diagnostic_id, stages=stages, chains_left=len(chains))
+
+        with self._lock:
+            self._jobs[diagnostic_id] = job
+            self._evict_finished()
+        self._save_job(job)
+
+        for chain in chains:
+            self.executor.submit(self._run_chain, job, chain)
+
+        print(f"[JOBS] Encolado {diagnostic_id}: {list(stages.keys())}")
+        return job
+
+    def get(self, diagnostic_id: str) -> Optional[DiagnosticJob]:
+        """Estado del job desde el store compartido (sin resultados intermedios)"""
+        conn = self._connect()
+        try:
+            rows = conn.execute(
+                """
+                SELECT stage, status, started_at, finished_at, error, created_at
+                FROM job_stages WHERE diagnostic_id = ? ORDER BY position
+                """,
+                (diagnostic_id,)
+            ).fetchall()
+        finally:
+            conn.close()
+
+        if not rows:
+            return None
+
+        return DiagnosticJob(
+            diagnostic_id=diagnostic_id,
+            stages={
+                stage: StageState(StageStatus(status), _parse_datetime(started_at), _parse_datetime(finished_at), error)
+                for stage, status, started_at, finished_at, error, _ in rows
+            },
+            created_at=_parse_datetime(rows[0][5])
+        )
+
+    def stage_counts(self) -> Dict[str, int]:
+        """Etapas pendientes / en curso de los jobs registrados (gauge de /metrics)"""
+        counts = {StageStatus.PENDING.value: 0, StageStatus.RUNNING.value: 0}
+        with self._lock:
+            jobs = list(self._jobs.values())
+        for job in jobs:
+            for stage in job.stages.values():
+                if stage.status.value in counts:
+                    counts[stage.status.value] += 1
+        return counts
+
+    def shutdown(self, wait: bool = True):
+        self.executor.shutdown(wait=wait)
+
+    def _run_chain(self, job: DiagnosticJob, chain: List[Stage]):
+        """
+        Ejecutar etapas en orden. Una etapa fallida no detiene las siguientes:
+        el email se envía aunque el PDF falle, igual que en el flujo síncrono.
+        """
+        try:
+            self._run_stages(job, chain)
+        finally:
+            with self._lock:
+                job.chains_left -= 1
+                if job.chains_left == 0:
+                    # Nadie más lee los resultados: no retener los bytes del PDF
+                    job.results.clear()
+
+    def _run_stages(self, job: DiagnosticJob, chain: List[Stage]):
+        for name, func in chain:
+            stage = job.stages[name]
+            stage.status = StageStatus.RUNNING
+            stage.started_at = datetime.now()
+            self._save_stage(job.diagnostic_id, name, stage)
+            start = time.perf_counter()
+
+            try:
+                job.results[name] = func(job)
+                stage.status = StageStatus.SUCCESS
+                print(f"[JOBS] ✅ {job.diagnostic_id} | {name}")
+
+            except Exception as e:
+                stage.status = StageStatus.FAILED
+                stage.error = str(e)
+                STAGE_FAILURES.inc(stage=name)
+                print(f"[JOBS] ❌ {job.diagnostic_id} | {name}: {str(e)}")
+                print(traceback.format_exc())
+
+            finally:
+                stage.finished_at = datetime.now()
+                self._save_stage(job.diagnostic_id, name, stage)
+                STAGE_SECONDS.observe(time.perf_counter() - start, stage=name)
+
+    def _evict_finished(self):
+        """Mantener el registro acotado descartando los jobs terminados más antiguos"""
+        if len(self._jobs) <= self.max_jobs:
+            return
+
+        for diagnostic_id in list(self._jobs.keys()):
+            if len(self._jobs) <= self.max_jobs:
+                break
+            if self._jobs[diagnostic_id].finished:
+                del self._jobs[diagnostic_id]
+
+    # ------------------------------------------------------------------
+    # Store compartido
+    # ------------------------------------------------------------------
+    def _save_job(self, job: DiagnosticJob):
+        """Registrar las etapas del job y recortar los jobs terminados más antiguos"""
+        created_at = job.created_at.isoformat()
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            conn.executemany(
+                """
+                INSERT OR REPLACE INTO job_stages (diagnostic_id, stage, position, status, created_at)
+                VALUES (?, ?, ?, ?, ?)
+                """,
+                [
+                    (job.diagnostic_id, name, position, stage.status.value, created_at)
+                    for position, (name, stage) in enumerate(job.stages.items())
+                ]
+            )
+            conn.execute(
+                """
+                DELETE FROM job_stages WHERE diagnostic_id IN (
+                    SELECT diagnostic_id FROM job_stages
+                    GROUP BY diagnostic_id
+                    HAVING SUM(status IN (?, ?)) = 0
+                    ORDER BY MIN(created_at) DESC
+                    LIMIT -1 OFFSET ?
+                )
+                """,
+                (StageStatus.PENDING.value, StageStatus.RUNNING.value, self.max_jobs)
+            )
+            conn.execute("COMMIT")
+        except sqlite3.Error as e:
+            if conn.in_transaction:
+                conn.rollback()
+            print(f"[JOBS] ⚠️ No se pudo registrar {job.diagnostic_id} en el store: {str(e)}")
+        finally:
+            conn.close()
+
+    def _save_stage(self, diagnostic_id: str, name: str, stage: StageState):
+        """El estado de la etapa no debe tumbar la cadena: un fallo del store solo se loguea"""
+        try:
+            conn = self._connect()
+            try:
+                conn.execute(
+                    """
+                    UPDATE job_stages SET status = ?, started_at = ?, finished_at = ?, error = ?
+                    WHERE diagnostic_id = ? AND stage = ?
+                    """,
+                    (
+                        stage.status.value,
+                        stage.started_at.isoformat() if stage.started_at else None,
+                        stage.finished_at.isoformat() if stage.finished_at else None,
+                        stage.error,
+                        diagnostic_id,
+                        name
+                    )
+                )
+            finally:
+                conn.close()
+        except sqlite3.Error as e:
+            print(f"[JOBS] ⚠️ No se pudo guardar {diagnostic_id} | {name}: {str(e)}")
+
+
+# Singleton global del proceso. Las etapas esperan I/O (flush de Sheets,
+# pool de render, Resend), no CPU: hay threads de sobra para que la espera
+# del flush de Sheets no frene los PDF.
+pipeline = JobPipeline(max_workers=16)
@@ -3,10 +3,11 @@ core/models.py
 Modelos de datos para el sistema de diagnóstico AI Readiness
 """
 
-from dataclasses import dataclass, field
+from dataclasses import asdict, dataclass, field
 from datetime import datetime
-from typing import Dict, List, Optional
+from typing import Any, Dict, List, Optional, Tuple
 from enum import Enum
+import uuid
 
 
 class Tier(Enum):
@@ -117,24 +118,109 @@ class DiagnosticScore:
     confianza_clasificacion: float = 0.0  # 0.0-1.0, valor por defecto
 
 
-@dataclass
-class Arquetipo:
-    """Arquetipo identificado del prospecto"""
+@dataclass(frozen=True, slots=True)
+class ArquetipoDefinicion:
+    """Definición de un arquetipo (inmutable, una instancia compartida por tipo)"""
     tipo: str  # traditional_giant, ambitious_scaler, etc.
     nombre: str  # Nombre display
     descripcion: str
-    frustraciones_tipicas: List[str]
-    motivadores: List[str]
-    objeciones_esperadas: List[str]
-    enfoque_comercial: List[str]
+    frustraciones_tipicas: Tuple[str, ...]
+    motivadores: Tuple[str, ...]
+    objeciones_esperadas: Tuple[str, ...]
+    enfoque_comercial: Tuple[str, ...]
     punto_entrada_ideal: str
     potencial_expansion: str
-    confianza: float  # 0.0-1.0
 
+    def __reduce__(self):
+        # Al des-picklear (outbox) se reutiliza la instancia compartida; además
+        # frozen + slots no se puede restaurar con setattr en Python 3.10
+        return (definicion_compartida, tuple(getattr(self, name) for name in self.__slots__))
 
-@dataclass
+
+_DEFINICIONES: Dict[Tuple, ArquetipoDefinicion] = {}
+
+
+def definicion_compartida(*fields) -> ArquetipoDefinicion:
+    """Interning: una sola instancia por definición idéntica en todo el proceso"""
+    definicion = _DEFINICIONES.get(fields)
+    if definicion is None:
+        definicion = _DEFINICIONES.setdefault(fields, ArquetipoDefinicion(*fields))
+    return definicion
+
+
+@dataclass(slots=True)
+class Arquetipo:
+    """Arquetipo identificado del prospecto: definición compartida + confianza del lead"""
+    definicion: ArquetipoDefinicion
+    confianza: float  # 0.0-1.0
+    ranking: Tuple[Tuple[str, float], ...] = ()  # (tipo, puntaje) de todos los arquetipos, mayor a menor
+    margen: float = 0.0  # Puntaje del ganador menos el del segundo
+
+    @property
+    def tipo(self) -> str:
+        return self.definicion.tipo
+
+    @property
+    def nombre(self) -> str:
+        return self.definicion.nombre
+
+    @property
+    def descripcion(self) -> str:
+        return self.definicion.descripcion
+
+    @property
+    def frustraciones_tipicas(self) -> Tuple[str, ...]:
+        return self.definicion.frustraciones_tipicas
+
+    @property
+    def motivadores(self) -> Tuple[str, ...]:
+        return self.definicion.motivadores
+
+    @property
+    def objeciones_esperadas(self) -> Tuple[str, ...]:
+        return self.definicion.objeciones_esperadas
+
+    @property
+    def enfoque_comercial(self) -> Tuple[str, ...]:
+        return self.definicion.enfoque_comercial
+
+    @property
+    def punto_entrada_ideal(self) -> str:
+        return self.definicion.punto_entrada_ideal
+
+    @property
+    def potencial_expansion(self) -> str:
+        return self.definicion.potencial_expansion
+
+    @property
+    def alternativas(self) -> Tuple[Tuple[str, float], ...]:
+        """Arquetipos que siguen al ganador en el ranking"""
+        return self.ranking[1:]
+
+    def __setstate__(self, state):
+        # Pickles anteriores (outbox) guardaban todos los campos en el Arquetipo
+        if isinstance(state, tuple):
+            state = {**(state[0] or {}), **(state[1] or {})}
+        if "definicion" not in state:
+            state = dict(state)
+            confianza = state.pop("confianza")
+            state = {
+                "definicion": definicion_compartida(*(
+                    tuple(state[name]) if isinstance(state[name], list) else state[name]
+                    for name in ArquetipoDefinicion.__slots__
+                )),
+                "confianza": confianza
+            }
+        # Pickles anteriores al ranking de arquetipos
+        state.setdefault("ranking", ())
+        state.setdefault("margen", 0.0)
+        for name, value in state.items():
+            object.__setattr__(self, name, value)
+
+
+@dataclass(frozen=True)
 class QuickWin:
-    """Quick win identificado"""
+    """Quick win identificado (inmutable: las reglas comparten instancias entre diagnósticos)"""
     titulo: str
     descripcion: str
     impacto_estimado: str
@@ -142,7 +228,7 @@ class QuickWin:
     inversion_aproximada: str
 
 
-@dataclass
+@dataclass(frozen=True)
 class RedFlag:
     """Red flag identificado"""
     titulo: str
@@ -151,7 +237,7 @@ class RedFlag:
     mitigacion: str
 
 
-@dataclass
+@dataclass(frozen=True)
 class Insight:
     """Insight generado del diagnóstico"""
     categoria: str  # fortaleza, oportunidad, riesgo
@@ -184,12 +270,77 @@ class DiagnosticResult:
     servicio_sugerido: str
     monto_sugerido_min: int
     monto_sugerido_max: int
-    reunion_prep: ReunionPrep
+
+    # Solo la probabilidad se calcula al enviar el formulario (va a Sheets);
+    # la preparación completa se genera al abrir el lead en el dashboard
+    probabilidad_cierre: int = 50  # 0-100
+    reunion_prep: Optional[ReunionPrep] = None
 
     # Metadata
-    diagnostic_id: str = field(default_factory=lambda: datetime.now().strftime("%Y%m%d_%H%M%S"))
+    # Timestamp legible + sufijo aleatorio: dos envíos en el mismo segundo no comparten ID
+    diagnostic_id: str = field(
+        default_factory=lambda: f"{datetime.now().strftime('%Y%m%d_%H%M%S')}_{uuid.uuid4().hex[:8]}"
+    )
     created_at: datetime = field(default_factory=datetime.now)
 
+    def __setstate__(self, state):
+        # Pickles anteriores (outbox) traían la probabilidad dentro de reunion_prep
+        if "probabilidad_cierre" not in state and state.get("reunion_prep") is not None:
+            state["probabilidad_cierre"] = state["reunion_prep"].probabilidad_cierre
+        self.__dict__.update(state)
+
+
+def result_to_dict(result: DiagnosticResult) -> Dict[str, Any]:
+    """DiagnosticResult como dict serializable a JSON (fechas ISO, tier por valor)"""
+    data = asdict(result)
+    data["prospect_info"]["timestamp"] = result.prospect_info.timestamp.isoformat()
+    data["score"]["tier"] = result.score.tier.value
+    data["created_at"] = result.created_at.isoformat()
+    return data
+
+
+def result_from_dict(data: Dict[str, Any]) -> DiagnosticResult:
+    """Inverso de result_to_dict (acepta las listas en que JSON convierte las tuplas)"""
+    score = data["score"]
+    arquetipo = data["arquetipo"]
+    definicion = arquetipo["definicion"]
+    reunion_prep = data.get("reunion_prep")
+
+    return DiagnosticResult(
+        prospect_info=ProspectInfo(**{
+            **data["prospect_info"],
+            "timestamp": datetime.fromisoformat(data["prospect_info"]["timestamp"])
+        }),
+        responses=DiagnosticResponses(**data["responses"]),
+        score=DiagnosticScore(
+            madurez_digital=MadurezDigital(**score["madurez_digital"]),
+            capacidad_inversion=CapacidadInversion(**score["capacidad_inversion"]),
+            viabilidad_comercial=ViabilidadComercial(**score["viabilidad_comercial"]),
+            score_final=score["score_final"],
+            tier=Tier(score["tier"]),
+            confianza_clasificacion=score["confianza_clasificacion"]
+        ),
+        arquetipo=Arquetipo(
+            definicion=definicion_compartida(*(
+                tuple(definicion[name]) if isinstance(definicion[name], list) else definicion[name]
+                for name in ArquetipoDefinicion.__slots__
+            )),
+            confianza=arquetipo["confianza"],
+            ranking=tuple((tipo, puntaje) for tipo, puntaje in arquetipo["ranking"]),
+            margen=arquetipo["margen"]
+        ),
+        quick_wins=[QuickWin(**item) for item in data["quick_wins"]],
+        red_flags=[RedFlag(**item) for item in data["red_flags"]],
+        insights=[Insight(**item) for item in data["insights"]],
+        servicio_sugerido=data["servicio_sugerido"],
+        monto_sugerido_min=data["monto_sugerido_min"],
+        monto_sugerido_max=data["monto_sugerido_max"],
+        probabilidad_cierre=data["probabilidad_cierre"],
+        reunion_prep=ReunionPrep(**reunion_prep) if reunion_prep else None,
+        diagnostic_id=data["diagnostic_id"],
+        created_at=datetime.fromisoformat(data["created_at"])
+    )
+
 
 @dataclass
 class DashboardData:
@@ -0,0 +1,154 @@
+"""
+core/sheets_schema.py
+Esquema de los worksheets responses / scores y migración de columnas in-place
+
+Lo comparten el conector de Streamlit y el del backend: los dos escriben
+el mismo spreadsheet, así que tienen que coincidir en headers y en cómo
+se migran. Un header distinto nunca borra el sheet: las columnas se
+reordenan conservando los datos y las que salieron del esquema quedan
+al final.
+"""
+
+import threading
+from typing import Any, List
+
+# Versión del esquema de headers; subirla al cambiar RESPONSES_HEADERS o SCORES_HEADERS
+SCHEMA_VERSION = 2
+
+# Headers alineados con el modelo ProspectInfo y DiagnosticResponses
+RESPONSES_HEADERS = [
+    "timestamp",
+    "diagnostic_id",
+    "nombre_empresa",
+    "sector",
+    "facturacion_rango",
+    "empleados_rango",
+    "contacto_nombre",
+    "contacto_email",
+    "contacto_telefono",
+    "cargo",
+    "ciudad",
+    "motivacion",
+    "toma_decisiones",
+    "procesos_criticos",
+    "tareas_repetitivas",
+    "compartir_informacion",
+    "equipo_tecnico",
+    "capacidad_implementacion",
+    "inversion_reciente",
+    "frustracion_principal",
+    "urgencia",
+    "proceso_aprobacion",
+    "presupuesto_rango"
+]
+
+SCORES_HEADERS = [
+    "timestamp",
+    "diagnostic_id",
+    "nombre_empresa",
+    "sector",
+    "contacto_nombre",
+    "contacto_email",
+    "contacto_telefono",
+    "cargo",
+    "ciudad",
+    "facturacion_rango",
+    "empleados_rango",
+    "score_final",
+    "tier",
+    "confianza_clasificacion",
+    "madurez_digital_total",
+    "madurez_decisiones",
+    "madurez_procesos",
+    "madurez_integracion",
+    "madurez_eficiencia",
+    "capacidad_inversion_total",
+    "capacidad_presupuesto",
+    "capacidad_historial",
+    "capacidad_tamano",
+    "viabilidad_total",
+    "viabilidad_problema",
+    "viabilidad_urgencia",
+    "viabilidad_decision",
+    "arquetipo_tipo",
+    "arquetipo_nombre",
+    "arquetipo_confianza",
+    "servicio_sugerido",
+    "monto_min",
+    "monto_max",
+    "probabilidad_cierre",
+    "quick_wins_count",
+    "red_flags_count",
+    "arquetipo_ranking",
+    "arquetipo_margen"
+]
+
+MIGRATION_ATTEMPTS = 3
+
+# Una migración a la vez por proceso (threads del pipeline / sesiones de Streamlit)
+_migration_lock = threading.Lock()
+
+
+def headers_match(existing_headers: List[str], expected_headers: List[str]) -> bool:
+    """El esquema vigente, con o sin columnas legacy al final (ya migrado)"""
+    return existing_headers[:len(expected_headers)] == expected_headers
+
+
+def ensure_headers(worksheet: Any, expected_headers: List[str]):
+    """Crear los headers si el sheet está vacío o migrar columnas si difieren"""
+    existing_headers = worksheet.row_values(1) if worksheet.row_count > 0 else []
+
+    if headers_match(existing_headers, expected_headers):
+        print(f"[SCHEMA] ✅ {worksheet.title} v{SCHEMA_VERSION} validado")
+    elif not existing_headers:
+        worksheet.update('A1', [expected_headers])
+        print(f"[SCHEMA] Headers creados en {worksheet.title}: {len(expected_headers)} columnas")
+    else:
+        migrate_columns(worksheet, expected_headers)
+
+
+def migrate_columns(worksheet: Any, expected_headers: List[str]):
+    """
+    Reordenar/agregar columnas conservando todos los datos
+    Columnas que ya no están en el esquema se mueven al final (nunca se borran)
+
+    Se relee el sheet justo antes de escribir: si otro proceso agregó filas
+    mientras se armaba la migración, se vuelve a armar con ellas.
+    """
+    print(f"[SCHEMA] ⚠️ Migrando {worksheet.title}: headers difieren del esquema v{SCHEMA_VERSION}")
+    with _migration_lock:
+        values = worksheet.get_all_values()
+        for _ in range(MIGRATION_ATTEMPTS):
+            existing_headers = values[0] if values else []
+            if headers_match(existing_headers, expected_headers):
+                print(f"[SCHEMA] ✅ {worksheet.title} ya migrado por otro proceso")
+                return
+
+            old_index = {header: i for i, header in enumerate(existing_headers) if header}
+            legacy = [h for h in existing_headers if h and h not in expected_headers]
+            new_headers = expected_headers + legacy
+
+            migrated = [new_headers]
+            for row in values[1:]:
+                migrated.append([
+                    row[old_index[h]] if h in old_index and old_index[h] < len(row) else ""
+                    for h in new_headers
+                ])
+
+            current = worksheet.get_all_values()
+            if current == values:
+                break
+            values = current
+        else:
+            raise RuntimeError(
+                f"{worksheet.title} cambia durante la migración; se reintenta en el próximo guardado"
+            )
+
+        if worksheet.col_count < len(new_headers):
+            worksheet.add_cols(len(new_headers) - worksheet.col_count)
+
+        worksheet.update('A1', migrated, value_input_option='USER_ENTERED')
+
+    added = [h for h in expected_headers if h not in old_index]
+    print(f"[SCHEMA] ✅ Migrado {worksheet.title}: {len(values) - 1} filas, "
+          f"agregadas {added or 'ninguna'}, legacy al final {legacy or 'ninguna'}")
@@ -0,0 +1,260 @@
+"""
+Agregados incrementales de analytics
+Mantiene conteos y sumas en O(1) por diagnóstico en SQLite local y hace
+push al worksheet "analytics" con debounce (sin releer todo "scores")
+
+Los contadores se actualizan con UPDATE n = n + ? atómicos: todos los
+workers de la API suman sobre el mismo archivo (ANALYTICS_STORE_PATH)
+sin pisarse, igual que los contadores de outcome_store.
+
+Reconciliación completa contra Google Sheets:
+    python -m integrations.analytics_store recompute
+"""
+import json
+import os
+import sqlite3
+import threading
+import traceback
+from dataclasses import dataclass, field
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+from core.outcome_store import outcome_store
+
+DEFAULT_ANALYTICS_STORE_PATH = Path(__file__).parent.parent / "data" / "analytics.db"
+LEGACY_CHECKPOINT_PATH = Path(__file__).parent.parent / "data" / "analytics_checkpoint.json"
+DEFAULT_PUSH_INTERVAL = 30.0  # segundos
+
+
+def _to_float(value: Any) -> float:
+    """Convertir valores de Sheets ('45', 45, '45%', '') a float"""
+    try:
+        if isinstance(value, str):
+            value = value.replace("%", "").replace(",", "").strip()
+        return float(value) if value not in (None, "") else 0.0
+    except (TypeError, ValueError):
+        return 0.0
+
+
+@dataclass
+class AnalyticsAggregates:
+    """Agregados de todos los diagnósticos guardados"""
+    total_diagnosticos: int = 0
+    tier_counts: Dict[str, int] = field(default_factory=lambda: {"A": 0, "B": 0, "C": 0})
+    score_sum: float = 0.0
+    prob_cierre_sum: float = 0.0
+    pipeline_value: float = 0.0
+
+    def add(
+        self,
+        tier: str,
+        score_final: float,
+        probabilidad_cierre: float,
+        monto_min: float,
+        monto_max: float
+    ):
+        """Sumar un diagnóstico (O(1))"""
+        self.total_diagnosticos += 1
+        self.tier_counts[tier] = self.tier_counts.get(tier, 0) + 1
+        self.score_sum += score_final
+        self.prob_cierre_sum += probabilidad_cierre
+        self.pipeline_value += (monto_min + monto_max) / 2 * (probabilidad_cierre / 100)
+
+    def counters(self) -> Dict[str, float]:
+        """Contadores planos (nombre -> valor) tal como se guardan en SQLite"""
+        counters = {
+            "total_diagnosticos": self.total_diagnosticos,
+            "score_sum": self.score_sum,
+            "prob_cierre_sum": self.prob_cierre_sum,
+            "pipeline_value": self.pipeline_value
+        }
+        for tier, count in self.tier_counts.items():
+            counters[f"tier:{tier}"] = count
+        return counters
+
+    @classmethod
+    def from_counters(cls, counters: Dict[str, float]) -> "AnalyticsAggregates":
+        aggregates = cls(
+            total_diagnosticos=int(counters.get("total_diagnosticos", 0)),
+            score_sum=counters.get("score_sum", 0.0),
+            prob_cierre_sum=counters.get("prob_cierre_sum", 0.0),
+            pipeline_value=counters.get("pipeline_value", 0.0)
+        )
+        for name, value in counters.items():
+            if name.startswith("tier:"):
+                aggregates.tier_counts[name[len("tier:"):]] = int(value)
+        return aggregates
+
+    def to_rows(self, timestamp: str) -> List[List[Any]]:
+        """Filas del worksheet analytics (mismo formato que el cálculo con pandas)"""
+        total = self.total_diagnosticos
+        tier_a = self.tier_counts.get("A", 0)
+        score_promedio = self.score_sum / total if total > 0 else 0
+        prob_cierre_promedio = self.prob_cierre_sum / total if total > 0 else 0
+
+        return [
+            ["Métrica", "Valor", "Última Actualización"],
+            ["Total Diagnósticos", total, timestamp],
+            ["Tier A", tier_a, ""],
+            ["Tier B", self.tier_counts.get("B", 0), ""],
+            ["Tier C", self.tier_counts.get("C", 0), ""],
+            ["Score Promedio", f"{score_promedio:.1f}", ""],
+            ["Prob. Cierre Promedio", f"{prob_cierre_promedio:.1f}%", ""],
+            ["Pipeline Value Estimado", f"${self.pipeline_value:,.0f} COP", ""],
+            ["Conversion Rate (Tier A)", outcome_store.conversion_rate_label("tier", "A"), ""]
+        ]
+
+
+class AnalyticsStore:
+    """
+    Store de agregados en SQLite con push con debounce
+
+    record() suma el diagnóstico a los contadores en una transacción; el
+    push al worksheet se agenda una sola vez por intervalo aunque lleguen
+    N diagnósticos en ráfaga.
+    """
+
+    def __init__(
+        self,
+        path: Optional[Path] = None,
+        push_interval: float = DEFAULT_PUSH_INTERVAL
+    ):
+        self.path = Path(path or os.getenv("ANALYTICS_STORE_PATH", DEFAULT_ANALYTICS_STORE_PATH))
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.push_interval = push_interval
+        self._lock = threading.Lock()
+        self._push_timer: Optional[threading.Timer] = None
+        self._push_fn: Optional[Callable[[List[List[Any]]], None]] = None
+        self._init_schema()
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(str(self.path), timeout=30)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    def _init_schema(self):
+        with self._connect() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS analytics_counters (
+                    name TEXT PRIMARY KEY,
+                    value REAL NOT NULL DEFAULT 0
+                )
+            """)
+        self._import_legacy_checkpoint()
+
+    def _import_legacy_checkpoint(self):
+        """Sembrar los contadores desde el checkpoint JSON anterior (una sola vez)"""
+        if not LEGACY_CHECKPOINT_PATH.exists() or not self.needs_recompute:
+            return
+        try:
+            with open(LEGACY_CHECKPOINT_PATH, 'r', encoding='utf-8') as f:
+                aggregates = AnalyticsAggregates(**json.load(f))
+        except Exception as e:
+            print(f"[ANALYTICS] ⚠️ Checkpoint inválido, se recalculará: {str(e)}")
+            return
+        self._replace(aggregates)
+        print(f"[ANALYTICS] ✓ Checkpoint importado - Total: {aggregates.total_diagnosticos}")
+
+    @property
+    def needs_recompute(self) -> bool:
+        """Sin contadores no hay base incremental: hace falta una reconciliación"""
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT 1 FROM analytics_counters WHERE name = 'total_diagnosticos'"
+            ).fetchone()
+        return row is None
+
+    @property
+    def aggregates(self) -> AnalyticsAggregates:
+        """Agregados actuales (de todos los workers)"""
+        with self._connect() as conn:
+            counters = dict(conn.execute("SELECT name, value FROM analytics_counters"))
+        return AnalyticsAggregates.from_counters(counters)
+
+    def record(self, tier: str, score_final: float, probabilidad_cierre: float,
+               monto_min: float, monto_max: float):
+        """Registrar un diagnóstico nuevo: incrementos atómicos sobre los contadores"""
+        delta = AnalyticsAggregates(tier_counts={})
+        delta.add(tier, score_final, probabilidad_cierre, monto_min, monto_max)
+        with self._connect() as conn:
+            conn.executemany(
+                """
+                INSERT INTO analytics_counters (name, value) VALUES (?, ?)
+                ON CONFLICT (name) DO UPDATE SET value = value + excluded.value
+                """,
+                list(delta.counters().items())
+            )
+
+    def recompute(self, records: Iterable[Dict[str, Any]]):
+        """Reconstruir los agregados desde filas del worksheet scores"""
+        aggregates = AnalyticsAggregates()
+        for row in records:
+            aggregates.add(
+                tier=str(row.get("tier", "")),
+                score_final=_to_float(row.get("score_final")),
+                probabilidad_cierre=_to_float(row.get("probabilidad_cierre")),
+                monto_min=_to_float(row.get("monto_min")),
+                monto_max=_to_float(row.get("monto_max"))
+            )
+
+        self._replace(aggregates)
+        print(f"[ANALYTICS] ♻️ Recalculado desde Sheets - Total: {aggregates.total_diagnosticos}")
+
+    def _replace(self, aggregates: AnalyticsAggregates):
+        """Reemplazar todos los contadores en una sola transacción"""
+        with self._connect() as conn:
+            conn.execute("DELETE FROM analytics_counters")
+            conn.executemany(
+                "INSERT INTO analytics_counters (name, value) VALUES (?, ?)",
+                list(aggregates.counters().items())
+            )
+
+    def rows(self) -> List[List[Any]]:
+        timestamp = datetime.now().strftime("%d/%m/%Y %H:%M:%S")
+        return self.aggregates.to_rows(timestamp)
+
+    def schedule_push(self, push_fn: Callable[[List[List[Any]]], None]):
+        """Agendar el push al worksheet (debounce: un push por intervalo)"""
+        with self._lock:
+            self._push_fn = push_fn
+            if self._push_timer is not None:
+                return
+            self._push_timer = threading.Timer(self.push_interval, self.flush)
+            self._push_timer.daemon = True
+            self._push_timer.start()
+
+    def flush(self):
+        """Enviar los agregados actuales al worksheet (llamado por el timer o al cerrar)"""
+        with self._lock:
+            self._push_timer = None
+            push_fn = self._push_fn
+
+        if push_fn is None:
+            return
+
+        try:
+            push_fn(self.rows())
+            print(f"[ANALYTICS] ✅ Push - Total: {self.aggregates.total_diagnosticos}")
+        except Exception as e:
+            print(f"[ANALYTICS] ⚠️ Error en push (no crítico): {str(e)}")
+            print(traceback.format_exc())
+
+
+# Singleton global del proceso
+analytics_store = AnalyticsStore()
+
+
+if __name__ == '__main__':
+    import sys
+
+    sys.path.append(str(Path(__file__).parent.parent))
+    from integrations.sheets_connector import SheetsConnector
+
+    if len(sys.argv) < 2 or sys.argv[1] != "recompute":
+        print("Uso: python -m integrations.analytics_store recompute")
+        sys.exit(1)
+
+    connector = SheetsConnector()
+    connector.recompute_analytics()
@@ -4,6 +4,7 @@ FIXED: Logs detallados + Mejor manejo de errores + Nueva API Key
 """
 
 import resend
+import base64
 from pathlib import Path
 from typing import Optional
 import traceback
@@ -59,9 +60,9 @@ class EmailSender:
     def send_confirmation_email(
         self,
         result: DiagnosticResult,
-        pdf_path: Optional[Path] = None
+        pdf_content: Optional[bytes] = None
     ) -> bool:
-        """Enviar email de confirmación según Tier"""
+        """Enviar email de confirmación según Tier (pdf_content: PDF ya renderizado en memoria)"""
 
         try:
             # Determinar destinatario real
@@ -111,18 +112,15 @@ class EmailSender:
             print(f"  To: {email_params['to']}")
             print(f"  Subject: {email_params['subject'][:50]}...")
 
-            # Adjuntar PDF si existe
-            if pdf_path and pdf_path.exists():
-                with open(pdf_path, 'rb') as f:
-                    pdf_content = f.read()
-
+            # Adjuntar PDF si se generó (base64 directo desde el buffer en memoria)
+            if pdf_content:
                 email_params["attachments"] = [{
                     "filename": f"Diagnostico_AI_{result.prospect_info.nombre_empresa}.pdf",
-                    "content": list(pdf_content)  # Resend requiere lista de bytes
+                    "content": base64.b64encode(pdf_content).decode("ascii")
                 }]
-                print(f"[EMAIL PDF] Adjuntando PDF: {pdf_path}")
+                print(f"[EMAIL PDF] Adjuntando PDF ({len(pdf_content)} bytes)")
             else:
-                print(f"[EMAIL PDF] No se adjuntará PDF (no existe o no se proporcionó)")
+                print(f"[EMAIL PDF] No se adjuntará PDF (no se generó)")
 
             # Enviar con Resend
             print(f"\n[EMAIL] Llamando a Resend API...")
@@ -5,148 +5,452 @@ FIXED: Streamlit Cloud compatible path
 
 from reportlab.lib.pagesizes import letter
 from reportlab.lib import colors
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle, PageBreak
+from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle, StyleSheet1
+from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle, PageBreak, Flowable
 from reportlab.lib.units import inch
+from reportlab.pdfbase.pdfmetrics import stringWidth
+from reportlab.pdfgen.canvas import Canvas
 from datetime import datetime
-from pathlib import Path
-import tempfile
+from functools import lru_cache
+from io import BytesIO
+from typing import Any, Dict, List, Optional, Tuple
+import os
+import threading
 
 from core.models import DiagnosticResult
 
 
-class PDFGenerator:
-    """Generador de PDFs ejecutivos para prospectos"""
-
-    def __init__(self):
-        self.output_dir = Path(tempfile.gettempdir()) / "ai_diagnostics"
-        self.output_dir.mkdir(parents=True, exist_ok=True)
-
-        self.styles = getSampleStyleSheet()
-        self.title_style = ParagraphStyle(
-            'CustomTitle',
-            parent=self.styles['Heading1'],
-            fontSize=24,
-            textColor=colors.HexColor('#1f2937'),
-            spaceAfter=12
-        )
-        self.heading_style = ParagraphStyle(
-            'CustomHeading',
-            parent=self.styles['Heading2'],
-            fontSize=16,
-            textColor=colors.HexColor('#374151'),
-            spaceAfter=10
-        )
-
-    def generate_prospect_pdf(self, result: DiagnosticResult) -> Path:
-        """Generar PDF de 2 páginas para el prospecto"""
-
-        filename = f"diagnostico_{result.diagnostic_id}.pdf"
-        filepath = self.output_dir / filename
-
-        doc = SimpleDocTemplate(str(filepath), pagesize=letter)
-        story = []
-
-        story.append(Paragraph("Diagnóstico AI Readiness", self.title_style))
-        story.append(Paragraph(f"{result.prospect_info.nombre_empresa}", self.styles['Heading2']))
-        story.append(Spacer(1, 0.3*inch))
+@lru_cache(maxsize=1)
+def pdf_styles() -> Tuple[StyleSheet1, ParagraphStyle, ParagraphStyle]:
+    """Stylesheet base + estilos propios, construidos una sola vez por proceso (solo lectura)"""
+    styles = getSampleStyleSheet()
+    title_style = ParagraphStyle(
+        'CustomTitle',
+        parent=styles['Heading1'],
+        fontSize=24,
+        textColor=colors.HexColor('#1f2937'),
+        spaceAfter=12
+    )
+    heading_style = ParagraphStyle(
+        'CustomHeading',
+        parent=styles['Heading2'],
+        fontSize=16,
+        textColor=colors.HexColor('#374151'),
+        spaceAfter=10
+    )
+    return styles, title_style, heading_style
+
+
+def warm_up():
+    """Precargar estilos, métricas de fuentes y módulos de layout (workers del pool de PDFs)"""
+    styles, title_style, heading_style = pdf_styles()
+    doc = SimpleDocTemplate(BytesIO(), pagesize=letter)
+    doc.build([
+        Paragraph("Diagnóstico", title_style),
+        Paragraph("<b>negrita</b> <i>itálica</i>", styles['BodyText']),
+        Table([['Dimensión', 'Score']], style=[('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold')])
+    ])
+
+
+def render_inputs(result: DiagnosticResult) -> Dict[str, Any]:
+    """Todo lo que el reporte toma del diagnóstico (mismos inputs = mismo PDF)"""
+    info = result.prospect_info
+    return {
+        "nombre_empresa": info.nombre_empresa,
+        "sector": info.sector,
+        "scores": [
+            result.score.madurez_digital.score_total,
+            result.score.capacidad_inversion.score_total,
+            result.score.viabilidad_comercial.score_total
+        ],
+        "fortalezas": [i.descripcion for i in result.insights if i.categoria == "fortaleza"],
+        "oportunidades": [i.descripcion for i in result.insights if i.categoria == "oportunidad"][:3],
+        "quick_wins": [[qw.titulo, qw.descripcion, qw.impacto_estimado] for qw in result.quick_wins[:2]]
+    }
+
+
+# ==================================================
+# FRAGMENTOS CACHEADOS
+# ==================================================
+# Casi todo el reporte es texto fijo o sale de catálogos chicos (insights y
+# quick wins de insight_rules, bloque de resultados por sector). Esos
+# flowables se construyen una vez por proceso: el parseo del markup y el
+# corte de líneas no se repiten en cada PDF. Solo el nombre de la empresa,
+# la tabla de scores y el cierre se arman por lead.
+_BUILD_LOCK = threading.Lock()
+
+_SPACER_015 = Spacer(1, 0.15*inch)
+_SPACER_020 = Spacer(1, 0.2*inch)
+_SPACER_030 = Spacer(1, 0.3*inch)
+
+_SCORE_TABLE_STYLE = TableStyle([
+    ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#e5e7eb')),
+    ('TEXTCOLOR', (0, 0), (-1, 0), colors.HexColor('#1f2937')),
+    ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
+    ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+    ('FONTSIZE', (0, 0), (-1, 0), 12),
+    ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
+    ('GRID', (0, 0), (-1, -1), 1, colors.grey),
+])
+
+
+class _SharedParagraph(Paragraph):
+    """Paragraph de un fragmento cacheado: corta líneas una sola vez por ancho de frame"""
+
+    def wrap(self, availWidth, availHeight):
+        wrapped = self.__dict__.get("_wrapped")
+        if wrapped is None or wrapped[0] != availWidth:
+            wrapped = self._wrapped = (availWidth, super().wrap(availWidth, availHeight))
+        return wrapped[1]
+
+
+def _style(name: str) -> ParagraphStyle:
+    styles, title_style, heading_style = pdf_styles()
+    return {"title": title_style, "heading": heading_style}.get(name) or styles[name]
+
+
+@lru_cache(maxsize=None)
+def _paragraph(text: str, style: str) -> _SharedParagraph:
+    """Título / encabezado fijo"""
+    return _SharedParagraph(text, _style(style))
+
+
+@lru_cache(maxsize=1024)
+def _insights_fragment(fortalezas: Tuple[str, ...], oportunidades: Tuple[str, ...]) -> Tuple[Flowable, ...]:
+    """Fortalezas y oportunidades de la página 1 (textos del catálogo de insights)"""
+    fortalezas_text = "<br/>".join(f"• {descripcion}" for descripcion in fortalezas)
+    oportunidades_text = "<br/>".join(f"• {descripcion}" for descripcion in oportunidades)
+    return (
+        _paragraph("Fortalezas Identificadas", "heading"),
+        _SharedParagraph(fortalezas_text or "• Análisis en curso", _style('BodyText')),
+        _SPACER_020,
+        _paragraph("Oportunidades de Mejora", "heading"),
+        _SharedParagraph(oportunidades_text or "• Múltiples oportunidades identificadas", _style('BodyText')),
+    )
+
+
+@lru_cache(maxsize=512)
+def _next_steps_fragment(sector: str, quick_wins: Tuple[Tuple[str, str, str], ...]) -> Tuple[Flowable, ...]:
+    """Página 2 hasta el encabezado de cierre: quick wins (catálogo) + resultados del sector"""
+    fragment = [
+        _paragraph("Próximos Pasos Sugeridos", "title"),
+        _SPACER_020,
+        _paragraph("Quick Wins (3-6 meses)", "heading"),
+    ]
+
+    for titulo, descripcion, impacto_estimado in quick_wins:
+        qw_text = f"""
+            <b>{titulo}</b><br/>
+            {descripcion}<br/>
+            <i>Impacto estimado: {impacto_estimado}</i>
+            """
+        fragment.append(_SharedParagraph(qw_text, _style('BodyText')))
+        fragment.append(_SPACER_015)
 
-        story.append(Paragraph("Su Situación Actual", self.heading_style))
+    resultados_text = f"""
+        Empresas del sector {sector} que implementaron
+        iniciativas de IA lograron:<br/>
+        • Reducción 20-40% en costos operativos<br/>
+        • Mejora 30-50% en tiempos de respuesta<br/>
+        • Incremento 15-25% en satisfacción del cliente<br/>
+        • ROI positivo en 6-12 meses
+        """
 
-        scores_data = [
-            ['Dimensión', 'Score', 'Evaluación'],
-            [
-                'Madurez Digital',
-                f"{result.score.madurez_digital.score_total}/40",
-                self._get_evaluation(result.score.madurez_digital.score_total, 40)
-            ],
-            [
-                'Capacidad de Inversión',
-                f"{result.score.capacidad_inversion.score_total}/30",
-                self._get_evaluation(result.score.capacidad_inversion.score_total, 30)
-            ],
-            [
-                'Viabilidad Comercial',
-                f"{result.score.viabilidad_comercial.score_total}/30",
-                self._get_evaluation(result.score.viabilidad_comercial.score_total, 30)
-            ]
+    fragment += [
+        _SPACER_020,
+        _paragraph("Resultados Esperados", "heading"),
+        _SharedParagraph(resultados_text, _style('BodyText')),
+        _SPACER_030,
+        _paragraph("¿Qué sigue?", "heading"),
+    ]
+    return tuple(fragment)
+
+
+# ==================================================
+# RENDER DIRECTO EN CANVAS (fast path)
+# ==================================================
+# El reporte tiene siempre las mismas 2 páginas: este motor dibuja ese
+# layout con coordenadas fijas (márgenes, padding del Frame, métricas de
+# los estilos y de la tabla iguales a SimpleDocTemplate) sin flowables ni
+# layout de platypus. Si un texto trae markup, no entra en su página o
+# tiene una palabra más ancha que el frame, lanza _CanvasOverflow y
+# PDFGenerator usa platypus.
+PDF_ENGINES = ("canvas", "platypus")
+
+_PAGE_WIDTH, _PAGE_HEIGHT = letter
+_FRAME_PADDING = 6
+_FRAME_X = inch + _FRAME_PADDING
+_FRAME_TOP = _PAGE_HEIGHT - inch - _FRAME_PADDING
+_FRAME_BOTTOM = inch + _FRAME_PADDING
+_FRAME_WIDTH = _PAGE_WIDTH - 2 * (inch + _FRAME_PADDING)
+
+_TABLE_COL_WIDTHS = (2.5*inch, 1.5*inch, 2*inch)
+# (fuente, tamaño, bottomPadding, topPadding, fondo, color del texto)
+_TABLE_HEADER = ('Helvetica-Bold', 12, 12, 3, colors.HexColor('#e5e7eb'), colors.HexColor('#1f2937'))
+_TABLE_BODY = ('Helvetica', 10, 3, 3, None, colors.black)
+_TABLE_LEADING = 12
+_TABLE_PADDING_X = 6
+
+Run = Tuple[str, str]  # (fuente, texto)
+
+
+class _CanvasOverflow(Exception):
+    """El contenido no entra en el layout fijo: se renderiza con platypus"""
+
+
+def _plain(text: str) -> str:
+    """Texto sin markup con espacios colapsados (como lo muestra Paragraph)"""
+    if "<" in text or "&" in text:
+        raise _CanvasOverflow(f"markup en el texto: {text[:40]!r}")
+    return " ".join(text.split())
+
+
+@lru_cache(maxsize=4096)
+def _wrap_runs(runs: Tuple[Run, ...], font_size: float) -> Tuple[Tuple[Run, ...], ...]:
+    """Corte de líneas greedy (como Paragraph.breakLines) de una línea con varias fuentes"""
+    words = [(font, word) for font, text in runs for word in text.split()]
+    lines: List[List[Run]] = [[]]
+    line_width = 0.0
+    for font, word in words:
+        word_width = stringWidth(word, font, font_size)
+        if word_width > _FRAME_WIDTH:
+            raise _CanvasOverflow(f"palabra más ancha que el frame: {word[:40]!r}")
+        line = lines[-1]
+        space = stringWidth(" ", line[-1][0], font_size) if line else 0.0
+        if line and line_width + space + word_width > _FRAME_WIDTH:
+            lines.append([(font, word)])
+            line_width = word_width
+        elif line and line[-1][0] == font:
+            line[-1] = (font, f"{line[-1][1]} {word}")
+            line_width += space + word_width
+        else:
+            if line:
+                line[-1] = (line[-1][0], line[-1][1] + " ")
+                line_width += space
+            line.append((font, word))
+            line_width += word_width
+    return tuple(tuple(line) for line in lines)
+
+
+class _CanvasReport:
+    """Cursor vertical sobre el canvas con las reglas de espaciado del Frame de platypus"""
+
+    def __init__(self, canv: Canvas):
+        self.canv = canv
+        self.y = _FRAME_TOP
+        self.at_top = True
+        self.space_after = 0.0
+
+    def _take(self, space_before: float, height: float) -> float:
+        """Reservar altura (con el spaceBefore colapsado contra el spaceAfter previo)"""
+        top = self.y - (0 if self.at_top else max(space_before - self.space_after, 0))
+        if top - height < _FRAME_BOTTOM:
+            raise _CanvasOverflow("el contenido no entra en la página")
+        self.y = top - height
+        self.at_top = False
+        return top
+
+    def paragraph(self, lines: List[Tuple[Run, ...]], style: ParagraphStyle):
+        """Líneas duras (<br/>) con sus runs de fuente; cada una se corta al ancho del frame"""
+        wrapped = [
+            wrapped_line
+            for line in lines
+            for wrapped_line in (_wrap_runs(line, style.fontSize) if line else ((),))
         ]
+        top = self._take(style.spaceBefore, len(wrapped) * style.leading)
+
+        text = self.canv.beginText(_FRAME_X, top - style.fontSize)
+        text.setFillColor(style.textColor)
+        current_font = None
+        for line in wrapped:
+            for font, chunk in line:
+                if font != current_font:
+                    text.setFont(font, style.fontSize, style.leading)
+                    current_font = font
+                text.textOut(chunk)
+            text.textLine()
+        self.canv.drawText(text)
+
+        self.y -= style.spaceAfter
+        self.space_after = style.spaceAfter
+
+    def spacer(self, height: float):
+        self._take(0, height)
+        self.space_after = 0.0
+
+    def score_table(self, rows: List[List[str]]):
+        """Tabla de scores con el mismo estilo que _SCORE_TABLE_STYLE"""
+        cell_styles = [_TABLE_HEADER] + [_TABLE_BODY] * (len(rows) - 1)
+        heights = [_TABLE_LEADING + bottom + top for _, _, bottom, top, _, _ in cell_styles]
+        table_width = sum(_TABLE_COL_WIDTHS)
+        x0 = _FRAME_X + (_FRAME_WIDTH - table_width) / 2  # hAlign CENTER
+        row_top = self._take(0, sum(heights))
+        canv = self.canv
+
+        row_bottoms = []
+        for row, (font, size, bottom, _, background, color), height in zip(rows, cell_styles, heights):
+            row_bottom = row_top - height
+            row_bottoms.append(row_bottom)
+            if background is not None:
+                canv.setFillColor(background)
+                canv.rect(x0, row_bottom, table_width, height, stroke=0, fill=1)
+            canv.setFillColor(color)
+            canv.setFont(font, size)
+            x = x0
+            # valign BOTTOM de Table: baseline = fondo + bottomPadding + leading - fontSize
+            baseline = row_bottom + bottom + _TABLE_LEADING - size
+            for cell, width in zip(row, _TABLE_COL_WIDTHS):
+                canv.drawString(x + _TABLE_PADDING_X, baseline, cell)
+                x += width
+            row_top = row_bottom
+
+        canv.setStrokeColor(colors.grey)
+        canv.setLineWidth(1)
+        top = row_bottoms[0] + heights[0]
+        bottom = row_bottoms[-1]
+        x_lines = [x0]
+        for width in _TABLE_COL_WIDTHS:
+            x_lines.append(x_lines[-1] + width)
+        canv.lines(
+            [(x0, y, x0 + table_width, y) for y in [top] + row_bottoms]
+            + [(x, top, x, bottom) for x in x_lines]
+        )
+        self.space_after = 0.0
+
+    def page_break(self):
+        self.canv.showPage()
+        self.y = _FRAME_TOP
+        self.at_top = True
+        self.space_after = 0.0
+
+
+def _render_canvas(result: DiagnosticResult, inputs: Dict[str, Any], score_rows: List[List[str]]) -> bytes:
+    """Reporte de 2 páginas dibujado directo en el canvas (_CanvasOverflow si no entra)"""
+    styles, title_style, heading_style = pdf_styles()
+    body, heading2 = styles['BodyText'], styles['Heading2']
+    regular, bold, italic = 'Helvetica', 'Helvetica-Bold', 'Helvetica-Oblique'
+    empresa = _plain(inputs["nombre_empresa"])
+
+    buffer = BytesIO()
+    report = _CanvasReport(Canvas(buffer, pagesize=letter))
+
+    report.paragraph([((bold, "Diagnóstico AI Readiness"),)], title_style)
+    report.paragraph([((bold, empresa),)], heading2)
+    report.spacer(0.3*inch)
+
+    report.paragraph([((bold, "Su Situación Actual"),)], heading_style)
+    report.score_table(score_rows)
+    report.spacer(0.3*inch)
+
+    report.paragraph([((bold, "Fortalezas Identificadas"),)], heading_style)
+    report.paragraph(
+        [((regular, f"• {_plain(text)}"),) for text in inputs["fortalezas"]]
+        or [((regular, "• Análisis en curso"),)],
+        body
+    )
+    report.spacer(0.2*inch)
+
+    report.paragraph([((bold, "Oportunidades de Mejora"),)], heading_style)
+    report.paragraph(
+        [((regular, f"• {_plain(text)}"),) for text in inputs["oportunidades"]]
+        or [((regular, "• Múltiples oportunidades identificadas"),)],
+        body
+    )
+
+    report.page_break()
+
+    report.paragraph([((bold, "Próximos Pasos Sugeridos"),)], title_style)
+    report.spacer(0.2*inch)
+
+    report.paragraph([((bold, "Quick Wins (3-6 meses)"),)], heading_style)
+    for titulo, descripcion, impacto_estimado in inputs["quick_wins"]:
+        report.paragraph([
+            ((bold, _plain(titulo)),),
+            ((regular, _plain(descripcion)),),
+            ((italic, f"Impacto estimado: {_plain(impacto_estimado)}"),)
+        ], body)
+        report.spacer(0.15*inch)
+    report.spacer(0.2*inch)
+
+    report.paragraph([((bold, "Resultados Esperados"),)], heading_style)
+    report.paragraph([
+        ((regular, f"Empresas del sector {_plain(inputs['sector'])} que implementaron iniciativas de IA lograron:"),),
+        ((regular, "• Reducción 20-40% en costos operativos"),),
+        ((regular, "• Mejora 30-50% en tiempos de respuesta"),),
+        ((regular, "• Incremento 15-25% en satisfacción del cliente"),),
+        ((regular, "• ROI positivo en 6-12 meses"),)
+    ], body)
+    report.spacer(0.3*inch)
+
+    report.paragraph([((bold, "¿Qué sigue?"),)], heading_style)
+    report.paragraph([
+        ((regular, "Lo contactaremos en las próximas 48 horas para:"),),
+        (),
+        ((regular, "1. Presentarle casos de éxito relevantes para su sector"),),
+        ((regular, f"2. Mostrarle el ROI estimado para {empresa}"),),
+        ((regular, "3. Diseñar un plan de implementación específico"),),
+        ((regular, "4. Responder todas sus preguntas"),),
+        (),
+        ((bold, "Contacto:"), (regular, " Andrés - AI Consulting")),
+        ((bold, "Email:"), (regular, " negusnett@gmail.com"))
+    ], body)
+
+    report.canv.showPage()
+    report.canv.save()
+    return buffer.getvalue()
 
-        score_table = Table(scores_data, colWidths=[2.5*inch, 1.5*inch, 2*inch])
-        score_table.setStyle(TableStyle([
-            ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#e5e7eb')),
-            ('TEXTCOLOR', (0, 0), (-1, 0), colors.HexColor('#1f2937')),
-            ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-            ('FONTSIZE', (0, 0), (-1, 0), 12),
-            ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-            ('GRID', (0, 0), (-1, -1), 1, colors.grey),
-        ]))
-
-        story.append(score_table)
-        story.append(Spacer(1, 0.3*inch))
-
-        story.append(Paragraph("Fortalezas Identificadas", self.heading_style))
 
-        fortalezas_text = "<br/>".join([
-            f"• {insight.descripcion}"
-            for insight in result.insights
-            if insight.categoria == "fortaleza"
-        ])
+class PDFGenerator:
+    """Generador de PDFs ejecutivos para prospectos"""
 
-        if fortalezas_text:
-            story.append(Paragraph(fortalezas_text, self.styles['BodyText']))
-        else:
-            story.append(Paragraph("• Análisis en curso", self.styles['BodyText']))
+    def __init__(self, engine: Optional[str] = None):
+        self.styles, self.title_style, self.heading_style = pdf_styles()
 
-        story.append(Spacer(1, 0.2*inch))
+        # canvas: fast path con fallback a platypus; platypus: siempre layout completo
+        self.engine = engine or os.getenv("PDF_ENGINE", "canvas")
+        if self.engine not in PDF_ENGINES:
+            raise ValueError(f"Motor de PDF inválido: {self.engine} (opciones: {', '.join(PDF_ENGINES)})")
 
-        story.append(Paragraph("Oportunidades de Mejora", self.heading_style))
+    def render_prospect_pdf(self, result: DiagnosticResult) -> bytes:
+        """Renderizar el PDF de 2 páginas en memoria (sin pasar por disco)"""
+        return self.render_with_engine(result)[0]
 
-        oportunidades_text = "<br/>".join([
-            f"• {insight.descripcion}"
-            for insight in result.insights
-            if insight.categoria == "oportunidad"
-        ][:3])
+    def render_with_engine(self, result: DiagnosticResult) -> Tuple[bytes, str]:
+        """PDF en memoria + motor que lo generó (canvas, o platypus si el fast path no aplica)"""
+        inputs = render_inputs(result)
+        score_rows = self._score_rows(result)
 
-        if oportunidades_text:
-            story.append(Paragraph(oportunidades_text, self.styles['BodyText']))
-        else:
-            story.append(Paragraph("• Múltiples oportunidades identificadas", self.styles['BodyText']))
+        if self.engine == "canvas":
+            try:
+                return _render_canvas(result, inputs, score_rows), "canvas"
+            except _CanvasOverflow as e:
+                print(f"[PDF] ⚠️ Fast path descartado para {result.diagnostic_id} ({e}), se usa platypus")
 
-        story.append(PageBreak())
+        return self._render_platypus(result, inputs, score_rows), "platypus"
 
-        story.append(Paragraph("Próximos Pasos Sugeridos", self.title_style))
-        story.append(Spacer(1, 0.2*inch))
+    def _render_platypus(self, result: DiagnosticResult, inputs: Dict[str, Any], score_rows: List[List[str]]) -> bytes:
+        """Layout completo con flowables (pagina el contenido que no entra)"""
+        buffer = BytesIO()
+        doc = SimpleDocTemplate(buffer, pagesize=letter)
+        story = []
 
-        story.append(Paragraph("Quick Wins (3-6 meses)", self.heading_style))
+        story.append(_paragraph("Diagnóstico AI Readiness", "title"))
+        story.append(Paragraph(f"{result.prospect_info.nombre_empresa}", self.styles['Heading2']))
+        story.append(_SPACER_030)
 
-        for qw in result.quick_wins[:2]:
-            qw_text = f"""
-            <b>{qw.titulo}</b><br/>
-            {qw.descripcion}<br/>
-            <i>Impacto estimado: {qw.impacto_estimado}</i>
-            """
-            story.append(Paragraph(qw_text, self.styles['BodyText']))
-            story.append(Spacer(1, 0.15*inch))
+        story.append(_paragraph("Su Situación Actual", "heading"))
 
-        story.append(Spacer(1, 0.2*inch))
+        score_table = Table(score_rows, colWidths=list(_TABLE_COL_WIDTHS))
+        score_table.setStyle(_SCORE_TABLE_STYLE)
 
-        story.append(Paragraph("Resultados Esperados", self.heading_style))
+        story.append(score_table)
+        story.append(_SPACER_030)
 
-        resultados_text = f"""
-        Empresas del sector {result.prospect_info.sector} que implementaron
-        iniciativas de IA lograron:<br/>
-        • Reducción 20-40% en costos operativos<br/>
-        • Mejora 30-50% en tiempos de respuesta<br/>
-        • Incremento 15-25% en satisfacción del cliente<br/>
-        • ROI positivo en 6-12 meses
-        """
+        story.extend(_insights_fragment(tuple(inputs["fortalezas"]), tuple(inputs["oportunidades"])))
 
-        story.append(Paragraph(resultados_text, self.styles['BodyText']))
-        story.append(Spacer(1, 0.3*inch))
+        story.append(PageBreak())
 
-        story.append(Paragraph("¿Qué sigue?", self.heading_style))
+        story.extend(_next_steps_fragment(inputs["sector"], tuple(map(tuple, inputs["quick_wins"]))))
 
         next_steps_text = f"""
         Lo contactaremos en las próximas 48 horas para:<br/><br/>
@@ -161,10 +465,32 @@ class PDFGenerator:
 
         story.append(Paragraph(next_steps_text, self.styles['BodyText']))
 
-        doc.build(story)
-        print(f"[PDF SUCCESS] Generado en {filepath}")
+        # Los fragmentos son compartidos: platypus les asigna canv/_frame durante el build
+        with _BUILD_LOCK:
+            doc.build(story)
 
-        return filepath
+        return buffer.getvalue()
+
+    def _score_rows(self, result: DiagnosticResult) -> List[List[str]]:
+        """Filas de la tabla de scores (las dos implementaciones dibujan las mismas)"""
+        return [
+            ['Dimensión', 'Score', 'Evaluación'],
+            [
+                'Madurez Digital',
+                f"{result.score.madurez_digital.score_total}/40",
+                self._get_evaluation(result.score.madurez_digital.score_total, 40)
+            ],
+            [
+                'Capacidad de Inversión',
+                f"{result.score.capacidad_inversion.score_total}/30",
+                self._get_evaluation(result.score.capacidad_inversion.score_total, 30)
+            ],
+            [
+                'Viabilidad Comercial',
+                f"{result.score.viabilidad_comercial.score_total}/30",
+                self._get_evaluation(result.score.viabilidad_comercial.score_total, 30)
+            ]
+        ]
 
     def _get_evaluation(self, score: int, max_score: int) -> str:
         """Evaluar un score como Alto/Medio/Bajo"""
@@ -0,0 +1,204 @@
+"""
+Pool de procesos para renderizar PDFs fuera de los workers de la API
+
+El layout de platypus es CPU puro: en un thread del API compite por el GIL
+con los requests. Cada worker de uvicorn tiene su pool; los procesos se
+reparten los cores entre workers (PDF_POOL_WORKERS, o cores /
+WEB_CONCURRENCY). Cada proceso se precalienta al arrancar (estilos, fuentes
+y módulos de reportlab cargados) y tiene su propio PDFGenerator.
+
+- render(result): encola y resuelve con los bytes del PDF (renderizado en
+  memoria, sin pasar por disco); si ya hay un render en curso con el mismo
+  content_key (mismos inputs) se devuelve el mismo Future
+- Si un proceso muere (OOM, segfault) el pool queda roto: se recrea y los
+  renders afectados se reencolan una vez
+- Los tiempos de render medidos dentro del worker van al histograma
+  pdf_render_seconds de /metrics
+"""
+
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Dict, Optional, Tuple
+
+from core.metrics import metrics
+from core.models import DiagnosticResult
+from integrations.pdf_store import content_key
+
+PDF_RENDER_SECONDS = metrics.histogram(
+    "pdf_render_seconds",
+    "Tiempo de render de un PDF dentro del worker del pool (canvas o platypus)",
+    ("engine",)
+)
+PDF_RENDER_DEDUPLICATED = metrics.counter(
+    "pdf_render_deduplicated_total",
+    "Pedidos de render que se unieron a uno en curso con el mismo content_key"
+)
+PDF_POOL_RESTARTS = metrics.counter(
+    "pdf_pool_restarts_total",
+    "Veces que se recreó el pool de render tras morir un proceso"
+)
+
+
+def default_pool_size() -> int:
+    """PDF_POOL_WORKERS, o los cores repartidos entre los workers de uvicorn"""
+    configured = os.getenv("PDF_POOL_WORKERS")
+    if configured:
+        return max(1, int(configured))
+    api_workers = max(1, int(os.getenv("WEB_CONCURRENCY", "1")))
+    return max(1, (os.cpu_count() or 1) // api_workers)
+
+# ==================================================
+# WORKER (corre en los procesos del pool)
+# ==================================================
+_worker_generator = None
+
+
+def _init_worker():
+    """Precalentar el proceso: estilos, fuentes y un PDFGenerator listo"""
+    global _worker_generator
+    from reportlab import rl_config
+    from integrations.pdf_generator import PDFGenerator, warm_up
+
+    # Streams sin ASCII85: el PDF viaja como binario (adjunto / descarga),
+    # ahorra ~20% de CPU por documento y ~10% de tamaño
+    rl_config.useA85 = 0
+    warm_up()
+    _worker_generator = PDFGenerator()
+
+
+def _render_in_worker(result: DiagnosticResult) -> Tuple[bytes, str, float]:
+    start = time.perf_counter()
+    pdf, engine = _worker_generator.render_with_engine(result)
+    return pdf, engine, time.perf_counter() - start
+
+
+def _ping() -> int:
+    return os.getpid()
+
+
+# ==================================================
+# POOL
+# ==================================================
+class PDFRenderPool:
+    """Procesos de render precalentados + deduplicación por content_key"""
+
+    def __init__(self, max_workers: Optional[int] = None):
+        self.max_workers = max_workers or default_pool_size()
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._in_flight: Dict[str, Future] = {}
+        self._lock = threading.Lock()
+
+    def _new_executor(self) -> ProcessPoolExecutor:
+        return ProcessPoolExecutor(
+            max_workers=self.max_workers,
+            # spawn: el proceso padre tiene threads (uvicorn, pipeline)
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker
+        )
+
+    def start(self):
+        """Crear los procesos y precalentarlos (llamar en el startup de la API)"""
+        with self._lock:
+            if self._executor is not None:
+                return
+            self._executor = executor = self._new_executor()
+
+        # Los procesos se crean bajo demanda: un ping por worker los levanta todos
+        # (cada uno corre _init_worker al nacer) y se espera a que respondan
+        for future in [executor.submit(_ping) for _ in range(self.max_workers)]:
+            future.result()
+        print(f"[PDF POOL] ✓ {self.max_workers} procesos de render precalentados")
+
+    def _restart(self, broken: ProcessPoolExecutor):
+        """Reemplazar un executor roto (solo el primero que lo detecta lo recrea)"""
+        with self._lock:
+            if self._executor is not broken:
+                return
+            self._executor = self._new_executor()
+        broken.shutdown(wait=False)
+        PDF_POOL_RESTARTS.inc()
+        print("[PDF POOL] ♻️ Proceso de render caído: pool recreado")
+
+    def _submit(self, result: DiagnosticResult) -> Tuple[ProcessPoolExecutor, Future]:
+        """Enviar al executor actual; si ya estaba roto se recrea y se reintenta"""
+        with self._lock:
+            if self._executor is None:
+                # Sin start() (ej. script): el executor crea los procesos al
+                # recibir trabajo, sin bloquear a quien encola en el precalentado
+                self._executor = self._new_executor()
+            executor = self._executor
+        try:
+            return executor, executor.submit(_render_in_worker, result)
+        except BrokenProcessPool:
+            self._restart(executor)
+            with self._lock:
+                executor = self._executor
+            return executor, executor.submit(_render_in_worker, result)
+
+    def render(self, result: DiagnosticResult) -> "Future[bytes]":
+        """Encolar el render; pedidos concurrentes con los mismos inputs comparten el Future"""
+        key = content_key(result)
+        with self._lock:
+            future = self._in_flight.get(key)
+            if future is not None:
+                PDF_RENDER_DEDUPLICATED.inc()
+                return future
+
+            future: Future = Future()
+            self._in_flight[key] = future
+
+        def _dispatch(retry: bool):
+            try:
+                executor, worker_future = self._submit(result)
+            except BaseException as e:
+                self._fail(key, future, e)
+                return
+
+            def _done(worker_future: Future):
+                try:
+                    pdf, engine, seconds = worker_future.result()
+                except BrokenProcessPool as e:
+                    if not retry:
+                        self._fail(key, future, e)
+                        return
+                    # El proceso murió con el render en curso: pool nuevo y un reintento
+                    self._restart(executor)
+                    _dispatch(retry=False)
+                    return
+                except BaseException as e:
+                    self._fail(key, future, e)
+                    return
+                with self._lock:
+                    self._in_flight.pop(key, None)
+                PDF_RENDER_SECONDS.observe(seconds, engine=engine)
+                future.set_result(pdf)
+
+            worker_future.add_done_callback(_done)
+
+        _dispatch(retry=True)
+        return future
+
+    def _fail(self, key: str, future: Future, error: BaseException):
+        with self._lock:
+            self._in_flight.pop(key, None)
+        future.set_exception(error)
+
+    def in_flight(self) -> int:
+        with self._lock:
+            return len(self._in_flight)
+
+    def shutdown(self, wait: bool = True):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=wait)
+
+
+# Singleton global del proceso
+pdf_render_pool = PDFRenderPool()
+
+metrics.gauge("pdf_render_in_flight", "PDFs encolados o renderizándose en el pool", pdf_render_pool.in_flight)
@@ -0,0 +1,292 @@
+"""
+Store de PDFs direccionado por contenido, con presupuesto de bytes
+
+Capas:
+- Memoria: PDFs recientes por diagnostic_id (LRU). El mismo objeto bytes
+  lo usan el adjunto del email y GET /api/diagnostic/{id}/pdf, sin copias.
+- SQLite (PDF_STORE_PATH): blobs comprimidos con zlib bajo content_key =
+  hash de los inputs del render + del código del generador. Diagnósticos
+  con los mismos inputs comparten blob. Cuando los blobs superan
+  PDF_STORE_MAX_BYTES se borran los de acceso más antiguo (LRU).
+- Cada diagnóstico guarda además su DiagnosticResult (JSON): si el blob fue
+  desalojado (o se perdió el disco del contenedor) la descarga regenera
+  el PDF en vez de responder 404. Estos resultados tienen datos del
+  contacto: cuentan contra el mismo presupuesto de bytes y se borran a
+  los PDF_DOCUMENT_RETENTION_DAYS días.
+
+Los blobs se escriben en un thread dedicado: el disco es persistencia,
+no está en el camino del email ni de la descarga.
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from datetime import datetime
+from pathlib import Path
+from typing import Optional
+
+from core.metrics import metrics
+from core.models import DiagnosticResult, result_from_dict, result_to_dict
+from integrations import pdf_generator
+from integrations.pdf_generator import render_inputs
+
+DEFAULT_PDF_STORE_PATH = Path(__file__).parent.parent / "data" / "pdf_store.db"
+
+PDF_STORE_MAX_BYTES = 256 * 1024 * 1024  # blobs comprimidos en disco
+PDF_DOCUMENT_RETENTION_DAYS = 90  # resultados guardados para regenerar (PII)
+PDF_MEMORY_ITEMS = 256  # PDFs recientes en memoria (~4 KB cada uno)
+PDF_COMPRESSION_LEVEL = 6
+
+# El código del generador entra en la clave: un cambio de layout no sirve PDFs viejos
+_RENDERER_DIGEST = hashlib.sha256(Path(pdf_generator.__file__).read_bytes()).hexdigest()
+
+
+def content_key(result: DiagnosticResult) -> str:
+    """Hash de lo que determina el PDF (no incluye diagnostic_id ni fechas)"""
+    canonical = json.dumps(render_inputs(result), sort_keys=True, ensure_ascii=False, default=str)
+    digest = hashlib.sha256(_RENDERER_DIGEST.encode("ascii"))
+    digest.update(canonical.encode("utf-8"))
+    return digest.hexdigest()[:32]
+
+
+class PDFStore:
+    """PDFs en memoria (LRU) + blobs comprimidos en SQLite con presupuesto de bytes"""
+
+    def __init__(
+        self,
+        path: Optional[Path] = None,
+        max_bytes: Optional[int] = None,
+        memory_items: int = PDF_MEMORY_ITEMS,
+        retention_days: Optional[float] = None
+    ):
+        self.path = Path(path or os.getenv("PDF_STORE_PATH", DEFAULT_PDF_STORE_PATH))
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes or int(os.getenv("PDF_STORE_MAX_BYTES", PDF_STORE_MAX_BYTES))
+        self.memory_items = memory_items
+        self.retention_days = retention_days or float(
+            os.getenv("PDF_DOCUMENT_RETENTION_DAYS", PDF_DOCUMENT_RETENTION_DAYS)
+        )
+        self._recent: "OrderedDict[str, bytes]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="pdf-store")
+        self._init_schema()
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(str(self.path), timeout=30, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    def _init_schema(self):
+        conn = self._connect()
+        try:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS pdf_documents (
+                    diagnostic_id TEXT PRIMARY KEY,
+                    content_key TEXT NOT NULL,
+                    result BLOB NOT NULL,
+                    created_at TEXT NOT NULL,
+                    size INTEGER NOT NULL DEFAULT 0,
+                    stored_at REAL NOT NULL DEFAULT 0
+                )
+            """)
+            # Migración: tablas creadas antes de contar los resultados en el presupuesto
+            columns = {row[1] for row in conn.execute("PRAGMA table_info(pdf_documents)")}
+            if "size" not in columns:
+                conn.execute("ALTER TABLE pdf_documents ADD COLUMN size INTEGER NOT NULL DEFAULT 0")
+                conn.execute("ALTER TABLE pdf_documents ADD COLUMN stored_at REAL NOT NULL DEFAULT 0")
+                conn.execute("""
+                    UPDATE pdf_documents SET size = length(result),
+                        stored_at = COALESCE(CAST(strftime('%s', created_at) AS REAL), 0)
+                """)
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS pdf_blobs (
+                    content_key TEXT PRIMARY KEY,
+                    data BLOB NOT NULL,
+                    size INTEGER NOT NULL,
+                    last_access REAL NOT NULL
+                )
+            """)
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_pdf_blobs_access ON pdf_blobs (last_access)"
+            )
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_pdf_documents_stored ON pdf_documents (stored_at)"
+            )
+        finally:
+            conn.close()
+
+    # ------------------------------------------------------------------
+    # Escritura
+    # ------------------------------------------------------------------
+    def remember(self, result: DiagnosticResult) -> str:
+        """Guardar el diagnóstico para poder regenerar su PDF; devuelve su content_key
+
+        Nunca sobrescribe: si el diagnostic_id ya existe con otro contenido
+        se rechaza (reintentar el mismo diagnóstico no cambia nada)
+        """
+        key = content_key(result)
+        payload = zlib.compress(
+            json.dumps(result_to_dict(result), ensure_ascii=False).encode("utf-8"), PDF_COMPRESSION_LEVEL
+        )
+        conn = self._connect()
+        try:
+            conn.execute(
+                """
+                INSERT INTO pdf_documents (diagnostic_id, content_key, result, created_at, size, stored_at)
+                VALUES (?, ?, ?, ?, ?, ?)
+                """,
+                (result.diagnostic_id, key, payload, datetime.now().isoformat(), len(payload), time.time())
+            )
+        except sqlite3.IntegrityError:
+            row = conn.execute(
+                "SELECT content_key FROM pdf_documents WHERE diagnostic_id = ?", (result.diagnostic_id,)
+            ).fetchone()
+            if row is None or row[0] != key:
+                raise ValueError(f"diagnostic_id {result.diagnostic_id} ya registrado con otro contenido")
+        finally:
+            conn.close()
+        return key
+
+    def put(self, result: DiagnosticResult, pdf: bytes) -> "Future[None]":
+        """Disponible en memoria ya; el blob comprimido se escribe en background"""
+        self._remember_bytes(result.diagnostic_id, pdf)
+        return self._writer.submit(self._persist, content_key(result), pdf)
+
+    def _remember_bytes(self, diagnostic_id: str, pdf: bytes):
+        with self._lock:
+            self._recent[diagnostic_id] = pdf
+            self._recent.move_to_end(diagnostic_id)
+            while len(self._recent) > self.memory_items:
+                self._recent.popitem(last=False)
+
+    def _persist(self, key: str, pdf: bytes):
+        data = zlib.compress(pdf, PDF_COMPRESSION_LEVEL)
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            conn.execute(
+                "INSERT OR REPLACE INTO pdf_blobs (content_key, data, size, last_access) VALUES (?, ?, ?, ?)",
+                (key, data, len(data), time.time())
+            )
+            evicted = self._evict(conn)
+            conn.execute("COMMIT")
+        except sqlite3.Error as e:
+            if conn.in_transaction:
+                conn.rollback()
+            print(f"[PDF STORE] ⚠️ No se pudo persistir el PDF {key} (queda solo en memoria): {str(e)}")
+            return
+        finally:
+            conn.close()
+
+        if evicted:
+            print(f"[PDF STORE] ♻️ {evicted} PDFs/resultados desalojados (presupuesto {self.max_bytes} bytes)")
+
+    def _evict(self, conn: sqlite3.Connection) -> int:
+        """Aplicar la retención y borrar lo más antiguo hasta entrar en el presupuesto
+
+        Blobs (por último acceso) y resultados guardados (por fecha) comparten
+        el presupuesto; se desaloja primero lo que lleva más tiempo sin usarse.
+        """
+        cutoff = time.time() - self.retention_days * 86400
+        evicted = conn.execute("DELETE FROM pdf_documents WHERE stored_at < ?", (cutoff,)).rowcount
+
+        excess = self._total_bytes(conn) - self.max_bytes
+        if excess <= 0:
+            return evicted
+
+        blobs, documents = [], []
+        candidates = conn.execute("""
+            SELECT 'blob', content_key, size, last_access FROM pdf_blobs
+            UNION ALL
+            SELECT 'document', diagnostic_id, size, stored_at FROM pdf_documents
+            ORDER BY 4
+        """)
+        for kind, key, size, _ in candidates:
+            (blobs if kind == "blob" else documents).append((key,))
+            excess -= size
+            if excess <= 0:
+                break
+        conn.executemany("DELETE FROM pdf_blobs WHERE content_key = ?", blobs)
+        conn.executemany("DELETE FROM pdf_documents WHERE diagnostic_id = ?", documents)
+        return evicted + len(blobs) + len(documents)
+
+    @staticmethod
+    def _total_bytes(conn: sqlite3.Connection) -> int:
+        return conn.execute("""
+            SELECT (SELECT COALESCE(SUM(size), 0) FROM pdf_blobs)
+                 + (SELECT COALESCE(SUM(size), 0) FROM pdf_documents)
+        """).fetchone()[0]
+
+    # ------------------------------------------------------------------
+    # Lectura
+    # ------------------------------------------------------------------
+    def get(self, diagnostic_id: str) -> Optional[bytes]:
+        """PDF del diagnóstico (memoria y luego disco); None si no está guardado"""
+        with self._lock:
+            pdf = self._recent.get(diagnostic_id)
+            if pdf is not None:
+                self._recent.move_to_end(diagnostic_id)
+                return pdf
+
+        conn = self._connect()
+        try:
+            row = conn.execute(
+                """
+                SELECT b.content_key, b.data FROM pdf_documents d
+                JOIN pdf_blobs b ON b.content_key = d.content_key
+                WHERE d.diagnostic_id = ?
+                """,
+                (diagnostic_id,)
+            ).fetchone()
+            if row is None:
+                return None
+            conn.execute("UPDATE pdf_blobs SET last_access = ? WHERE content_key = ?", (time.time(), row[0]))
+        finally:
+            conn.close()
+
+        pdf = zlib.decompress(row[1])
+        self._remember_bytes(diagnostic_id, pdf)
+        return pdf
+
+    def result(self, diagnostic_id: str) -> Optional[DiagnosticResult]:
+        """DiagnosticResult guardado para regenerar el PDF (None si nunca se guardó)"""
+        conn = self._connect()
+        try:
+            row = conn.execute(
+                "SELECT result FROM pdf_documents WHERE diagnostic_id = ?", (diagnostic_id,)
+            ).fetchone()
+        finally:
+            conn.close()
+        if row is None:
+            return None
+        try:
+            return result_from_dict(json.loads(zlib.decompress(row[0])))
+        except ValueError:
+            # Filas anteriores guardaban un pickle: no se deserializa, el PDF no se regenera
+            print(f"[PDF STORE] ⚠️ Resultado de {diagnostic_id} en formato anterior, se ignora")
+            return None
+
+    def total_bytes(self) -> int:
+        """Bytes comprimidos en disco (lo que cuenta contra el presupuesto)"""
+        conn = self._connect()
+        try:
+            return self._total_bytes(conn)
+        finally:
+            conn.close()
+
+    def shutdown(self):
+        """Esperar las escrituras pendientes (shutdown de la API)"""
+        self._writer.shutdown(wait=True)
+
+
+# Singleton global del proceso (cada worker abre el mismo archivo)
+pdf_store = PDFStore()
+
+metrics.gauge("pdf_store_bytes", "Bytes comprimidos de PDFs y resultados en disco", pdf_store.total_bytes)
@@ -1,12 +1,18 @@
 """
-Conector de Google Sheets - Version 3.6 FASTAPI COMPATIBLE
+Conector de Google Sheets - Version 3.7 FASTAPI COMPATIBLE
 FIXED: Compatibilidad con secrets adapter + schema alignment
+NEW: Pool de clientes process-wide (token y handles de worksheets cacheados)
+NEW: Appends write-behind agrupados en append_rows
+NEW: Validación de headers cacheada por proceso + migración in-place (sin clear)
+NEW: save_diagnostics_batch idempotente por diagnostic_id (replay del outbox)
 """
 import gspread
 from oauth2client.service_account import ServiceAccountCredentials
 from datetime import datetime
-from typing import Dict, List, Optional, Any
-import pandas as pd
+from typing import Dict, List, Optional, Any, Callable, Tuple
+import threading
+from concurrent.futures import Future
+import json
 import traceback
 import sys
 from pathlib import Path
@@ -15,32 +21,141 @@ from pathlib import Path
 sys.path.append(str(Path(__file__).parent.parent))
 from core.config import secrets
 from core.models import DiagnosticResult
+from core.sheets_schema import SCHEMA_VERSION, RESPONSES_HEADERS, SCORES_HEADERS, ensure_headers
+from integrations.analytics_store import analytics_store
+from integrations.write_buffer import SheetsWriteBuffer
+
+
+SCOPE = [
+    'https://spreadsheets.google.com/feeds',
+    'https://www.googleapis.com/auth/drive'
+]
+
+
+class SheetsClientPool:
+    """
+    Registro process-wide de clientes gspread (singleton thread-safe)
+
+    Mantiene el cliente autorizado (el access token se reutiliza hasta que
+    expira) y los handles de Spreadsheet/Worksheet ya resueltos, para no
+    repetir authorize + open + metadata en cada diagnóstico.
+    """
+    _instance = None
+
+    def __new__(cls):
+        if cls._instance is None:
+            cls._instance = super().__new__(cls)
+            cls._instance._initialized = False
+        return cls._instance
+
+    def __init__(self):
+        if self._initialized:
+            return
+        self._initialized = True
+        self._lock = threading.RLock()
+        self.creds: Optional[ServiceAccountCredentials] = None
+        self.client: Optional[gspread.Client] = None
+        self._spreadsheets: Dict[str, gspread.Spreadsheet] = {}
+        self._worksheets: Dict[Tuple[str, str], gspread.Worksheet] = {}
+        # (sheet, worksheet) -> SCHEMA_VERSION ya validada en este proceso
+        self._schema_versions: Dict[Tuple[str, str], int] = {}
+
+    def get_client(self) -> gspread.Client:
+        """Cliente autorizado; re-autoriza solo si no existe o el token expiró"""
+        with self._lock:
+            if self.client is None or self.creds is None or self.creds.access_token_expired:
+                creds_dict = secrets["gcp_service_account"]
+                self.creds = ServiceAccountCredentials.from_json_keyfile_dict(
+                    creds_dict, SCOPE
+                )
+                self.client = gspread.authorize(self.creds)
+                print(f"[SHEETS POOL] 🔑 Cliente autorizado")
+            return self.client
+
+    def get_spreadsheet(self, sheet_name: str) -> gspread.Spreadsheet:
+        with self._lock:
+            spreadsheet = self._spreadsheets.get(sheet_name)
+            if spreadsheet is None:
+                spreadsheet = self.get_client().open(sheet_name)
+                self._spreadsheets[sheet_name] = spreadsheet
+                print(f"[SHEETS POOL] ✅ Spreadsheet abierto: {sheet_name}")
+            return spreadsheet
+
+    def get_worksheet(self, sheet_name: str, worksheet_name: str) -> gspread.Worksheet:
+        """Obtener (o crear) una worksheet, cacheando el handle"""
+        key = (sheet_name, worksheet_name)
+
+        with self._lock:
+            worksheet = self._worksheets.get(key)
+            if worksheet is not None:
+                return worksheet
+
+            spreadsheet = self.get_spreadsheet(sheet_name)
+            try:
+                worksheet = spreadsheet.worksheet(worksheet_name)
+                print(f"[WORKSHEET] ✅ Found: {worksheet_name}")
+            except gspread.WorksheetNotFound:
+                worksheet = spreadsheet.add_worksheet(
+                    title=worksheet_name,
+                    rows=1000,
+                    cols=50
+                )
+                print(f"[WORKSHEET] ✅ Created: {worksheet_name}")
+
+            self._worksheets[key] = worksheet
+            return worksheet
+
+    def schema_validated(self, sheet_name: str, worksheet_name: str) -> bool:
+        with self._lock:
+            return self._schema_versions.get((sheet_name, worksheet_name)) == SCHEMA_VERSION
+
+    def mark_schema_validated(self, sheet_name: str, worksheet_name: str):
+        with self._lock:
+            self._schema_versions[(sheet_name, worksheet_name)] = SCHEMA_VERSION
+
+    def invalidate(self, auth: bool = False):
+        """Descartar handles cacheados (y el cliente si el error fue de auth)"""
+        with self._lock:
+            self._spreadsheets.clear()
+            self._worksheets.clear()
+            self._schema_versions.clear()
+            if auth:
+                self.client = None
+                self.creds = None
+            print(f"[SHEETS POOL] ♻️ Cache invalidado (auth={auth})")
+
+
+def _is_auth_error(e: Exception) -> bool:
+    status = getattr(getattr(e, "response", None), "status_code", None)
+    return status in (401, 403)
+
+
+def _is_not_found_error(e: Exception) -> bool:
+    if isinstance(e, (gspread.WorksheetNotFound, gspread.SpreadsheetNotFound)):
+        return True
+    status = getattr(getattr(e, "response", None), "status_code", None)
+    return status == 404
+
+
+# Singleton global - compartido por todos los SheetsConnector del proceso
+sheets_pool = SheetsClientPool()
 
 
 class SheetsConnector:
     """Conector para Google Sheets con type-safe serialization"""
 
     def __init__(self):
-        """Inicializar conexión con Google Sheets usando secrets adapter"""
-        self.scope = [
-            'https://spreadsheets.google.com/feeds',
-            'https://www.googleapis.com/auth/drive'
-        ]
+        """Inicializar conexión con Google Sheets usando el pool del proceso"""
+        self.scope = SCOPE
+        self.pool = sheets_pool
 
         try:
-            # Usar secrets adapter en lugar de st.secrets
-            creds_dict = secrets["gcp_service_account"]
-
-            self.creds = ServiceAccountCredentials.from_json_keyfile_dict(
-                creds_dict, self.scope
-            )
-            self.client = gspread.authorize(self.creds)
-
             # Obtener configuración de sheets
             self.sheet_name = secrets.get("sheet_name", "AI_Readiness_Diagnostics")
-            self.spreadsheet = self.client.open(self.sheet_name)
 
-            print(f"[SHEETS INIT] ✅ Connected to: {self.sheet_name}")
+            # Cliente y spreadsheet vienen del pool (sin re-authorize por request)
+            self.client = self.pool.get_client()
+            self.spreadsheet = self.pool.get_spreadsheet(self.sheet_name)
 
         except Exception as e:
             print(f"[SHEETS INIT] ❌ ERROR: {str(e)}")
@@ -48,19 +163,36 @@ class SheetsConnector:
             raise
 
     def _get_or_create_worksheet(self, worksheet_name: str) -> gspread.Worksheet:
-        """Obtener o crear una worksheet"""
+        """Obtener o crear una worksheet (handle cacheado en el pool)"""
+        return self.pool.get_worksheet(self.sheet_name, worksheet_name)
+
+    def _with_refresh(self, operation: Callable[[], Any]) -> Any:
+        """
+        Ejecutar una operación contra Sheets; si falla por auth o not-found,
+        invalidar el cache del pool y reintentar una sola vez
+        """
         try:
-            worksheet = self.spreadsheet.worksheet(worksheet_name)
-            print(f"[WORKSHEET] ✅ Found: {worksheet_name}")
-        except gspread.WorksheetNotFound:
-            worksheet = self.spreadsheet.add_worksheet(
-                title=worksheet_name,
-                rows=1000,
-                cols=50
-            )
-            print(f"[WORKSHEET] ✅ Created: {worksheet_name}")
+            return operation()
+        except Exception as e:
+            if not (_is_auth_error(e) or _is_not_found_error(e)):
+                raise
 
-        return worksheet
+            print(f"[SHEETS POOL] ⚠️ {type(e).__name__}: {str(e)} - refrescando handles")
+            self.pool.invalidate(auth=_is_auth_error(e))
+            self.client = self.pool.get_client()
+            self.spreadsheet = self.pool.get_spreadsheet(self.sheet_name)
+            return operation()
+
+    def _ensure_schema(self, worksheet_name: str, expected_headers: List[str]):
+        """
+        Validar headers una vez por proceso (cacheado con SCHEMA_VERSION)
+        Si difieren, migrar columnas in-place (core.sheets_schema)
+        """
+        if self.pool.schema_validated(self.sheet_name, worksheet_name):
+            return
+
+        ensure_headers(self._get_or_create_worksheet(worksheet_name), expected_headers)
+        self.pool.mark_schema_validated(self.sheet_name, worksheet_name)
 
     def _format_timestamp(self, dt: datetime) -> str:
         """
@@ -97,8 +229,29 @@ class SheetsConnector:
             print(f"[LIST_TO_STRING ERROR] {e}")
             return str(value) if value else ""
 
-    def save_diagnostic(self, result: DiagnosticResult) -> bool:
-        """Guardar resultado completo del diagnóstico"""
+    def _format_ranking(self, arquetipo: Any) -> str:
+        """Ranking de arquetipos como JSON {tipo: puntaje}, de mayor a menor"""
+        return json.dumps(
+            {tipo: round(puntaje, 2) for tipo, puntaje in getattr(arquetipo, 'ranking', ())},
+            ensure_ascii=False
+        )
+
+    def save_diagnostic(
+        self,
+        result: DiagnosticResult,
+        on_write_failed: Optional[Callable[[DiagnosticResult], Any]] = None
+    ) -> List["Future[None]"]:
+        """
+        Guardar resultado completo del diagnóstico
+
+        Las filas van al write buffer: al volver están en el journal, no
+        todavía en Sheets. Cuando el flush confirma la fila de scores se
+        actualiza analytics; si el flush falla se llama on_write_failed
+        (ej. outbox.enqueue) para que otro camino reintente el guardado.
+
+        Returns: un Future por worksheet (responses, scores) que se resuelve
+        después de esos callbacks: al fallar, el diagnóstico ya está entregado
+        """
         print(f"\n{'='*70}")
         print(f"[SAVE DIAGNOSTIC] START")
         print(f"  Empresa: {result.prospect_info.nombre_empresa}")
@@ -107,14 +260,37 @@ class SheetsConnector:
         print(f"{'='*70}")
 
         try:
-            self._save_to_responses(result)
-            self._save_to_scores(result)
-            self._update_analytics()
-
-            print(f"[SAVE DIAGNOSTIC] ✅ SUCCESS")
+            responses_written = self._with_refresh(lambda: self._save_to_responses(result))
+            scores_written = self._with_refresh(lambda: self._save_to_scores(result))
+
+            def _after_flush(written: "Future[None]") -> "Future[None]":
+                saved: Future = Future()
+
+                def _on_flush(future):
+                    error = future.exception()
+                    try:
+                        if error is None:
+                            if future is scores_written:
+                                self._update_analytics(result)
+                            return
+                        print(f"[SAVE DIAGNOSTIC] ❌ Flush falló para {result.diagnostic_id}: {str(error)}")
+                        if on_write_failed is not None:
+                            on_write_failed(result)
+                    finally:
+                        if error is None:
+                            saved.set_result(None)
+                        else:
+                            saved.set_exception(error)
+
+                written.add_done_callback(_on_flush)
+                return saved
+
+            saved = [_after_flush(responses_written), _after_flush(scores_written)]
+
+            print(f"[SAVE DIAGNOSTIC] ✅ ENCOLADO")
             print(f"  Score: {result.score.score_final} | Tier: {result.score.tier.value}")
             print(f"{'='*70}\n")
-            return True
+            return saved
 
         except Exception as e:
             print(f"[SAVE DIAGNOSTIC] ❌ CRITICAL ERROR: {str(e)}")
@@ -122,50 +298,23 @@ class SheetsConnector:
             print(f"{'='*70}\n")
             raise
 
-    def _save_to_responses(self, result: DiagnosticResult):
+    def _save_to_responses(self, result: DiagnosticResult) -> "Future[None]":
         """
         Guardar respuestas raw del prospecto
         ✅ FIXED: Schema alignment con nombres reales del modelo
         """
         print(f"[RESPONSES] Iniciando guardado...")
 
-        worksheet = self._get_or_create_worksheet("responses")
-
-        # Headers alineados con el modelo ProspectInfo y DiagnosticResponses
-        expected_headers = [
-            "timestamp",
-            "diagnostic_id",
-            "nombre_empresa",
-            "sector",
-            "facturacion_rango",
-            "empleados_rango",
-            "contacto_nombre",
-            "contacto_email",
-            "contacto_telefono",
-            "cargo",
-            "ciudad",
-            "motivacion",
-            "toma_decisiones",
-            "procesos_criticos",
-            "tareas_repetitivas",
-            "compartir_informacion",
-            "equipo_tecnico",
-            "capacidad_implementacion",
-            "inversion_reciente",
-            "frustracion_principal",
-            "urgencia",
-            "proceso_aprobacion",
-            "presupuesto_rango"
-        ]
-
-        existing_headers = worksheet.row_values(1) if worksheet.row_count > 0 else []
+        self._ensure_schema("responses", RESPONSES_HEADERS)
+        row = self._build_responses_row(result)
 
-        if not existing_headers or existing_headers != expected_headers:
-            print(f"[RESPONSES] Creando/actualizando headers")
-            worksheet.clear()
-            worksheet.append_row(expected_headers)
-            print(f"[RESPONSES] Headers creados: {len(expected_headers)} columnas")
+        # Write-behind: la fila queda en el journal y se envía en el próximo append_rows
+        written = sheets_write_buffer.enqueue("responses", row)
+        print(f"[RESPONSES] ✅ Encolado para escritura")
+        return written
 
+    def _build_responses_row(self, result: DiagnosticResult) -> List[Any]:
+        """Fila de respuestas raw del prospecto (orden de RESPONSES_HEADERS)"""
         timestamp_str = self._format_timestamp(result.created_at)
         motivacion_str = self._safe_list_to_string(result.responses.motivacion)
 
@@ -195,79 +344,34 @@ class SheetsConnector:
             result.responses.presupuesto_rango or ""
         ]
 
-        if len(row) != len(expected_headers):
-            error_msg = f"SCHEMA MISMATCH: Row tiene {len(row)} valores, headers tiene {len(expected_headers)}"
+        if len(row) != len(RESPONSES_HEADERS):
+            error_msg = f"SCHEMA MISMATCH: Row tiene {len(row)} valores, headers tiene {len(RESPONSES_HEADERS)}"
             print(f"[RESPONSES] ❌ {error_msg}")
             raise ValueError(error_msg)
 
         print(f"[RESPONSES] Row validado: {len(row)} columnas")
+        return row
 
-        try:
-            worksheet.append_row(row, value_input_option='USER_ENTERED')
-            print(f"[RESPONSES] ✅ Guardado exitoso")
-        except Exception as e:
-            print(f"[RESPONSES] ❌ Error al append row: {str(e)}")
-            raise
-
-    def _save_to_scores(self, result: DiagnosticResult):
+    def _save_to_scores(self, result: DiagnosticResult) -> "Future[None]":
         """
         Guardar scores calculados
         ✅ FIXED: Schema alignment
         """
         print(f"[SCORES] Iniciando guardado...")
 
-        worksheet = self._get_or_create_worksheet("scores")
-
-        expected_headers = [
-            "timestamp",
-            "diagnostic_id",
-            "nombre_empresa",
-            "sector",
-            "contacto_nombre",
-            "contacto_email",
-            "contacto_telefono",
-            "cargo",
-            "ciudad",
-            "facturacion_rango",
-            "empleados_rango",
-            "score_final",
-            "tier",
-            "confianza_clasificacion",
-            "madurez_digital_total",
-            "madurez_decisiones",
-            "madurez_procesos",
-            "madurez_integracion",
-            "madurez_eficiencia",
-            "capacidad_inversion_total",
-            "capacidad_presupuesto",
-            "capacidad_historial",
-            "capacidad_tamano",
-            "viabilidad_total",
-            "viabilidad_problema",
-            "viabilidad_urgencia",
-            "viabilidad_decision",
-            "arquetipo_tipo",
-            "arquetipo_nombre",
-            "arquetipo_confianza",
-            "servicio_sugerido",
-            "monto_min",
-            "monto_max",
-            "probabilidad_cierre",
-            "quick_wins_count",
-            "red_flags_count"
-        ]
-
-        existing_headers = worksheet.row_values(1) if worksheet.row_count > 0 else []
+        self._ensure_schema("scores", SCORES_HEADERS)
+        row = self._build_scores_row(result)
 
-        if not existing_headers or existing_headers != expected_headers:
-            print(f"[SCORES] Creando/actualizando headers")
-            worksheet.clear()
-            worksheet.append_row(expected_headers)
-            print(f"[SCORES] Headers creados: {len(expected_headers)} columnas")
+        # Write-behind: la fila queda en el journal y se envía en el próximo append_rows
+        written = sheets_write_buffer.enqueue("scores", row)
+        print(f"[SCORES] ✅ Encolado para escritura")
+        return written
 
+    def _build_scores_row(self, result: DiagnosticResult) -> List[Any]:
+        """Fila de scores calculados (orden de SCORES_HEADERS)"""
         timestamp_str = self._format_timestamp(result.created_at)
         confianza_clasificacion = getattr(result.score, 'confianza_clasificacion', 0.0)
-        probabilidad_cierre = getattr(result.reunion_prep, 'probabilidad_cierre', 50)
+        probabilidad_cierre = result.probabilidad_cierre
 
         row = [
             timestamp_str,
@@ -305,80 +409,119 @@ class SheetsConnector:
             result.monto_sugerido_max,
             probabilidad_cierre,
             len(result.quick_wins),
-            len(result.red_flags)
+            len(result.red_flags),
+            self._format_ranking(result.arquetipo),
+            round(getattr(result.arquetipo, 'margen', 0.0), 2)
         ]
 
-        if len(row) != len(expected_headers):
-            error_msg = f"SCHEMA MISMATCH: Row tiene {len(row)} valores, headers tiene {len(expected_headers)}"
+        if len(row) != len(SCORES_HEADERS):
+            error_msg = f"SCHEMA MISMATCH: Row tiene {len(row)} valores, headers tiene {len(SCORES_HEADERS)}"
             print(f"[SCORES] ❌ {error_msg}")
             raise ValueError(error_msg)
 
         print(f"[SCORES] Row validado: {len(row)} columnas")
+        return row
 
-        try:
-            worksheet.append_row(row, value_input_option='USER_ENTERED')
-            print(f"[SCORES] ✅ Guardado exitoso")
-        except Exception as e:
-            print(f"[SCORES] ❌ Error al append row: {str(e)}")
-            raise
+    def save_diagnostics_batch(self, results: List[DiagnosticResult]) -> int:
+        """
+        Guardar un lote de diagnósticos (replay del outbox) de forma idempotente
+        Omite los diagnostic_id que ya están en el sheet; un append_rows por worksheet
 
-    def _update_analytics(self):
-        """Actualizar métricas agregadas"""
+        Returns: cantidad de diagnósticos nuevos escritos
+        """
+        self._with_refresh(lambda: self._ensure_schema("responses", RESPONSES_HEADERS))
+        self._with_refresh(lambda: self._ensure_schema("scores", SCORES_HEADERS))
+
+        # Dedup por worksheet: si un intento anterior escribió responses y
+        # falló en scores, el reintento solo agrega lo que falta en cada una
+        existing = {
+            worksheet: set(self._with_refresh(
+                lambda: self._get_or_create_worksheet(worksheet).col_values(headers.index("diagnostic_id") + 1)
+            ))
+            for worksheet, headers in (("responses", RESPONSES_HEADERS), ("scores", SCORES_HEADERS))
+        }
+
+        unique_results = list({result.diagnostic_id: result for result in results}.values())
+        missing_responses = [r for r in unique_results if r.diagnostic_id not in existing["responses"]]
+        new_results = [r for r in unique_results if r.diagnostic_id not in existing["scores"]]
+
+        skipped = len(results) - len(new_results)
+        if skipped:
+            print(f"[SAVE BATCH] {skipped} diagnósticos ya estaban en Sheets (omitidos)")
+
+        if not new_results and not missing_responses:
+            return 0
+
+        responses_rows = [self._build_responses_row(r) for r in missing_responses]
+        scores_rows = [self._build_scores_row(r) for r in new_results]
+
+        if responses_rows:
+            self._with_refresh(lambda: self._get_or_create_worksheet("responses").append_rows(
+                responses_rows, value_input_option='USER_ENTERED'
+            ))
+        if scores_rows:
+            self._with_refresh(lambda: self._get_or_create_worksheet("scores").append_rows(
+                scores_rows, value_input_option='USER_ENTERED'
+            ))
+
+        for result in new_results:
+            self._update_analytics(result)
+
+        print(f"[SAVE BATCH] ✅ {len(new_results)} diagnósticos guardados")
+        return len(new_results)
+
+    def _update_analytics(self, result: DiagnosticResult):
+        """
+        Actualizar métricas agregadas de forma incremental (O(1))
+        El push al worksheet analytics se agenda con debounce
+        """
         print(f"[ANALYTICS] Actualizando...")
 
         try:
-            scores_ws = self._get_or_create_worksheet("scores")
-            scores_data = scores_ws.get_all_records()
-
-            if not scores_data:
-                print(f"[ANALYTICS] No hay datos para procesar")
-                return
+            if analytics_store.needs_recompute:
+                # Sin checkpoint local: reconciliar una vez contra el sheet
+                # (se llama tras el flush o el append: la fila ya está escrita)
+                self.recompute_analytics(push=False)
+            else:
+                analytics_store.record(
+                    tier=result.score.tier.value,
+                    score_final=result.score.score_final,
+                    probabilidad_cierre=result.probabilidad_cierre,
+                    monto_min=result.monto_sugerido_min,
+                    monto_max=result.monto_sugerido_max
+                )
 
-            df = pd.DataFrame(scores_data)
+            analytics_store.schedule_push(self._write_analytics)
+            print(f"[ANALYTICS] ✅ Actualizado - Total: {analytics_store.aggregates.total_diagnosticos}")
 
-            total_diagnosticos = len(df)
-            tier_a_count = len(df[df['tier'] == 'A'])
-            tier_b_count = len(df[df['tier'] == 'B'])
-            tier_c_count = len(df[df['tier'] == 'C'])
+        except Exception as e:
+            print(f"[ANALYTICS] ⚠️ Error (no crítico): {str(e)}")
+            print(traceback.format_exc())
 
-            score_promedio = df['score_final'].mean() if 'score_final' in df.columns and len(df) > 0 else 0
-            prob_cierre_promedio = df['probabilidad_cierre'].mean() if 'probabilidad_cierre' in df.columns and len(df) > 0 else 0
+    def recompute_analytics(self, push: bool = True):
+        """Reconciliación completa: recalcular agregados leyendo todo el worksheet scores"""
+        scores_data = self._with_refresh(
+            lambda: self._get_or_create_worksheet("scores").get_all_records()
+        )
+        analytics_store.recompute(scores_data)
 
-            if 'monto_min' in df.columns and 'monto_max' in df.columns and 'probabilidad_cierre' in df.columns:
-                df['pipeline_value'] = (df['monto_min'] + df['monto_max']) / 2 * (df['probabilidad_cierre'] / 100)
-                pipeline_total = df['pipeline_value'].sum()
-            else:
-                pipeline_total = 0
+        if push:
+            self._write_analytics(analytics_store.rows())
 
+    def _write_analytics(self, analytics_data: List[List[Any]]):
+        """Escribir las filas de analytics en el worksheet"""
+        def write():
             analytics_ws = self._get_or_create_worksheet("analytics")
-            timestamp_now = self._format_timestamp(datetime.now())
-
-            analytics_data = [
-                ["Métrica", "Valor", "Última Actualización"],
-                ["Total Diagnósticos", total_diagnosticos, timestamp_now],
-                ["Tier A", tier_a_count, ""],
-                ["Tier B", tier_b_count, ""],
-                ["Tier C", tier_c_count, ""],
-                ["Score Promedio", f"{score_promedio:.1f}", ""],
-                ["Prob. Cierre Promedio", f"{prob_cierre_promedio:.1f}%", ""],
-                ["Pipeline Value Estimado", f"${pipeline_total:,.0f} COP", ""],
-                ["Conversion Rate (Tier A)", f"{tier_a_count/total_diagnosticos*100:.1f}%" if total_diagnosticos > 0 else "0%", ""]
-            ]
-
-            analytics_ws.clear()
             analytics_ws.update('A1', analytics_data, value_input_option='USER_ENTERED')
 
-            print(f"[ANALYTICS] ✅ Actualizado - Total: {total_diagnosticos}")
-
-        except Exception as e:
-            print(f"[ANALYTICS] ⚠️ Error (no crítico): {str(e)}")
-            print(traceback.format_exc())
+        self._with_refresh(write)
 
     def get_all_diagnostics(self, limit: Optional[int] = None) -> List[Dict]:
         """Obtener todos los diagnósticos"""
         try:
-            scores_ws = self._get_or_create_worksheet("scores")
-            data = scores_ws.get_all_records()
+            data = self._with_refresh(
+                lambda: self._get_or_create_worksheet("scores").get_all_records()
+            )
 
             data = sorted(data, key=lambda x: x.get('timestamp', ''), reverse=True)
 
@@ -399,8 +542,9 @@ class SheetsConnector:
     def get_analytics_summary(self) -> Dict:
         """Obtener resumen de analytics"""
         try:
-            analytics_ws = self._get_or_create_worksheet("analytics")
-            data = analytics_ws.get_all_records()
+            data = self._with_refresh(
+                lambda: self._get_or_create_worksheet("analytics").get_all_records()
+            )
 
             summary = {}
             for row in data:
@@ -411,3 +555,17 @@ class SheetsConnector:
             print(f"[GET ANALYTICS] ❌ ERROR: {str(e)}")
             print(traceback.format_exc())
             return {}
+
+
+def _append_rows(worksheet_name: str, rows: List[List[Any]]):
+    """Flush del write buffer: un solo append_rows por worksheet"""
+    connector = SheetsConnector()
+    connector._with_refresh(
+        lambda: connector._get_or_create_worksheet(worksheet_name).append_rows(
+            rows, value_input_option='USER_ENTERED'
+        )
+    )
+
+
+# Singleton global - buffer write-behind del proceso
+sheets_write_buffer = SheetsWriteBuffer(flush_fn=_append_rows)
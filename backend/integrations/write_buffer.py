@@ -0,0 +1,332 @@
+"""
+Buffer write-behind para appends a Google Sheets
+Agrupa filas por worksheet y las envía en un solo append_rows por flush
+(por tamaño o por tiempo). Un journal SQLite conserva las filas pendientes
+si el proceso muere antes del flush.
+
+El journal lo comparten todos los workers de la API: cada fila lleva el
+pid del proceso dueño y se borra por id al confirmarse el flush. Al
+arrancar (y periódicamente) un proceso adopta solo las filas de procesos
+que ya no existen, así nadie borra ni reenvía filas de otro worker vivo.
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+import traceback
+from collections import OrderedDict
+from concurrent.futures import Future
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+DEFAULT_JOURNAL_PATH = Path(__file__).parent.parent / "data" / "sheets_write_journal.db"
+ADOPT_INTERVAL = 60.0  # segundos entre búsquedas de filas huérfanas
+
+# flush_fn(worksheet_name, rows) debe escribir todas las filas o lanzar excepción
+FlushFn = Callable[[str, List[List[Any]]], None]
+
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+@dataclass
+class _PendingRow:
+    """Fila en cola: id en el journal + Future del que la encoló (None si fue recuperada)"""
+    journal_id: int
+    row: List[Any]
+    future: Optional[Future] = None
+
+
+class SheetsWriteBuffer:
+    """
+    Cola write-behind por worksheet con journal SQLite
+
+    - enqueue(): escribe la fila al journal antes de aceptarla y devuelve
+      un Future que se resuelve cuando la fila llega a Sheets (o falla)
+    - flush: cuando una worksheet junta max_rows filas o la fila más
+      antigua supera max_delay segundos
+    - tras un flush exitoso se borran del journal las filas enviadas
+    - si el flush falla, las filas con Future se entregan a quien las
+      encoló (ej. outbox) y salen del journal; las recuperadas de otro
+      proceso vuelven a la cola
+    """
+
+    def __init__(
+        self,
+        flush_fn: FlushFn,
+        journal_path: Optional[Path] = None,
+        max_rows: int = 50,
+        max_delay: float = 5.0
+    ):
+        self.flush_fn = flush_fn
+        self.journal_path = Path(
+            journal_path or os.getenv("SHEETS_JOURNAL_PATH", DEFAULT_JOURNAL_PATH)
+        )
+        self.max_rows = max_rows
+        self.max_delay = max_delay
+        self.pid = os.getpid()
+
+        self._cond = threading.Condition()
+        self._flush_lock = threading.Lock()
+        self._queues: "OrderedDict[str, List[_PendingRow]]" = OrderedDict()
+        self._oldest: Dict[str, float] = {}
+        self._thread: Optional[threading.Thread] = None
+        self._stopped = False
+        self._last_adopt = 0.0
+
+        # Métricas
+        self.flush_count = 0
+        self.flushed_rows = 0
+        self.failed_flushes = 0
+        self.last_flush_latency: Optional[float] = None
+        self.last_flush_rows = 0
+
+        self._init_schema()
+        self._adopt_orphans()
+
+    # ------------------------------------------------------------------
+    # API pública
+    # ------------------------------------------------------------------
+    def enqueue(self, worksheet_name: str, row: List[Any]) -> "Future[None]":
+        """Aceptar una fila: journal primero, después cola en memoria"""
+        future: Future = Future()
+        with self._cond:
+            journal_id = self._journal_insert(worksheet_name, row)
+            self._queues.setdefault(worksheet_name, []).append(_PendingRow(journal_id, row, future))
+            self._oldest.setdefault(worksheet_name, time.monotonic())
+            self._ensure_thread()
+
+            if len(self._queues[worksheet_name]) >= self.max_rows:
+                self._cond.notify()
+        return future
+
+    def flush(self, worksheet_name: Optional[str] = None):
+        """Enviar las filas pendientes (de una worksheet o de todas)"""
+        with self._flush_lock:
+            names = [worksheet_name] if worksheet_name else list(self._queues.keys())
+            for name in names:
+                self._flush_worksheet(name)
+
+    def stop(self):
+        """Detener el thread y hacer un último flush"""
+        with self._cond:
+            self._stopped = True
+            self._cond.notify()
+        if self._thread is not None:
+            self._thread.join(timeout=self.max_delay + 30)
+        self.flush()
+
+    def stats(self) -> Dict[str, Any]:
+        """Profundidad de cola, latencia de flush y filas por flush"""
+        with self._cond:
+            depth = {name: len(rows) for name, rows in self._queues.items()}
+
+        return {
+            "queue_depth": sum(depth.values()),
+            "queue_depth_by_worksheet": depth,
+            "flush_count": self.flush_count,
+            "failed_flushes": self.failed_flushes,
+            "last_flush_latency_ms": round(self.last_flush_latency * 1000, 1) if self.last_flush_latency is not None else None,
+            "last_flush_rows": self.last_flush_rows,
+            "avg_rows_per_flush": round(self.flushed_rows / self.flush_count, 2) if self.flush_count else 0
+        }
+
+    # ------------------------------------------------------------------
+    # Flush
+    # ------------------------------------------------------------------
+    def _flush_worksheet(self, worksheet_name: str):
+        with self._cond:
+            pending = self._queues.pop(worksheet_name, [])
+            self._oldest.pop(worksheet_name, None)
+
+        if not pending:
+            return
+
+        started = time.perf_counter()
+        try:
+            self.flush_fn(worksheet_name, [item.row for item in pending])
+        except Exception as e:
+            self.failed_flushes += 1
+            print(f"[WRITE BUFFER] ❌ Flush {worksheet_name} falló ({len(pending)} filas): {str(e)}")
+            print(traceback.format_exc())
+            self._handle_failure(worksheet_name, pending, e)
+            return
+
+        self.last_flush_latency = time.perf_counter() - started
+        self.last_flush_rows = len(pending)
+        self.flush_count += 1
+        self.flushed_rows += len(pending)
+
+        self._journal_delete([item.journal_id for item in pending])
+        print(f"[WRITE BUFFER] ✅ Flush {worksheet_name}: {len(pending)} filas en {self.last_flush_latency*1000:.0f}ms")
+
+        for item in pending:
+            if item.future is not None:
+                item.future.set_result(None)
+
+    def _handle_failure(self, worksheet_name: str, pending: List[_PendingRow], error: Exception):
+        """Filas con dueño esperando -> se le entregan; filas recuperadas -> de vuelta a la cola"""
+        handed_off = [item for item in pending if item.future is not None]
+        orphans = [item for item in pending if item.future is None]
+
+        if orphans:
+            with self._cond:
+                self._queues[worksheet_name] = orphans + self._queues.get(worksheet_name, [])
+                self._oldest[worksheet_name] = time.monotonic()
+
+        if handed_off:
+            self._journal_delete([item.journal_id for item in handed_off])
+            for item in handed_off:
+                item.future.set_exception(error)
+
+    def _due_worksheets(self) -> List[str]:
+        now = time.monotonic()
+        return [
+            name for name, rows in self._queues.items()
+            if rows and (
+                self._stopped
+                or len(rows) >= self.max_rows
+                or now - self._oldest.get(name, now) >= self.max_delay
+            )
+        ]
+
+    def _run(self):
+        while True:
+            with self._cond:
+                if self._stopped:
+                    return
+                self._cond.wait(timeout=self.max_delay)
+                due = self._due_worksheets()
+
+            for name in due:
+                with self._flush_lock:
+                    self._flush_worksheet(name)
+
+            if time.monotonic() - self._last_adopt >= ADOPT_INTERVAL:
+                self._adopt_orphans()
+
+    def _ensure_thread(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(
+                target=self._run,
+                name="sheets-write-buffer",
+                daemon=True
+            )
+            self._thread.start()
+
+    # ------------------------------------------------------------------
+    # Journal
+    # ------------------------------------------------------------------
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(str(self.journal_path), timeout=30, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=FULL")  # una fila aceptada sobrevive a un corte de luz
+        return conn
+
+    def _init_schema(self):
+        self.journal_path.parent.mkdir(parents=True, exist_ok=True)
+        conn = self._connect()
+        try:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS sheets_journal (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    worksheet TEXT NOT NULL,
+                    row TEXT NOT NULL,
+                    owner_pid INTEGER NOT NULL
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_sheets_journal_owner ON sheets_journal (owner_pid)")
+            self._import_legacy_journal(conn)
+        finally:
+            conn.close()
+
+    def _import_legacy_journal(self, conn: sqlite3.Connection):
+        """Migrar filas del journal JSONL anterior (un solo proceso gana el rename)"""
+        legacy = self.journal_path.with_suffix(".jsonl")
+        importing = legacy.with_suffix(f".jsonl.{self.pid}")
+        try:
+            os.replace(legacy, importing)
+        except FileNotFoundError:
+            return
+
+        rows = []
+        with open(importing, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    # Última línea truncada por un crash a mitad de escritura
+                    continue
+                rows.append((entry["worksheet"], json.dumps(entry["row"], ensure_ascii=False), self.pid))
+        conn.executemany("INSERT INTO sheets_journal (worksheet, row, owner_pid) VALUES (?, ?, ?)", rows)
+        importing.unlink()
+
+    def _journal_insert(self, worksheet_name: str, row: List[Any]) -> int:
+        conn = self._connect()
+        try:
+            cursor = conn.execute(
+                "INSERT INTO sheets_journal (worksheet, row, owner_pid) VALUES (?, ?, ?)",
+                (worksheet_name, json.dumps(row, ensure_ascii=False), self.pid)
+            )
+            return cursor.lastrowid
+        finally:
+            conn.close()
+
+    def _journal_delete(self, journal_ids: List[int]):
+        conn = self._connect()
+        try:
+            conn.executemany("DELETE FROM sheets_journal WHERE id = ?", [(i,) for i in journal_ids])
+        finally:
+            conn.close()
+
+    def _adopt_orphans(self):
+        """Tomar las filas de procesos muertos (ejecución anterior o worker caído)"""
+        # Bajo el lock de flush: una fila a mitad de flush sigue en el journal
+        # pero ya no está en la cola, no hay que adoptarla de nuevo
+        with self._flush_lock:
+            self._adopt_orphans_locked()
+
+    def _adopt_orphans_locked(self):
+        self._last_adopt = time.monotonic()
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            owners = [row[0] for row in conn.execute("SELECT DISTINCT owner_pid FROM sheets_journal")]
+            # Un pid igual al propio es de una ejecución anterior (este proceso recién empieza)
+            dead = [(pid,) for pid in owners if pid != self.pid and not _pid_alive(pid)]
+            conn.executemany("UPDATE sheets_journal SET owner_pid = ? WHERE owner_pid = ?",
+                             [(self.pid, pid) for (pid,) in dead])
+            owned = conn.execute(
+                "SELECT id, worksheet, row FROM sheets_journal WHERE owner_pid = ? ORDER BY id",
+                (self.pid,)
+            ).fetchall()
+            conn.execute("COMMIT")
+        except sqlite3.Error as e:
+            if conn.in_transaction:
+                conn.rollback()
+            print(f"[WRITE BUFFER] ⚠️ No se pudo revisar el journal: {str(e)}")
+            return
+        finally:
+            conn.close()
+
+        # Las filas propias ya encoladas se insertaron y encolaron bajo _cond,
+        # así que después del SELECT están en la cola
+        with self._cond:
+            known = {item.journal_id for rows in self._queues.values() for item in rows}
+            adopted = [entry for entry in owned if entry[0] not in known]
+            if not adopted:
+                return
+            for journal_id, worksheet, row in adopted:
+                self._queues.setdefault(worksheet, []).append(_PendingRow(journal_id, json.loads(row)))
+                self._oldest.setdefault(worksheet, time.monotonic())
+            self._ensure_thread()
+        print(f"[WRITE BUFFER] ♻️ {len(adopted)} filas recuperadas del journal")
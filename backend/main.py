@@ -1,6 +1,14 @@
 from fastapi import FastAPI
+from fastapi.responses import Response
 from fastapi.middleware.cors import CORSMiddleware
-from api.routes import router
+from api.routes import router, outbox, outbox_drainer
+from api.questions_payload import questions_payload
+from core.jobs import pipeline
+from core.metrics import metrics
+from integrations.analytics_store import analytics_store
+from integrations.pdf_pool import pdf_render_pool
+from integrations.pdf_store import pdf_store
+from integrations.sheets_connector import sheets_write_buffer
 
 app = FastAPI(title="AI Readiness API", version="1.0.0")
 
@@ -20,4 +28,35 @@ async def root():
 
 @app.get("/health")
 async def health():
-    return {"status": "ok"}
+    return {
+        "status": "ok",
+        "sheets_write_buffer": sheets_write_buffer.stats(),
+        "outbox_pending": outbox.count_pending()
+    }
+
+@app.get("/metrics")
+async def prometheus_metrics():
+    """Histogramas por etapa, reintentos / fallos y colas en formato Prometheus"""
+    return Response(content=metrics.render(), media_type=metrics.CONTENT_TYPE)
+
+@app.on_event("startup")
+async def startup():
+    # Payload de /api/questions aplanado y comprimido antes del primer request
+    questions_payload.get()
+    # Procesos de render de PDF levantados y precalentados (estilos, fuentes)
+    pdf_render_pool.start()
+    # Reenvío en background de diagnósticos pendientes en el outbox
+    outbox_drainer.start()
+
+@app.on_event("shutdown")
+async def shutdown():
+    outbox_drainer.stop()
+    # Esperar a que terminen los jobs en curso (Sheets, PDF, email)
+    pipeline.shutdown(wait=True)
+    pdf_render_pool.shutdown()
+    # Escrituras a disco de PDFs pendientes
+    pdf_store.shutdown()
+    # Enviar filas pendientes del write buffer antes de salir
+    sheets_write_buffer.stop()
+    # Push final de analytics pendiente del debounce
+    analytics_store.flush()
@@ -0,0 +1,93 @@
+"""
+Test del clasificador matricial (classify_batch)
+Compara contra classify() fila por fila sobre respuestas aleatorias
+"""
+
+import random
+import sys
+from pathlib import Path
+
+# Agregar directorio padre al path
+sys.path.append(str(Path(__file__).parent))
+
+from core.models import ProspectInfo, DiagnosticResponses
+from core.scoring_engine import scoring_engine, SCORED_QUESTIONS, FACTURACION_OPCIONES, EMPLEADOS_OPCIONES
+from core.classifier import archetype_classifier
+
+SECTORES = [
+    "🏦 Banca", "🛡️ Seguros", "🛒 Retail", "🏭 Manufactura",
+    "💼 Servicios Profesionales", "🏥 Salud", "📚 Educación", "🏛️ Gobierno",
+    "🚚 Logística/Transporte", "🏗️ Construcción", "Otro", "Tecnología"
+]
+
+
+def random_row(rng: random.Random) -> dict:
+    """Fila con las columnas del worksheet responses (incluye texto libre)"""
+    row = {
+        field_name: rng.choice(list(scoring_engine.table[question_id].options) + ["Otro: texto libre", ""])
+        for question_id, field_name in SCORED_QUESTIONS.items()
+    }
+    row["equipo_tecnico"] = ""
+    row["capacidad_implementacion"] = ""
+    row["sector"] = rng.choice(SECTORES)
+    row["facturacion_rango"] = rng.choice(FACTURACION_OPCIONES + ("",))
+    row["empleados_rango"] = rng.choice(EMPLEADOS_OPCIONES + ("",))
+
+    motivaciones = rng.sample(list(scoring_engine.motivacion_opciones) + ["Otra motivación"], rng.randint(0, 3))
+    row["motivacion"] = ", ".join(motivaciones) if rng.random() < 0.5 else motivaciones
+    return row
+
+
+def row_inputs(row: dict):
+    """Fila del worksheet -> (DiagnosticResponses, ProspectInfo) como en el flujo escalar"""
+    motivacion = row["motivacion"]
+    if isinstance(motivacion, str):
+        motivacion = [m.strip() for m in motivacion.split(",") if m.strip()]
+
+    prospect_info = ProspectInfo(
+        nombre_empresa="", sector=row["sector"],
+        facturacion_rango=row["facturacion_rango"], empleados_rango=row["empleados_rango"],
+        contacto_nombre="", contacto_email="", contacto_telefono="", cargo="", ciudad=""
+    )
+    responses = DiagnosticResponses(
+        motivacion=motivacion,
+        **{field_name: row[field_name] for field_name in (
+            "toma_decisiones", "procesos_criticos", "tareas_repetitivas",
+            "compartir_informacion", "equipo_tecnico", "capacidad_implementacion",
+            "inversion_reciente", "frustracion_principal", "urgencia",
+            "proceso_aprobacion", "presupuesto_rango"
+        )}
+    )
+    return responses, prospect_info
+
+
+def test_classify_batch_matches_classify(samples: int = 20000, seed: int = 11):
+    """classify_batch debe dar el mismo arquetipo y la misma confianza que classify()"""
+
+    print(f"\n🚀 Comparando classify_batch vs classify en {samples} filas...\n")
+
+    rng = random.Random(seed)
+    rows = [random_row(rng) for _ in range(samples)]
+
+    classifier = archetype_classifier
+    batch = classifier.classify_batch(rows, scoring_engine.score_batch(rows))
+
+    mismatches = 0
+    for i, row in enumerate(rows):
+        responses, prospect_info = row_inputs(row)
+        score = scoring_engine.calculate_full_score(responses, prospect_info)
+        arquetipo = classifier.classify(score, responses, prospect_info)
+
+        if (batch.tipo[i] != arquetipo.tipo or batch.confianza[i] != arquetipo.confianza
+                or batch.margen[i] != arquetipo.margen or batch.ranking(i) != arquetipo.ranking):
+            mismatches += 1
+            if mismatches <= 5:
+                print(f"❌ Fila {i}: batch={batch.ranking(i)} (margen {batch.margen[i]!r}) "
+                      f"vs classify={arquetipo.ranking} (margen {arquetipo.margen!r})")
+
+    assert mismatches == 0, f"{mismatches} filas no coinciden"
+    print(f"✅ {samples} filas idénticas (arquetipo, confianza, margen y ranking)")
+
+
+if __name__ == "__main__":
+    test_classify_batch_matches_classify()
@@ -0,0 +1,127 @@
+"""
+Test + benchmark del motor de reglas de InsightGenerator (data/insight_rules.json)
+- Recarga en caliente al editar el archivo (y rechazo de un JSON inválido)
+- Costo por diagnóstico de quick wins + red flags + insights
+"""
+
+import dataclasses
+import json
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+# Agregar directorio padre al path
+sys.path.append(str(Path(__file__).parent))
+
+from core.models import ProspectInfo, DiagnosticResponses
+from core.scoring_engine import scoring_engine
+from core.classifier import InsightGenerator, archetype_classifier
+from core.insight_rules import InsightRules, DEFAULT_RULES_PATH
+from test_classifier_matrix import random_row
+
+
+def build_case(row: dict):
+    """Score, respuestas, prospecto y arquetipo de una fila aleatoria"""
+    motivacion = row["motivacion"]
+    if isinstance(motivacion, str):
+        motivacion = [m.strip() for m in motivacion.split(",") if m.strip()]
+
+    prospect_info = ProspectInfo(
+        nombre_empresa="", sector=row["sector"],
+        facturacion_rango=row["facturacion_rango"], empleados_rango=row["empleados_rango"],
+        contacto_nombre="", contacto_email="", contacto_telefono="", cargo="", ciudad=""
+    )
+    responses = DiagnosticResponses(
+        motivacion=motivacion,
+        **{field_name: row[field_name] for field_name in (
+            "toma_decisiones", "procesos_criticos", "tareas_repetitivas",
+            "compartir_informacion", "equipo_tecnico", "capacidad_implementacion",
+            "inversion_reciente", "frustracion_principal", "urgencia",
+            "proceso_aprobacion", "presupuesto_rango"
+        )}
+    )
+    score = scoring_engine.calculate_full_score(responses, prospect_info)
+    arquetipo = archetype_classifier.classify(score, responses, prospect_info)
+    return score, responses, prospect_info, arquetipo
+
+
+def bump_mtime(path: Path, seconds: float):
+    """Adelantar el mtime: en filesystems con resolución de segundos una edición puede no cambiarlo"""
+    stat = path.stat()
+    os.utime(path, (stat.st_atime, stat.st_mtime + seconds))
+
+
+def test_hot_reload():
+    """Editar el archivo cambia los resultados sin reiniciar; un JSON roto se ignora"""
+
+    print("\n🚀 Probando recarga en caliente de reglas...\n")
+
+    tmp_dir = Path(tempfile.mkdtemp())
+    try:
+        rules_path = tmp_dir / "insight_rules.json"
+        shutil.copy(DEFAULT_RULES_PATH, rules_path)
+        rules = InsightRules(rules_path, reload_interval=0)
+
+        score, responses, prospect_info, arquetipo = build_case(random_row(random.Random(1)))
+        score.viabilidad_comercial.score_total = 10
+        before = rules.evaluate("insights", score=score, responses=responses, arquetipo=arquetipo)
+        assert before[-1].titulo == "Viabilidad Comercial Cuestionable"
+
+        document = json.loads(rules_path.read_text(encoding="utf-8"))
+        document["insights"]["reglas"][-1]["resultado"]["titulo"] = "Viabilidad Baja (editada)"
+        rules_path.write_text(json.dumps(document, ensure_ascii=False), encoding="utf-8")
+        bump_mtime(rules_path, 10)
+
+        after = rules.evaluate("insights", score=score, responses=responses, arquetipo=arquetipo)
+        assert after[-1].titulo == "Viabilidad Baja (editada)", after[-1].titulo
+        print("✅ Regla editada aplicada sin reiniciar")
+
+        rules_path.write_text("{ no es json", encoding="utf-8")
+        bump_mtime(rules_path, 20)
+        kept = rules.evaluate("insights", score=score, responses=responses, arquetipo=arquetipo)
+        assert kept[-1].titulo == "Viabilidad Baja (editada)"
+        print("✅ JSON inválido ignorado, se mantienen las reglas anteriores")
+
+        rules_path.unlink()
+        kept = rules.evaluate("insights", score=score, responses=responses, arquetipo=arquetipo)
+        assert kept[-1].titulo == "Viabilidad Baja (editada)"
+        print("✅ Archivo borrado ignorado, se mantienen las reglas anteriores")
+
+        # Resultados sin placeholders son instancias compartidas: no se pueden modificar
+        try:
+            kept[-1].titulo = "otro"
+            raise AssertionError("Insight compartido modificable")
+        except dataclasses.FrozenInstanceError:
+            print("✅ Resultados compartidos inmutables")
+    finally:
+        shutil.rmtree(tmp_dir)
+
+
+def test_benchmark(samples: int = 20000, seed: int = 3):
+    """Costo por diagnóstico de generate_quick_wins + generate_red_flags + generate_insights"""
+
+    print(f"\n🚀 Benchmark de reglas en {samples} diagnósticos...\n")
+
+    rng = random.Random(seed)
+    cases = [build_case(random_row(rng)) for _ in range(samples)]
+    generator = InsightGenerator()
+
+    start = time.perf_counter()
+    generated = 0
+    for score, responses, prospect_info, arquetipo in cases:
+        generated += len(generator.generate_quick_wins(score, responses, arquetipo))
+        generated += len(generator.generate_red_flags(score, responses, prospect_info))
+        generated += len(generator.generate_insights(score, responses, arquetipo))
+    elapsed = time.perf_counter() - start
+
+    print(f"✅ {elapsed / samples * 1e6:.1f} µs por diagnóstico "
+          f"({generated / samples:.1f} resultados en promedio)")
+
+
+if __name__ == "__main__":
+    test_hot_reload()
+    test_benchmark()
@@ -0,0 +1,160 @@
+"""
+Test + benchmark de los motores de PDF (canvas fast path vs platypus)
+Verifica que los dos motores dibujen el mismo texto en cada página, el
+fallback a platypus cuando el contenido no entra en el layout fijo y
+compara documentos por segundo de cada motor
+"""
+
+import random
+import sys
+import time
+from collections import defaultdict
+from pathlib import Path
+from typing import Dict, List
+
+from reportlab.pdfgen.textobject import PDFTextObject
+
+# Agregar directorio padre al path
+sys.path.append(str(Path(__file__).parent))
+
+from core.models import ProspectInfo, DiagnosticResponses, DiagnosticResult, Insight
+from core.answer_tables import evaluate_diagnostic
+from core.classifier import InsightGenerator
+from integrations.pdf_generator import PDFGenerator, warm_up
+from test_classifier_matrix import random_row
+
+
+def random_result(rng: random.Random, index: int) -> DiagnosticResult:
+    """DiagnosticResult completo a partir de respuestas aleatorias"""
+    row = random_row(rng)
+    motivacion = row["motivacion"]
+    if isinstance(motivacion, str):
+        motivacion = [m.strip() for m in motivacion.split(",") if m.strip()]
+
+    prospect_info = ProspectInfo(
+        nombre_empresa=f"Empresa {index}",
+        sector=row["sector"],
+        facturacion_rango=row["facturacion_rango"],
+        empleados_rango=row["empleados_rango"],
+        contacto_nombre="Test",
+        contacto_email="test@example.com",
+        contacto_telefono="",
+        cargo="Gerente",
+        ciudad="Bogotá"
+    )
+    responses = DiagnosticResponses(motivacion=motivacion, **{
+        field_name: row[field_name] for field_name in (
+            "toma_decisiones", "procesos_criticos", "tareas_repetitivas", "compartir_informacion",
+            "equipo_tecnico", "capacidad_implementacion", "inversion_reciente", "frustracion_principal",
+            "urgencia", "proceso_aprobacion", "presupuesto_rango"
+        )
+    })
+
+    score, arquetipo, quick_wins = evaluate_diagnostic(responses, prospect_info)
+    insight_gen = InsightGenerator()
+    return DiagnosticResult(
+        prospect_info=prospect_info,
+        responses=responses,
+        score=score,
+        arquetipo=arquetipo,
+        quick_wins=quick_wins,
+        red_flags=insight_gen.generate_red_flags(score, responses, prospect_info),
+        insights=insight_gen.generate_insights(score, responses, arquetipo),
+        servicio_sugerido="Workshop Educativo",
+        monto_sugerido_min=0,
+        monto_sugerido_max=5000000,
+        probabilidad_cierre=insight_gen.estimate_close_probability(score, responses)
+    )
+
+
+def test_canvas_fast_path_and_fallback():
+    """Reporte normal por canvas; overflow o markup vuelven a platypus"""
+    rng = random.Random(7)
+    generator = PDFGenerator(engine="canvas")
+
+    result = random_result(rng, 1)
+    pdf, engine = generator.render_with_engine(result)
+    assert engine == "canvas", engine
+    assert pdf.startswith(b"%PDF") and b"/Count 2" in pdf
+
+    # Demasiadas fortalezas para la página 1 -> platypus pagina el contenido
+    overflow = random_result(rng, 2)
+    overflow.insights = overflow.insights + [
+        Insight("fortaleza", "Fortaleza", "Equipo con experiencia y disposición al cambio " * 6, "")
+        for _ in range(30)
+    ]
+    pdf, engine = generator.render_with_engine(overflow)
+    assert engine == "platypus", engine
+    assert pdf.startswith(b"%PDF") and b"/Count 2" not in pdf
+
+    # Markup (entidades / tags) solo lo interpreta Paragraph
+    markup = random_result(rng, 3)
+    markup.prospect_info.nombre_empresa = "Pérez &amp; Asociados"
+    assert generator.render_with_engine(markup)[1] == "platypus"
+
+    assert PDFGenerator(engine="platypus").render_with_engine(result)[1] == "platypus"
+    print("✅ Fast path por canvas y fallback a platypus")
+
+
+def drawn_text(engine: str, result: DiagnosticResult) -> Dict[int, List[str]]:
+    """Palabras dibujadas por página, en orden (todo texto pasa por PDFTextObject._formatText)"""
+    pages: Dict[int, List[str]] = defaultdict(list)
+    format_text = PDFTextObject._formatText
+
+    def recording(text_object, text):
+        pages[text_object._canvas.getPageNumber()].extend(text.split())
+        return format_text(text_object, text)
+
+    PDFTextObject._formatText = recording
+    try:
+        _, used = PDFGenerator(engine=engine).render_with_engine(result)
+    finally:
+        PDFTextObject._formatText = format_text
+    assert used == engine, (engine, used)
+    return dict(pages)
+
+
+def test_engines_draw_same_text(documents: int = 50):
+    """Mismo diagnóstico por canvas y por platypus: mismas palabras, mismo orden, misma página"""
+    rng = random.Random(11)
+    for index in range(documents):
+        result = random_result(rng, index)
+        platypus = drawn_text("platypus", result)
+        canvas = drawn_text("canvas", result)
+        assert sorted(canvas) == sorted(platypus), (result.diagnostic_id, sorted(canvas), sorted(platypus))
+        for page, words in platypus.items():
+            assert canvas[page] == words, (
+                f"{result.diagnostic_id} página {page}: "
+                f"canvas {canvas[page][:20]}... vs platypus {words[:20]}..."
+            )
+    print(f"✅ {documents} diagnósticos: canvas y platypus dibujan el mismo texto por página")
+
+
+def benchmark_engines(documents: int = 300):
+    """Documentos por segundo de cada motor sobre los mismos diagnósticos"""
+    rng = random.Random(42)
+    results = [random_result(rng, i) for i in range(documents)]
+    warm_up()
+
+    print(f"\n{'Motor':<10} {'docs/s':>10} {'ms/doc':>10} {'KB/doc':>10}")
+    for engine in ("platypus", "canvas"):
+        generator = PDFGenerator(engine=engine)
+        generator.render_with_engine(results[0])  # cachés del motor calientes
+
+        total_bytes = 0
+        start = time.perf_counter()
+        for result in results:
+            pdf, used = generator.render_with_engine(result)
+            total_bytes += len(pdf)
+        elapsed = time.perf_counter() - start
+
+        print(
+            f"{engine:<10} {documents / elapsed:>10.1f} {elapsed / documents * 1000:>10.2f} "
+            f"{total_bytes / documents / 1024:>10.1f}"
+        )
+
+
+if __name__ == "__main__":
+    test_engines_draw_same_text()
+    test_canvas_fast_path_and_fallback()
+    benchmark_engines()
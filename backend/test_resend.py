@@ -20,6 +20,7 @@ from core.models import (
     ViabilidadComercial,
     Tier,
     Arquetipo,
+    ArquetipoDefinicion,
     QuickWin,
     ReunionPrep
 )
@@ -90,15 +91,17 @@ def test_email():
 
         # 4. Crear Arquetipo
         arquetipo = Arquetipo(
-            tipo="ambitious_scaler",
-            nombre="Escalador Ambicioso",
-            descripcion="Empresa en crecimiento con visión clara de AI",
-            frustraciones_tipicas=["Procesos manuales", "Falta de insights"],
-            motivadores=["Eficiencia", "Ventaja competitiva"],
-            objeciones_esperadas=["ROI", "Tiempo de implementación"],
-            enfoque_comercial=["Casos de éxito", "Demo personalizado"],
-            punto_entrada_ideal="Quick wins en 45 días",
-            potencial_expansion="Alto",
+            definicion=ArquetipoDefinicion(
+                tipo="ambitious_scaler",
+                nombre="Escalador Ambicioso",
+                descripcion="Empresa en crecimiento con visión clara de AI",
+                frustraciones_tipicas=("Procesos manuales", "Falta de insights"),
+                motivadores=("Eficiencia", "Ventaja competitiva"),
+                objeciones_esperadas=("ROI", "Tiempo de implementación"),
+                enfoque_comercial=("Casos de éxito", "Demo personalizado"),
+                punto_entrada_ideal="Quick wins en 45 días",
+                potencial_expansion="Alto"
+            ),
             confianza=0.88
         )
 
@@ -149,7 +152,7 @@ def test_email():
         print(f"📤 Enviando email Tier {result.score.tier.value} a {prospect.contacto_email}...\n")
 
         sender = EmailSender()
-        success = sender.send_confirmation_email(result, pdf_path=None)
+        success = sender.send_confirmation_email(result, pdf_content=None)
 
         if success:
             print("\n✅ EMAIL ENVIADO CORRECTAMENTE")
@@ -0,0 +1,72 @@
+"""
+Test del scoring vectorizado (score_batch)
+Compara cada subscore, el tier y la confianza contra calculate_full_score
+fila por fila sobre respuestas aleatorias
+"""
+
+import random
+import sys
+from pathlib import Path
+
+# Agregar directorio padre al path
+sys.path.append(str(Path(__file__).parent))
+
+from core.scoring_engine import scoring_engine
+from test_classifier_matrix import random_row, row_inputs
+
+
+def scalar_fields(responses, prospect_info) -> dict:
+    """Los campos de BatchScores calculados con el flujo escalar"""
+    score = scoring_engine.calculate_full_score(responses, prospect_info)
+    madurez = score.madurez_digital
+    capacidad = score.capacidad_inversion
+    viabilidad = score.viabilidad_comercial
+    return {
+        "decisiones_basadas_datos": madurez.decisiones_basadas_datos,
+        "procesos_estandarizados": madurez.procesos_estandarizados,
+        "sistemas_integrados": madurez.sistemas_integrados,
+        "eficiencia_operativa": madurez.eficiencia_operativa,
+        "presupuesto_disponible": capacidad.presupuesto_disponible,
+        "historial_inversion": capacidad.historial_inversion,
+        "tamano_empresa": capacidad.tamano_empresa,
+        "problema_claro": viabilidad.problema_claro,
+        "urgencia_real": viabilidad.urgencia_real,
+        "poder_decision": viabilidad.poder_decision,
+        "madurez_digital": madurez.score_total,
+        "capacidad_inversion": capacidad.score_total,
+        "viabilidad_comercial": viabilidad.score_total,
+        "bonus_motivacion": scoring_engine.calculate_motivacion_score(responses.motivacion),
+        "score_final": score.score_final,
+        "tier": score.tier.value,
+        "confianza_clasificacion": score.confianza_clasificacion
+    }
+
+
+def test_score_batch_matches_full_score(samples: int = 20000, seed: int = 5):
+    """score_batch debe dar exactamente los mismos subscores, tier y confianza"""
+
+    print(f"\n🚀 Comparando score_batch vs calculate_full_score en {samples} filas...\n")
+
+    rng = random.Random(seed)
+    rows = [random_row(rng) for _ in range(samples)]
+    batch = scoring_engine.score_batch(rows).to_dict()
+
+    mismatches = 0
+    for i, row in enumerate(rows):
+        expected = scalar_fields(*row_inputs(row))
+        diff = {
+            name: (batch[name][i].item(), value)
+            for name, value in expected.items()
+            if batch[name][i].item() != value
+        }
+        if diff:
+            mismatches += 1
+            if mismatches <= 5:
+                print(f"❌ Fila {i}: (batch, escalar) {diff}")
+
+    assert mismatches == 0, f"{mismatches} filas no coinciden"
+    print(f"✅ {samples} filas idénticas ({len(batch)} campos: subscores, totales, tier y confianza)")
+
+
+if __name__ == "__main__":
+    test_score_batch_matches_full_score()
@@ -0,0 +1,303 @@
+"""
+core/close_model.py
+Modelo logístico de probabilidad de cierre entrenado offline
+
+Reemplaza la suma fija de estimate_close_probability (30 + tier +
+urgencia + decisor) por una regresión logística ajustada con NumPy sobre
+los leads que ya tienen resultado conocido (cerrado / no cerrado).
+
+Labels locales: los leads won / lost del outcome store (core/outcome_store.py),
+o un JSONL con una línea por lead con las columnas del worksheet responses
+(sector, facturacion_rango, Q4-Q15...) y "cerrado" (true/false o 1/0).
+
+Entrenamiento (escribe un artefacto versionado en data/close_model/):
+    python -m core.close_model train [outcomes.jsonl]
+
+Al importar se carga la versión más reciente compatible con las
+features actuales; si no hay ninguna se usan las reglas de siempre.
+La inferencia no evalúa exp(): compara el logit contra los cortes
+precalculados de cada porcentaje entero, así predict() y predict_batch()
+dan exactamente el mismo entero.
+"""
+
+import bisect
+import json
+import math
+import os
+import re
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from core.models import DiagnosticScore, DiagnosticResponses
+from core.scoring_engine import scoring_engine
+
+DEFAULT_MODEL_DIR = Path(__file__).parent.parent / "data" / "close_model"
+DEFAULT_OUTCOMES_PATH = Path(__file__).parent.parent / "data" / "close_outcomes.jsonl"
+
+# Formato del artefacto; subirlo si cambia la forma de calcular las features
+MODEL_FORMAT = 1
+
+MIN_TRAINING_SAMPLES = 20
+L2_PENALTY = 1.0
+MAX_NEWTON_STEPS = 50
+
+# Features numéricas normalizadas a 0-1 (columna de BatchScores, máximo)
+NUMERIC_FEATURES = (
+    ("score_final", 100),
+    ("madurez_digital", 40),
+    ("capacidad_inversion", 30),
+    ("viabilidad_comercial", 30)
+)
+
+# Features categóricas one-hot: campo -> pregunta con sus opciones
+CATEGORICAL_FEATURES = {
+    "urgencia": "Q13",
+    "proceso_aprobacion": "Q14"
+}
+
+TIERS = ("A", "B")  # Tier C es la categoría base
+
+
+def feature_names() -> List[str]:
+    """Columnas del modelo, derivadas de questions.json (el artefacto las guarda)"""
+    names = [name for name, _ in NUMERIC_FEATURES]
+    names += [f"tier={tier}" for tier in TIERS]
+    for field_name, question_id in CATEGORICAL_FEATURES.items():
+        names += [f"{field_name}={option}" for option in scoring_engine.table[question_id].options]
+    return names
+
+
+def _percent_cuts() -> List[float]:
+    """Logit a partir del cual round(100 * p) pasa de k a k+1 (k = 0..99)"""
+    return [math.log((k + 0.5) / (100 - k - 0.5)) for k in range(100)]
+
+
+def load_outcomes(path: Optional[Path] = None) -> Tuple[List[Dict[str, Any]], np.ndarray]:
+    """Filas de respuestas y labels (1 = cerrado) desde el JSONL de outcomes"""
+    path = Path(path or os.getenv("CLOSE_OUTCOMES_PATH", DEFAULT_OUTCOMES_PATH))
+    rows: List[Dict[str, Any]] = []
+    labels: List[int] = []
+
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            cerrado = record.pop("cerrado")
+            if isinstance(cerrado, str):
+                cerrado = cerrado.strip().lower() in ("1", "true", "si", "sí", "cerrado")
+            rows.append(record)
+            labels.append(int(bool(cerrado)))
+
+    return rows, np.array(labels, dtype=np.float64)
+
+
+class CloseModel:
+    """Regresión logística cargada en memoria (pesos por feature + intercepto)"""
+
+    def __init__(self, artifact: Dict[str, Any]):
+        self.version = artifact["version"]
+        self.trained_at = artifact["trained_at"]
+        self.features = artifact["features"]
+        self.intercept = artifact["intercept"]
+        self.weights = np.array(artifact["weights"], dtype=np.float64)
+        self.metrics = artifact.get("metrics", {})
+        self.cuts = np.array(_percent_cuts())
+
+        weight_by_name = dict(zip(self.features, artifact["weights"]))
+        self._numeric = [(name, scale, weight_by_name[name]) for name, scale in NUMERIC_FEATURES]
+        self._tier = {tier: weight_by_name[f"tier={tier}"] for tier in TIERS}
+        self._categorical = {
+            field_name: {
+                option: weight_by_name[f"{field_name}={option}"]
+                for option in scoring_engine.table[question_id].options
+            }
+            for field_name, question_id in CATEGORICAL_FEATURES.items()
+        }
+        self._cuts = list(self.cuts)
+
+    # ==================================================
+    # CARGA / ENTRENAMIENTO
+    # ==================================================
+    @classmethod
+    def load(cls, model_dir: Optional[Path] = None) -> Optional["CloseModel"]:
+        """Cargar la versión más reciente compatible; None si no hay modelo"""
+        model_dir = Path(model_dir or os.getenv("CLOSE_MODEL_DIR", DEFAULT_MODEL_DIR))
+        expected = feature_names()
+
+        for version, path in sorted(_artifact_paths(model_dir), reverse=True):
+            with open(path, 'r', encoding='utf-8') as f:
+                artifact = json.load(f)
+
+            if artifact.get("format") != MODEL_FORMAT or artifact.get("features") != expected:
+                print(f"[CLOSE MODEL] ⚠️ {path.name} no coincide con las features actuales, se omite")
+                continue
+
+            print(f"[CLOSE MODEL] ✓ Modelo v{version} cargado ({artifact['trained_at']})")
+            return cls(artifact)
+
+        print(f"[CLOSE MODEL] Sin modelo en {model_dir}, se usan las reglas "
+              f"(entrenar con: python -m core.close_model train)")
+        return None
+
+    @classmethod
+    def train(
+        cls,
+        rows: Sequence[Dict[str, Any]],
+        labels: np.ndarray,
+        model_dir: Optional[Path] = None
+    ) -> "CloseModel":
+        """Ajustar la regresión logística (Newton + L2) y escribir un artefacto versión N+1"""
+        labels = np.asarray(labels, dtype=np.float64)
+        if len(rows) < MIN_TRAINING_SAMPLES:
+            raise ValueError(f"Se necesitan al menos {MIN_TRAINING_SAMPLES} leads con resultado (hay {len(rows)})")
+        if labels.min() == labels.max():
+            raise ValueError("Los outcomes deben incluir leads cerrados y no cerrados")
+
+        X = feature_matrix(rows, scoring_engine.score_batch(rows))
+        intercept, weights = _fit_logistic(X, labels)
+
+        p = 1.0 / (1.0 + np.exp(-(intercept + X @ weights)))
+        eps = 1e-12
+        log_loss = float(-np.mean(labels * np.log(p + eps) + (1 - labels) * np.log(1 - p + eps)))
+
+        model_dir = Path(model_dir or os.getenv("CLOSE_MODEL_DIR", DEFAULT_MODEL_DIR))
+        model_dir.mkdir(parents=True, exist_ok=True)
+        version = max((v for v, _ in _artifact_paths(model_dir)), default=0) + 1
+
+        artifact = {
+            "format": MODEL_FORMAT,
+            "version": version,
+            "trained_at": datetime.now().isoformat(),
+            "features": feature_names(),
+            "intercept": float(intercept),
+            "weights": [float(w) for w in weights],
+            "metrics": {
+                "samples": len(rows),
+                "cerrados": int(labels.sum()),
+                "log_loss": round(log_loss, 4),
+                "brier": round(float(np.mean((p - labels) ** 2)), 4)
+            }
+        }
+        path = model_dir / f"close_model_v{version}.json"
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(artifact, f, ensure_ascii=False, indent=2)
+
+        print(f"[CLOSE MODEL] ✅ v{version} en {path} "
+              f"({len(rows)} leads, log loss {artifact['metrics']['log_loss']})")
+        return cls(artifact)
+
+    # ==================================================
+    # INFERENCIA
+    # ==================================================
+    def logit(self, score: DiagnosticScore, responses: DiagnosticResponses) -> float:
+        """Logit de un lead (mismo orden de suma que predict_batch)"""
+        values = (
+            score.score_final,
+            score.madurez_digital.score_total,
+            score.capacidad_inversion.score_total,
+            score.viabilidad_comercial.score_total
+        )
+        z = self.intercept
+        for value, (_, scale, weight) in zip(values, self._numeric):
+            z += value / scale * weight
+        z += self._tier.get(score.tier.value, 0.0)
+        for field_name, weights in self._categorical.items():
+            z += weights.get(getattr(responses, field_name), 0.0)
+        return z
+
+    def predict(self, score: DiagnosticScore, responses: DiagnosticResponses) -> int:
+        """Probabilidad de cierre 0-100 de un lead"""
+        return bisect.bisect_right(self._cuts, self.logit(score, responses))
+
+    def predict_batch(self, rows: Any, scores: Any = None) -> np.ndarray:
+        """
+        Probabilidad de cierre 0-100 para N leads (re-scoring del pipeline)
+
+        rows: DataFrame o lista de dicts con las columnas del worksheet responses
+        scores: BatchScores de score_batch (se calcula si no se pasa)
+        """
+        if hasattr(rows, "to_dict"):
+            rows = rows.to_dict("records")
+        if scores is None:
+            scores = scoring_engine.score_batch(rows)
+
+        X = feature_matrix(rows, scores)
+        z = np.full(len(X), self.intercept)
+        for j in range(X.shape[1]):
+            z += X[:, j] * self.weights[j]
+        return np.searchsorted(self.cuts, z, side="right")
+
+
+def feature_matrix(rows: Sequence[Dict[str, Any]], scores: Any) -> np.ndarray:
+    """Matriz (N, features) en el orden de feature_names()"""
+    columns = [
+        np.asarray(getattr(scores, name), dtype=np.float64) / scale
+        for name, scale in NUMERIC_FEATURES
+    ]
+    tiers = np.asarray(scores.tier)
+    columns += [(tiers == tier).astype(np.float64) for tier in TIERS]
+
+    for field_name, question_id in CATEGORICAL_FEATURES.items():
+        values = np.array([str(row.get(field_name, "")) for row in rows], dtype=object)
+        columns += [
+            (values == option).astype(np.float64)
+            for option in scoring_engine.table[question_id].options
+        ]
+
+    return np.column_stack(columns)
+
+
+def _fit_logistic(X: np.ndarray, y: np.ndarray) -> Tuple[float, np.ndarray]:
+    """Newton-Raphson con penalización L2 (sin penalizar el intercepto)"""
+    n, k = X.shape
+    Xb = np.column_stack([np.ones(n), X])
+    beta = np.zeros(k + 1)
+    penalty = np.full(k + 1, L2_PENALTY)
+    penalty[0] = 0.0
+
+    for _ in range(MAX_NEWTON_STEPS):
+        p = 1.0 / (1.0 + np.exp(-(Xb @ beta)))
+        gradient = Xb.T @ (p - y) + penalty * beta
+        hessian = (Xb * (p * (1 - p))[:, None]).T @ Xb + np.diag(penalty)
+        step = np.linalg.solve(hessian, gradient)
+        beta -= step
+        if np.max(np.abs(step)) < 1e-8:
+            break
+
+    return float(beta[0]), beta[1:]
+
+
+def _artifact_paths(model_dir: Path) -> List[Tuple[int, Path]]:
+    """(versión, path) de los artefactos close_model_v<N>.json"""
+    if not model_dir.exists():
+        return []
+    found = []
+    for path in model_dir.glob("close_model_v*.json"):
+        match = re.fullmatch(r"close_model_v(\d+)\.json", path.name)
+        if match:
+            found.append((int(match.group(1)), path))
+    return found
+
+
+# Singleton global del proceso (None si no hay modelo entrenado)
+close_model = CloseModel.load()
+
+
+if __name__ == '__main__':
+    import sys
+
+    if len(sys.argv) < 2 or sys.argv[1] != "train":
+        print("Uso: python -m core.close_model train [outcomes.jsonl]")
+        sys.exit(1)
+
+    if len(sys.argv) > 2:
+        rows, labels = load_outcomes(Path(sys.argv[2]))
+    else:
+        # Leads cerrados (won / lost) registrados en el outcome store
+        from core.outcome_store import outcome_store
+        rows, labels = outcome_store.training_set()
+    CloseModel.train(rows, labels)
@@ -0,0 +1,317 @@
+"""
+core/outbox.py
+Outbox transaccional local (SQLite) para diagnósticos pendientes de Sheets
+
+Reemplaza la cola pickle de failed_submissions: cada diagnóstico es una fila
+(append O(1), transaccional, segura con varios writers). El backend FastAPI
+y el formulario Streamlit comparten el mismo archivo apuntando OUTBOX_PATH
+a la misma ruta.
+
+Ciclo de una fila:
+- pending: lista para enviar cuando llegue su next_attempt_at
+- sending: reclamada por un drainer con lease (varios drainers -cada worker
+  de la API y Streamlit- nunca envían la misma fila a la vez; si el drainer
+  muere, la fila vuelve a estar disponible al vencer el lease)
+- sent: ya está en Sheets; el drainer la borra a los
+  OUTBOX_SENT_RETENTION_DAYS días (hasta entonces un enqueue repetido del
+  mismo diagnostic_id se ignora)
+- dead: falló OUTBOX_MAX_ATTEMPTS veces (queda para revisión manual,
+  visible en /metrics)
+
+Los fallos reprograman cada fila con backoff exponencial propio: una fila
+que siempre falla no bloquea a las demás.
+"""
+
+import os
+import pickle
+import sqlite3
+import threading
+import time
+import traceback
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, List, Optional, Tuple
+
+from core.models import DiagnosticResult
+
+DEFAULT_OUTBOX_PATH = Path(__file__).parent.parent / "data" / "outbox.db"
+
+STATUS_PENDING = "pending"
+STATUS_SENDING = "sending"
+STATUS_SENT = "sent"
+STATUS_DEAD = "dead"
+
+OUTBOX_MAX_ATTEMPTS = 12  # con el backoff, ~1 día de fallos continuos
+OUTBOX_LEASE_SECONDS = 300  # un drainer que muere libera sus filas tras este tiempo
+OUTBOX_BACKOFF_BASE = 60.0  # segundos; se duplica por intento
+OUTBOX_BACKOFF_MAX = 6 * 3600.0
+OUTBOX_SENT_RETENTION_DAYS = 7  # filas sent (payload con datos del contacto)
+
+
+class DiagnosticOutbox:
+    """Outbox SQLite con clave primaria diagnostic_id (enqueue idempotente)"""
+
+    def __init__(self, path: Optional[Path] = None, sent_retention_days: Optional[float] = None):
+        self.path = Path(path or os.getenv("OUTBOX_PATH", DEFAULT_OUTBOX_PATH))
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.sent_retention_days = sent_retention_days or float(
+            os.getenv("OUTBOX_SENT_RETENTION_DAYS", OUTBOX_SENT_RETENTION_DAYS)
+        )
+        self._init_schema()
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(str(self.path), timeout=30)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    def _init_schema(self):
+        with self._connect() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS outbox (
+                    diagnostic_id TEXT PRIMARY KEY,
+                    contacto_email TEXT,
+                    payload BLOB NOT NULL,
+                    status TEXT NOT NULL DEFAULT 'pending',
+                    attempts INTEGER NOT NULL DEFAULT 0,
+                    last_error TEXT,
+                    created_at TEXT NOT NULL,
+                    updated_at TEXT NOT NULL,
+                    next_attempt_at REAL NOT NULL DEFAULT 0,
+                    lease_until REAL NOT NULL DEFAULT 0
+                )
+            """)
+            # Outbox creado antes de los reintentos por fila
+            columns = {row[1] for row in conn.execute("PRAGMA table_info(outbox)")}
+            for column in ("next_attempt_at", "lease_until"):
+                if column not in columns:
+                    conn.execute(f"ALTER TABLE outbox ADD COLUMN {column} REAL NOT NULL DEFAULT 0")
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_outbox_status ON outbox (status, created_at)"
+            )
+
+    def enqueue(self, result: DiagnosticResult) -> bool:
+        """
+        Guardar un diagnóstico pendiente
+        Returns: True si se insertó, False si ese diagnostic_id ya estaba
+        """
+        now = datetime.now().isoformat()
+        with self._connect() as conn:
+            cursor = conn.execute(
+                """
+                INSERT OR IGNORE INTO outbox
+                    (diagnostic_id, contacto_email, payload, status, created_at, updated_at)
+                VALUES (?, ?, ?, ?, ?, ?)
+                """,
+                (
+                    result.diagnostic_id,
+                    result.prospect_info.contacto_email,
+                    pickle.dumps(result),
+                    STATUS_PENDING,
+                    now,
+                    now
+                )
+            )
+            inserted = cursor.rowcount == 1
+
+        if inserted:
+            print(f"[OUTBOX] Encolado: {result.diagnostic_id} ({result.prospect_info.nombre_empresa})")
+        return inserted
+
+    def import_legacy_queue(self, queue_path: Path) -> int:
+        """Migrar la cola pickle anterior (failed_submissions.pkl) al outbox"""
+        if not queue_path.exists():
+            return 0
+
+        with open(queue_path, 'rb') as f:
+            legacy = pickle.load(f)
+
+        imported = sum(1 for entry in legacy if self.enqueue(entry['result']))
+        queue_path.rename(queue_path.with_suffix(".pkl.migrated"))
+        print(f"[OUTBOX] ♻️ {imported} diagnósticos migrados desde {queue_path.name}")
+        return imported
+
+    def claim(self, limit: int = 50, lease_seconds: float = OUTBOX_LEASE_SECONDS) -> List[Tuple[str, DiagnosticResult]]:
+        """
+        Reclamar pendientes listos para enviar (los más antiguos primero)
+
+        Las filas pasan a sending con lease: otro drainer no las toma hasta
+        que se marquen o venza el lease (drainer caído a mitad de envío)
+        """
+        now = time.time()
+        conn = self._connect()
+        conn.isolation_level = None  # transacción explícita
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            rows = conn.execute(
+                """
+                SELECT diagnostic_id, payload FROM outbox
+                WHERE (status = ? AND next_attempt_at <= ?) OR (status = ? AND lease_until < ?)
+                ORDER BY created_at LIMIT ?
+                """,
+                (STATUS_PENDING, now, STATUS_SENDING, now, limit)
+            ).fetchall()
+            conn.executemany(
+                "UPDATE outbox SET status = ?, lease_until = ? WHERE diagnostic_id = ?",
+                [(STATUS_SENDING, now + lease_seconds, diagnostic_id) for diagnostic_id, _ in rows]
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            if conn.in_transaction:
+                conn.rollback()
+            raise
+        finally:
+            conn.close()
+
+        return [(diagnostic_id, pickle.loads(payload)) for diagnostic_id, payload in rows]
+
+    def count_pending(self) -> int:
+        with self._connect() as conn:
+            return conn.execute(
+                "SELECT COUNT(*) FROM outbox WHERE status IN (?, ?)", (STATUS_PENDING, STATUS_SENDING)
+            ).fetchone()[0]
+
+    def mark_sent(self, diagnostic_ids: List[str]):
+        now = datetime.now().isoformat()
+        with self._connect() as conn:
+            conn.executemany(
+                "UPDATE outbox SET status = ?, updated_at = ?, last_error = NULL WHERE diagnostic_id = ?",
+                [(STATUS_SENT, now, diagnostic_id) for diagnostic_id in diagnostic_ids]
+            )
+
+    def purge_sent(self) -> int:
+        """Borrar las filas sent más antiguas que la retención; retorna cuántas"""
+        cutoff = datetime.fromtimestamp(time.time() - self.sent_retention_days * 86400).isoformat()
+        with self._connect() as conn:
+            purged = conn.execute(
+                "DELETE FROM outbox WHERE status = ? AND updated_at < ?", (STATUS_SENT, cutoff)
+            ).rowcount
+
+        if purged:
+            print(f"[OUTBOX] ♻️ {purged} filas enviadas purgadas (retención {self.sent_retention_days:g} días)")
+        return purged
+
+    def mark_failed(self, diagnostic_ids: List[str], error: str, max_attempts: int = OUTBOX_MAX_ATTEMPTS):
+        """Reprogramar con backoff exponencial por fila; dead al llegar a max_attempts"""
+        now = datetime.now().isoformat()
+        with self._connect() as conn:
+            for diagnostic_id in diagnostic_ids:
+                row = conn.execute(
+                    "SELECT attempts FROM outbox WHERE diagnostic_id = ?", (diagnostic_id,)
+                ).fetchone()
+                if row is None:
+                    continue
+                attempts = row[0] + 1
+                status = STATUS_DEAD if attempts >= max_attempts else STATUS_PENDING
+                delay = min(OUTBOX_BACKOFF_BASE * 2 ** (attempts - 1), OUTBOX_BACKOFF_MAX)
+                conn.execute(
+                    """
+                    UPDATE outbox SET status = ?, attempts = ?, last_error = ?, updated_at = ?,
+                        next_attempt_at = ?, lease_until = 0
+                    WHERE diagnostic_id = ?
+                    """,
+                    (status, attempts, error[:500], now, time.time() + delay, diagnostic_id)
+                )
+                if status == STATUS_DEAD:
+                    print(f"[OUTBOX] ☠️ {diagnostic_id} descartado tras {attempts} intentos: {error[:200]}")
+
+    def count_dead(self) -> int:
+        with self._connect() as conn:
+            return conn.execute(
+                "SELECT COUNT(*) FROM outbox WHERE status = ?", (STATUS_DEAD,)
+            ).fetchone()[0]
+
+
+class OutboxDrainer:
+    """
+    Thread que reenvía pendientes del outbox a Sheets en lotes
+
+    send_batch(results) debe ser idempotente por diagnostic_id (omitir los
+    que ya están en el sheet) y lanzar excepción si el lote no se guardó.
+    """
+
+    def __init__(
+        self,
+        outbox: DiagnosticOutbox,
+        send_batch: Callable[[List[DiagnosticResult]], None],
+        interval: float = 60.0,
+        batch_size: int = 20
+    ):
+        self.outbox = outbox
+        self.send_batch = send_batch
+        self.interval = interval
+        self.batch_size = batch_size
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="outbox-drainer", daemon=True)
+        self._thread.start()
+        print(f"[OUTBOX] Drainer iniciado (cada {self.interval:.0f}s, lotes de {self.batch_size})")
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self.interval)
+
+    def drain_once(self) -> int:
+        """
+        Enviar pendientes en lotes hasta vaciar. Retorna cuántos se enviaron.
+
+        Si un lote falla se reintenta fila por fila: solo las filas que
+        fallan solas se reprograman (una fila rota no frena al resto). Si
+        todas fallan (Sheets caído) se corta hasta el próximo ciclo.
+        """
+        sent = 0
+        while not self._stop.is_set():
+            batch = self.outbox.claim(limit=self.batch_size)
+            if not batch:
+                break
+
+            diagnostic_ids = [diagnostic_id for diagnostic_id, _ in batch]
+            try:
+                self.send_batch([result for _, result in batch])
+            except Exception as e:
+                print(f"[OUTBOX] ❌ Lote de {len(batch)} falló: {str(e)}")
+                print(traceback.format_exc())
+                if len(batch) == 1:
+                    self.outbox.mark_failed(diagnostic_ids, str(e))
+                    break
+                delivered = self._send_one_by_one(batch)
+                sent += delivered
+                if not delivered:
+                    break
+                continue
+
+            self.outbox.mark_sent(diagnostic_ids)
+            sent += len(batch)
+            print(f"[OUTBOX] ✅ Lote enviado: {len(batch)} diagnósticos")
+
+        return sent
+
+    def _send_one_by_one(self, batch: List[Tuple[str, DiagnosticResult]]) -> int:
+        """Aislar las filas que fallan de un lote rechazado"""
+        delivered = 0
+        for diagnostic_id, result in batch:
+            try:
+                self.send_batch([result])
+            except Exception as e:
+                self.outbox.mark_failed([diagnostic_id], str(e))
+                print(f"[OUTBOX] ❌ {diagnostic_id} falló: {str(e)}")
+                continue
+            self.outbox.mark_sent([diagnostic_id])
+            delivered += 1
+        print(f"[OUTBOX] Lote reintentado fila por fila: {delivered}/{len(batch)} enviados")
+        return delivered
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                self.drain_once()
+                self.outbox.purge_sent()
+            except Exception as e:
+                print(f"[OUTBOX] ⚠️ Error en drainer: {str(e)}")
+            self._stop.wait(self.interval)
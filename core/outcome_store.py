@@ -0,0 +1,367 @@
+"""
+core/outcome_store.py
+Resultados comerciales reales de cada lead (SQLite local)
+
+Cada diagnóstico se registra como lead con su tier, arquetipo y sector.
+Los outcomes (contacted, meeting, proposal, won, lost) se agregan como
+eventos y en la misma transacción actualizan contadores por dimensión,
+así el embudo y las tasas de conversión por tier / arquetipo / sector se
+leen sin recorrer el historial.
+
+Semántica de los contadores:
+- leads: diagnósticos registrados
+- contacted / meeting / proposal: leads que llegaron al menos a esa etapa
+  (un "won" cuenta también como contactado, reunión y propuesta)
+- won / lost: estado final actual (excluyentes; corregir won -> lost mueve el conteo,
+  una etapa del embudo registrada después no lo borra)
+- won_amount: suma del monto de los negocios ganados
+
+El backend FastAPI y el dashboard comparten el archivo: por defecto los
+dos usan data/outcomes.db en la raíz del repo (OUTCOME_STORE_PATH lo
+cambia para ambos).
+"""
+
+import json
+import os
+import sqlite3
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from core.models import DiagnosticResult
+
+# core/ (dashboard) y backend/core/ (API) resuelven la misma ruta por defecto
+_BASE_DIR = Path(__file__).resolve().parent.parent
+if _BASE_DIR.name == "backend":
+    _BASE_DIR = _BASE_DIR.parent
+DEFAULT_OUTCOME_STORE_PATH = _BASE_DIR / "data" / "outcomes.db"
+# Ruta por defecto anterior de la API (backend/data/outcomes.db)
+_LEGACY_OUTCOME_STORE_PATH = Path(__file__).resolve().parent.parent / "data" / "outcomes.db"
+
+# Etapas del embudo en orden; won implica haber pasado por todas
+FUNNEL_STAGES = ("contacted", "meeting", "proposal")
+TERMINAL_STAGES = ("won", "lost")
+OUTCOME_STAGES = FUNNEL_STAGES + TERMINAL_STAGES
+
+# Dimensiones con contadores propios ("all" = total, valor "")
+DIMENSIONS = ("all", "tier", "arquetipo", "sector")
+
+# Campos de DiagnosticResponses guardados con el lead (formato del worksheet responses)
+RESPONSE_FIELDS = (
+    "toma_decisiones", "procesos_criticos", "tareas_repetitivas", "compartir_informacion",
+    "equipo_tecnico", "capacidad_implementacion", "inversion_reciente",
+    "frustracion_principal", "urgencia", "proceso_aprobacion", "presupuesto_rango"
+)
+
+
+class OutcomeStore:
+    """Leads + eventos de outcome + contadores incrementales por dimensión"""
+
+    def __init__(self, path: Optional[Path] = None):
+        self.path = Path(path or os.getenv("OUTCOME_STORE_PATH", DEFAULT_OUTCOME_STORE_PATH))
+        if (
+            self.path == DEFAULT_OUTCOME_STORE_PATH and not self.path.exists()
+            and _LEGACY_OUTCOME_STORE_PATH != self.path and _LEGACY_OUTCOME_STORE_PATH.exists()
+        ):
+            print(
+                f"[OUTCOMES] ⚠️ Existe {_LEGACY_OUTCOME_STORE_PATH} pero el store compartido es {self.path}: "
+                f"moverlo o apuntar OUTCOME_STORE_PATH"
+            )
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._init_schema()
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(str(self.path), timeout=30)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    def _init_schema(self):
+        with self._connect() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS leads (
+                    diagnostic_id TEXT PRIMARY KEY,
+                    tier TEXT NOT NULL,
+                    arquetipo TEXT NOT NULL,
+                    sector TEXT NOT NULL,
+                    furthest_stage INTEGER NOT NULL DEFAULT -1,
+                    outcome TEXT,
+                    monto REAL,
+                    responses TEXT,
+                    created_at TEXT NOT NULL,
+                    updated_at TEXT NOT NULL
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_leads_outcome ON leads (outcome)")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS outcome_events (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    diagnostic_id TEXT NOT NULL,
+                    stage TEXT NOT NULL,
+                    monto REAL,
+                    nota TEXT,
+                    created_at TEXT NOT NULL
+                )
+            """)
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_outcome_events_diagnostic_id "
+                "ON outcome_events (diagnostic_id, id)"
+            )
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS outcome_counters (
+                    dimension TEXT NOT NULL,
+                    value TEXT NOT NULL,
+                    stage TEXT NOT NULL,
+                    count INTEGER NOT NULL DEFAULT 0,
+                    amount REAL NOT NULL DEFAULT 0,
+                    PRIMARY KEY (dimension, value, stage)
+                )
+            """)
+
+    # ------------------------------------------------------------------
+    # Escritura
+    # ------------------------------------------------------------------
+    def register_lead(self, result: DiagnosticResult) -> bool:
+        """
+        Registrar un diagnóstico como lead (idempotente por diagnostic_id)
+        Returns: True si se insertó
+        """
+        responses = {
+            "sector": result.prospect_info.sector,
+            "facturacion_rango": result.prospect_info.facturacion_rango,
+            "empleados_rango": result.prospect_info.empleados_rango,
+            "motivacion": list(result.responses.motivacion),
+            **{field_name: getattr(result.responses, field_name) for field_name in RESPONSE_FIELDS}
+        }
+        return self.register(
+            result.diagnostic_id,
+            tier=result.score.tier.value,
+            arquetipo=result.arquetipo.tipo,
+            sector=result.prospect_info.sector,
+            responses=responses
+        )
+
+    def register(
+        self,
+        diagnostic_id: str,
+        tier: str,
+        arquetipo: str,
+        sector: str,
+        responses: Optional[Dict[str, Any]] = None
+    ) -> bool:
+        """Registrar un lead por sus atributos (leads anteriores al store)"""
+        now = datetime.now().isoformat()
+        with self._connect() as conn:
+            cursor = conn.execute(
+                """
+                INSERT OR IGNORE INTO leads
+                    (diagnostic_id, tier, arquetipo, sector, responses, created_at, updated_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+                """,
+                (
+                    diagnostic_id, tier, arquetipo, sector,
+                    json.dumps(responses, ensure_ascii=False) if responses else None,
+                    now, now
+                )
+            )
+            inserted = cursor.rowcount == 1
+            if inserted:
+                self._apply(conn, (tier, arquetipo, sector), {"leads": (1, 0.0)})
+
+        return inserted
+
+    def record_outcome(
+        self,
+        diagnostic_id: str,
+        stage: str,
+        monto: Optional[float] = None,
+        nota: str = ""
+    ) -> Dict[str, Any]:
+        """
+        Registrar un outcome y actualizar contadores en la misma transacción
+
+        Raises: ValueError si la etapa no existe, KeyError si el lead no está registrado
+        """
+        if stage not in OUTCOME_STAGES:
+            raise ValueError(f"Etapa inválida: {stage} (opciones: {', '.join(OUTCOME_STAGES)})")
+
+        now = datetime.now().isoformat()
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            lead = conn.execute(
+                "SELECT tier, arquetipo, sector, furthest_stage, outcome, monto "
+                "FROM leads WHERE diagnostic_id = ?",
+                (diagnostic_id,)
+            ).fetchone()
+            if lead is None:
+                raise KeyError(diagnostic_id)
+
+            tier, arquetipo, sector, furthest, outcome, monto_actual = lead
+            deltas: Dict[str, Tuple[int, float]] = {}
+
+            # Etapas alcanzadas por primera vez (won implica todo el embudo)
+            if stage == "won":
+                reached = len(FUNNEL_STAGES) - 1
+            elif stage in FUNNEL_STAGES:
+                reached = FUNNEL_STAGES.index(stage)
+            else:
+                reached = furthest
+            for i in range(furthest + 1, reached + 1):
+                deltas[FUNNEL_STAGES[i]] = (1, 0.0)
+            furthest = max(furthest, reached)
+
+            # Estado final: solo lo cambia otra etapa final (sale el anterior, entra el nuevo);
+            # un contacto / reunión posterior a un won no lo borra
+            new_outcome = stage if stage in TERMINAL_STAGES else outcome
+            new_monto = monto if monto is not None else monto_actual
+            if stage in TERMINAL_STAGES:
+                if outcome is not None:
+                    previous_amount = (monto_actual or 0.0) if outcome == "won" else 0.0
+                    deltas[outcome] = (-1, -previous_amount)
+                amount = (new_monto or 0.0) if new_outcome == "won" else 0.0
+                count, total = deltas.get(new_outcome, (0, 0.0))
+                deltas[new_outcome] = (count + 1, total + amount)
+            elif outcome == "won" and new_monto != monto_actual:
+                # Monto corregido sobre un negocio ya ganado
+                deltas["won"] = (0, (new_monto or 0.0) - (monto_actual or 0.0))
+
+            self._apply(conn, (tier, arquetipo, sector), deltas)
+            conn.execute(
+                "UPDATE leads SET furthest_stage = ?, outcome = ?, monto = ?, updated_at = ? "
+                "WHERE diagnostic_id = ?",
+                (furthest, new_outcome, new_monto, now, diagnostic_id)
+            )
+            conn.execute(
+                "INSERT INTO outcome_events (diagnostic_id, stage, monto, nota, created_at) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (diagnostic_id, stage, monto, nota, now)
+            )
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            conn.close()
+
+        print(f"[OUTCOMES] ✅ {diagnostic_id}: {stage}" + (f" (${monto:,.0f})" if monto else ""))
+        return {
+            "diagnostic_id": diagnostic_id,
+            "stage": stage,
+            "etapa_maxima": FUNNEL_STAGES[furthest] if furthest >= 0 else None,
+            "outcome": new_outcome,
+            "monto": new_monto
+        }
+
+    def _apply(
+        self,
+        conn: sqlite3.Connection,
+        values: Tuple[str, str, str],
+        deltas: Dict[str, Tuple[int, float]]
+    ):
+        """Sumar deltas (conteo, monto) a los contadores de todas las dimensiones del lead"""
+        keys = [("all", "")] + list(zip(DIMENSIONS[1:], values))
+        conn.executemany(
+            """
+            INSERT INTO outcome_counters (dimension, value, stage, count, amount)
+            VALUES (?, ?, ?, ?, ?)
+            ON CONFLICT (dimension, value, stage) DO UPDATE SET
+                count = count + excluded.count,
+                amount = amount + excluded.amount
+            """,
+            [
+                (dimension, value, stage, count, amount)
+                for dimension, value in keys
+                for stage, (count, amount) in deltas.items()
+                if count or amount
+            ]
+        )
+
+    # ------------------------------------------------------------------
+    # Lecturas
+    # ------------------------------------------------------------------
+    def funnel(self, dimension: str = "all") -> Dict[str, Dict[str, Any]]:
+        """Embudo por valor de la dimensión (tier, arquetipo, sector o all)"""
+        if dimension not in DIMENSIONS:
+            raise ValueError(f"Dimensión inválida: {dimension} (opciones: {', '.join(DIMENSIONS)})")
+
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT value, stage, count, amount FROM outcome_counters WHERE dimension = ?",
+                (dimension,)
+            ).fetchall()
+
+        funnel: Dict[str, Dict[str, Any]] = {}
+        for value, stage, count, amount in rows:
+            entry = funnel.setdefault(value, {
+                "leads": 0, **{s: 0 for s in OUTCOME_STAGES}, "won_amount": 0.0
+            })
+            entry[stage] = count
+            if stage == "won":
+                entry["won_amount"] = amount
+
+        for entry in funnel.values():
+            closed = entry["won"] + entry["lost"]
+            entry["conversion_rate"] = entry["won"] / entry["leads"] if entry["leads"] else 0.0
+            entry["win_rate"] = entry["won"] / closed if closed else 0.0
+        return funnel
+
+    def conversion_rate(self, dimension: str = "all", value: str = "") -> Optional[float]:
+        """Leads ganados / leads registrados; None si aún no hay outcomes en ese grupo"""
+        entry = self.funnel(dimension).get(value)
+        if not entry or not any(entry[stage] for stage in OUTCOME_STAGES):
+            return None
+        return entry["conversion_rate"]
+
+    def conversion_rate_label(self, dimension: str = "all", value: str = "") -> str:
+        """Tasa de conversión real formateada para la fila de analytics"""
+        rate = self.conversion_rate(dimension, value)
+        return f"{rate * 100:.1f}%" if rate is not None else "Sin outcomes"
+
+    def get_lead(self, diagnostic_id: str) -> Optional[Dict[str, Any]]:
+        """Estado actual del lead y su historial de eventos"""
+        with self._connect() as conn:
+            lead = conn.execute(
+                "SELECT tier, arquetipo, sector, furthest_stage, outcome, monto "
+                "FROM leads WHERE diagnostic_id = ?",
+                (diagnostic_id,)
+            ).fetchone()
+            if lead is None:
+                return None
+            events = conn.execute(
+                "SELECT stage, monto, nota, created_at FROM outcome_events "
+                "WHERE diagnostic_id = ? ORDER BY id",
+                (diagnostic_id,)
+            ).fetchall()
+
+        tier, arquetipo, sector, furthest, outcome, monto = lead
+        return {
+            "diagnostic_id": diagnostic_id,
+            "tier": tier,
+            "arquetipo": arquetipo,
+            "sector": sector,
+            "etapa_maxima": FUNNEL_STAGES[furthest] if furthest >= 0 else None,
+            "outcome": outcome,
+            "monto": monto,
+            "eventos": [
+                {"stage": stage, "monto": m, "nota": nota, "created_at": created_at}
+                for stage, m, nota, created_at in events
+            ]
+        }
+
+    def training_set(self) -> Tuple[List[Dict[str, Any]], List[int]]:
+        """Respuestas y label (1 = won) de los leads cerrados, para core.close_model"""
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT responses, outcome FROM leads "
+                "WHERE outcome IS NOT NULL AND responses IS NOT NULL ORDER BY created_at"
+            ).fetchall()
+
+        return (
+            [json.loads(responses) for responses, _ in rows],
+            [int(outcome == "won") for _, outcome in rows]
+        )
+
+
+# Singleton global del proceso
+outcome_store = OutcomeStore()
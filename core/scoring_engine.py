@@ -1,5 +1,11 @@
 '''core/scoring_engine.py'''
-from typing import Dict, Tuple
+import json
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
 from core.models import (
     DiagnosticResponses,
     MadurezDigital,
@@ -10,126 +16,222 @@ from core.models import (
     Tier
 )
 
+QUESTIONS_PATH = Path(__file__).parent.parent / "data" / "questions.json"
+
+# Preguntas que puntúan -> campo de DiagnosticResponses
+# Los puntos de cada opción viven en questions.json ("puntos", paralelo a "opciones")
+SCORED_QUESTIONS = {
+    "Q5": "toma_decisiones",           # 0-10
+    "Q6": "procesos_criticos",         # 0-10
+    "Q7": "tareas_repetitivas",        # 0-10 (invertido)
+    "Q8": "compartir_informacion",     # 0-10
+    "Q9": "equipo_tecnico",            # 0-10
+    "Q10": "capacidad_implementacion", # 0-15
+    "Q11": "inversion_reciente",       # 0-10
+    "Q12": "frustracion_principal",    # 0-10 ("Otro"/texto libre: puntos_otro)
+    "Q13": "urgencia",                 # 0-10
+    "Q14": "proceso_aprobacion",       # 0-10
+    "Q15": "presupuesto_rango"         # 0-15
+}
+
+# Tamaño empresa por facturación (0-5 puntos) - opciones de ProspectInfo
+FACTURACION_PUNTOS = {
+    "Más de $10,000M COP": 5,
+    "$2,000M - $10,000M COP": 4,
+    "$500M - $2,000M COP": 3,
+    "Menos de $500M COP": 1
+}
+
+# Tamaño empresa por empleados (complementario)
+EMPLEADOS_PUNTOS = {
+    "Más de 500": 5,
+    "201-500": 4,
+    "51-200": 3,
+    "21-50": 2,
+    "1-20": 1
+}
+
+FACTURACION_OPCIONES = tuple(FACTURACION_PUNTOS)
+EMPLEADOS_OPCIONES = tuple(EMPLEADOS_PUNTOS)
+
+# Columnas de la matriz int-coded de score_batch (orden fijo).
+# Cada celda es el índice de la opción elegida (-1 = vacío/texto libre),
+# salvo "motivacion", que es una máscara de bits sobre las opciones de Q4
+# (un bit extra marca motivaciones fuera de las opciones).
+ANSWER_COLUMNS = tuple(SCORED_QUESTIONS.values()) + (
+    "facturacion_rango",
+    "empleados_rango",
+    "motivacion"
+)
 
-class ScoringEngine:
-    """Motor de puntuación del diagnóstico"""
-
-    def __init__(self):
-        # Definir mapeos de respuestas a puntos
-        self._init_scoring_maps()
-
-    def _init_scoring_maps(self):
-        """Inicializar mapeos de respuestas a puntuaciones"""
-
-        # Q5: Toma de decisiones (0-10 puntos)
-        self.decisiones_map = {
-            "Basados en reportes automáticos de sistemas": 10,
-            "Basados en reportes que alguien arma manualmente": 7,
-            "Basados en Excel que alimentamos nosotros": 5,
-            "Basados en intuición y experiencia": 3,
-            "Basados en 'ir preguntando a cada área'": 1
-        }
 
-        # Q6: Procesos críticos (0-10 puntos)
-        self.procesos_map = {
-            "Están documentados y son iguales siempre": 10,
-            "Dependen de quién los ejecute": 5,
-            "Funcionan pero nadie sabe exactamente cómo": 3,
-            "Cambian constantemente según la situación": 1
-        }
+@dataclass(frozen=True)
+class QuestionScoring:
+    """Tabla compilada de una pregunta: índice de opción -> puntos"""
+    question_id: str
+    options: Tuple[str, ...]
+    points: Tuple[int, ...]
+    default: int = 0  # respuesta vacía o fuera de las opciones
+    index: Dict[str, int] = field(default_factory=dict, compare=False, repr=False)
+
+    def option_index(self, answer: Optional[str]) -> int:
+        """Índice de la opción elegida, -1 si no es una opción conocida"""
+        return self.index.get(answer, -1)
+
+    def score(self, answer: Optional[str]) -> int:
+        i = self.index.get(answer)
+        return self.default if i is None else self.points[i]
+
+
+def compile_scoring_table(questions: Dict[str, Any]) -> Dict[str, QuestionScoring]:
+    """
+    Compilar los puntos de questions.json a tablas planas por pregunta
+    Lanza ValueError si alguna pregunta o opción no tiene puntaje
+    """
+    preguntas = {
+        pregunta["id"]: pregunta
+        for bloque in questions.values()
+        for pregunta in bloque.get("preguntas", [])
+    }
+
+    errors = []
+    table = {}
+
+    for question_id in SCORED_QUESTIONS:
+        pregunta = preguntas.get(question_id)
+        if pregunta is None:
+            errors.append(f"{question_id}: no está en questions.json")
+            continue
+
+        options = tuple(pregunta.get("opciones", []))
+        points = pregunta.get("puntos")
+
+        if not isinstance(points, list) or len(points) != len(options):
+            errors.append(
+                f"{question_id}: 'puntos' debe tener un valor por opción "
+                f"({len(options)} opciones)"
+            )
+            continue
+        if not all(isinstance(p, int) and not isinstance(p, bool) for p in points):
+            errors.append(f"{question_id}: 'puntos' debe contener solo enteros")
+            continue
+
+        default = 0
+        if pregunta.get("tiene_otro", False):
+            if not isinstance(pregunta.get("puntos_otro"), int):
+                errors.append(f"{question_id}: tiene_otro requiere 'puntos_otro'")
+                continue
+            default = pregunta["puntos_otro"]
+
+        table[question_id] = QuestionScoring(
+            question_id=question_id,
+            options=options,
+            points=tuple(points),
+            default=default,
+            index={option: i for i, option in enumerate(options)}
+        )
 
-        # Q7: Tareas repetitivas (0-10 puntos) - INVERTIDO
-        self.repetitivas_map = {
-            "Menos del 20% del tiempo": 10,
-            "20-40% del tiempo": 7,
-            "40-60% del tiempo": 4,
-            "Más del 60% del tiempo": 2,
-            "No tengo idea": 0
-        }
+    if errors:
+        raise ValueError("Tabla de scoring inválida:\n  " + "\n  ".join(errors))
 
-        # Q8: Compartir información (0-10 puntos)
-        self.integracion_map = {
-            "Sí, todo está en sistemas conectados": 10,
-            "Más o menos, hay que pedirse cosas por email/WhatsApp": 6,
-            "No, cada área tiene su propia información": 3,
-            "¿Qué información? (Cada uno tiene su Excel)": 1
-        }
+    return table
 
-        # Q9: Equipo técnico (0-10 puntos para inversión)
-        self.equipo_map = {
-            "Sí, equipo completo (5+ personas)": 10,
-            "Sí, pequeño (1-4 personas)": 7,
-            "No, contratamos externos cuando se necesita": 4,
-            "No, yo mismo/mi contador/mi sobrino nos ayuda": 1
-        }
 
-        # Q10: Capacidad implementación (0-15 puntos)
-        self.implementacion_map = {
-            "Tenemos presupuesto y podemos decidir": 15,
-            "Tendríamos que aprobar presupuesto (1-3 meses)": 10,
-            "Tendríamos que planificarlo para próximo año": 5,
-            "No hay presupuesto disponible": 0
-        }
+def load_questions(questions_path: Optional[Path] = None) -> Dict[str, Any]:
+    with open(questions_path or QUESTIONS_PATH, 'r', encoding='utf-8') as f:
+        return json.load(f)
 
-        # Q11: Inversión reciente (0-10 puntos)
-        self.inversion_map = {
-            "Sí, inversiones significativas (>$50M COP)": 10,
-            "Sí, inversiones moderadas ($10-50M COP)": 7,
-            "Sí, inversiones pequeñas (<$10M COP)": 4,
-            "No, seguimos con lo mismo de siempre": 0
-        }
 
-        # Q12: Frustración principal (0-10 puntos para viabilidad)
-        self.frustracion_map = {
-            "No puedo escalar sin contratar más gente": 10,
-            "Perdemos clientes por servicio lento": 10,
-            "Cometemos muchos errores manuales": 9,
-            "No sé qué está pasando en tiempo real": 8,
-            "Los costos operativos están muy altos": 9,
-            "Otro": 5
-        }
+def load_scoring_table(questions_path: Optional[Path] = None) -> Dict[str, QuestionScoring]:
+    return compile_scoring_table(load_questions(questions_path))
 
-        # Q13: Urgencia (0-10 puntos)
-        self.urgencia_map = {
-            "Muy urgente, necesito resolver ya (próximos 3 meses)": 10,
-            "Importante, quiero avanzar este año": 7,
-            "Exploración, sin apuro": 3,
-            "Solo estoy mirando opciones": 1
-        }
 
-        # Q14: Proceso aprobación (0-10 puntos)
-        self.aprobacion_map = {
-            "Nadie, yo decido": 10,
-            "Mi socio(s)": 7,
-            "Junta directiva": 5,
-            "Varias personas (complejo)": 2
-        }
+def motivacion_options(questions: Dict[str, Any]) -> Tuple[str, ...]:
+    """Opciones del multiselect Q4 (orden de bits de la máscara de motivación)"""
+    for bloque in questions.values():
+        for pregunta in bloque.get("preguntas", []):
+            if pregunta["id"] == "Q4":
+                return tuple(pregunta["opciones"])
+    raise ValueError("Tabla de scoring inválida:\n  Q4: no está en questions.json")
 
-        # Q15: Presupuesto (0-15 puntos pero también se usa en tamaño)
-        self.presupuesto_map = {
-            "Más de $60M COP": 15,
-            "$30M - $60M COP": 12,
-            "$10M - $30M COP": 8,
-            "Menos de $10M COP": 3,
-            "Prefiero no decirlo / No lo sé aún": 5
-        }
 
-        # Tamaño empresa por facturación (0-5 puntos)
-        self.facturacion_map = {
-            "Más de $10,000M COP": 5,
-            "$2,000M - $10,000M COP": 4,
-            "$500M - $2,000M COP": 3,
-            "Menos de $500M COP": 1
-        }
+@dataclass
+class BatchScores:
+    """Resultado de score_batch: un array por campo, una posición por fila"""
+    decisiones_basadas_datos: np.ndarray
+    procesos_estandarizados: np.ndarray
+    sistemas_integrados: np.ndarray
+    eficiencia_operativa: np.ndarray
+    presupuesto_disponible: np.ndarray
+    historial_inversion: np.ndarray
+    tamano_empresa: np.ndarray
+    problema_claro: np.ndarray
+    urgencia_real: np.ndarray
+    poder_decision: np.ndarray
+    madurez_digital: np.ndarray
+    capacidad_inversion: np.ndarray
+    viabilidad_comercial: np.ndarray
+    bonus_motivacion: np.ndarray
+    score_final: np.ndarray
+    tier: np.ndarray
+    confianza_clasificacion: np.ndarray
+
+    def __len__(self) -> int:
+        return len(self.score_final)
 
-        # Tamaño empresa por empleados (complementario)
-        self.empleados_map = {
-            "Más de 500": 5,
-            "201-500": 4,
-            "51-200": 3,
-            "21-50": 2,
-            "1-20": 1
+    def to_dict(self) -> Dict[str, np.ndarray]:
+        """Columnas para pd.DataFrame(batch.to_dict())"""
+        return dict(self.__dict__)
+
+
+class ScoringEngine:
+    """
+    Motor de puntuación del diagnóstico
+
+    La tabla se compila una vez desde questions.json; usar la instancia
+    compartida scoring_engine en vez de crear un engine por diagnóstico.
+    """
+
+    def __init__(self, questions_path: Optional[Path] = None):
+        questions = load_questions(questions_path)
+        self.table = compile_scoring_table(questions)
+        self.motivacion_opciones = motivacion_options(questions)
+
+        self.decisiones = self.table["Q5"]
+        self.procesos = self.table["Q6"]
+        self.repetitivas = self.table["Q7"]
+        self.integracion = self.table["Q8"]
+        self.equipo = self.table["Q9"]
+        self.implementacion = self.table["Q10"]
+        self.inversion = self.table["Q11"]
+        self.frustracion = self.table["Q12"]
+        self.urgencia = self.table["Q13"]
+        self.aprobacion = self.table["Q14"]
+        self.presupuesto = self.table["Q15"]
+
+        self._init_batch_tables()
+
+    def _init_batch_tables(self):
+        """
+        Arrays de lookup para score_batch
+
+        Cada tabla lleva el puntaje default al final, así el índice -1
+        (respuesta vacía o texto libre) cae en el default igual que score().
+        La tabla de bonus se genera con calculate_motivacion_score para cada
+        máscara posible, de modo que es idéntica al cálculo escalar.
+        """
+        self._batch_points = {
+            field_name: np.array(self.table[question_id].points + (self.table[question_id].default,))
+            for question_id, field_name in SCORED_QUESTIONS.items()
         }
+        self._batch_points["facturacion_rango"] = np.array(tuple(FACTURACION_PUNTOS.values()) + (0,))
+        self._batch_points["empleados_rango"] = np.array(tuple(EMPLEADOS_PUNTOS.values()) + (0,))
+
+        self.motivacion_otro_bit = 1 << len(self.motivacion_opciones)
+        self._batch_bonus = np.array([
+            self.calculate_motivacion_score(self._decode_motivacion(mask))
+            for mask in range(self.motivacion_otro_bit << 1)
+        ])
 
     def calculate_madurez_digital(
         self,
@@ -137,10 +239,10 @@ class ScoringEngine:
     ) -> MadurezDigital:
         """Calcular score de madurez digital (0-40 puntos)"""
 
-        decisiones = self.decisiones_map.get(responses.toma_decisiones, 0)
-        procesos = self.procesos_map.get(responses.procesos_criticos, 0)
-        integracion = self.integracion_map.get(responses.compartir_informacion, 0)
-        eficiencia = self.repetitivas_map.get(responses.tareas_repetitivas, 0)
+        decisiones = self.decisiones.score(responses.toma_decisiones)
+        procesos = self.procesos.score(responses.procesos_criticos)
+        integracion = self.integracion.score(responses.compartir_informacion)
+        eficiencia = self.repetitivas.score(responses.tareas_repetitivas)
 
         return MadurezDigital(
             decisiones_basadas_datos=decisiones,
@@ -157,12 +259,12 @@ class ScoringEngine:
     ) -> CapacidadInversion:
         """Calcular score de capacidad de inversión (0-30 puntos)"""
 
-        presupuesto = self.presupuesto_map.get(responses.presupuesto_rango, 0)
-        historial = self.inversion_map.get(responses.inversion_reciente, 0)
+        presupuesto = self.presupuesto.score(responses.presupuesto_rango)
+        historial = self.inversion.score(responses.inversion_reciente)
 
         # Tamaño empresa: combinar facturación y empleados
-        tamano_fact = self.facturacion_map.get(prospect_info.facturacion_rango, 0)
-        tamano_emp = self.empleados_map.get(prospect_info.empleados_rango, 0)
+        tamano_fact = FACTURACION_PUNTOS.get(prospect_info.facturacion_rango, 0)
+        tamano_emp = EMPLEADOS_PUNTOS.get(prospect_info.empleados_rango, 0)
         tamano = max(tamano_fact, tamano_emp)  # Tomar el más alto
 
         return CapacidadInversion(
@@ -178,9 +280,9 @@ class ScoringEngine:
     ) -> ViabilidadComercial:
         """Calcular score de viabilidad comercial (0-30 puntos)"""
 
-        problema = self.frustracion_map.get(responses.frustracion_principal, 5)
-        urgencia = self.urgencia_map.get(responses.urgencia, 0)
-        decision = self.aprobacion_map.get(responses.proceso_aprobacion, 0)
+        problema = self.frustracion.score(responses.frustracion_principal)
+        urgencia = self.urgencia.score(responses.urgencia)
+        decision = self.aprobacion.score(responses.proceso_aprobacion)
 
         return ViabilidadComercial(
             problema_claro=problema,
@@ -297,6 +399,137 @@ class ScoringEngine:
 
         return score
 
+    # ==================================================
+    # SCORING BATCH (NumPy)
+    # ==================================================
+    def encode_motivacion(self, motivaciones: Any) -> int:
+        """Lista (o texto separado por comas del worksheet) -> máscara de bits"""
+        if isinstance(motivaciones, str):
+            motivaciones = [m.strip() for m in motivaciones.split(",") if m.strip()]
+        elif not isinstance(motivaciones, (list, tuple)):
+            motivaciones = []
+
+        mask = 0
+        for motivacion in motivaciones:
+            if motivacion in self.motivacion_opciones:
+                mask |= 1 << self.motivacion_opciones.index(motivacion)
+            else:
+                mask |= self.motivacion_otro_bit
+        return mask
+
+    def _decode_motivacion(self, mask: int) -> List[str]:
+        motivaciones = [
+            opcion for i, opcion in enumerate(self.motivacion_opciones)
+            if mask & (1 << i)
+        ]
+        if mask & self.motivacion_otro_bit:
+            motivaciones.append("Otro")
+        return motivaciones
+
+    def encode_answers(self, rows: Any) -> np.ndarray:
+        """
+        Codificar respuestas a la matriz int de score_batch (columnas ANSWER_COLUMNS)
+
+        rows: DataFrame con las columnas del worksheet responses, o lista de dicts
+        """
+        if hasattr(rows, "to_dict"):
+            rows = rows.to_dict("records")
+
+        lookups = [self.table[question_id] for question_id in SCORED_QUESTIONS]
+
+        codes = np.empty((len(rows), len(ANSWER_COLUMNS)), dtype=np.int64)
+        for i, row in enumerate(rows):
+            codes[i, :len(lookups)] = [
+                lookup.option_index(row.get(field_name))
+                for lookup, field_name in zip(lookups, SCORED_QUESTIONS.values())
+            ]
+            codes[i, -3] = _index_or_missing(FACTURACION_OPCIONES, row.get("facturacion_rango"))
+            codes[i, -2] = _index_or_missing(EMPLEADOS_OPCIONES, row.get("empleados_rango"))
+            codes[i, -1] = self.encode_motivacion(row.get("motivacion"))
+
+        return codes
+
+    def score_batch(self, answers: Any) -> BatchScores:
+        """
+        Calcular scores de N diagnósticos con lookups vectorizados
+
+        answers: matriz int (N, len(ANSWER_COLUMNS)) de encode_answers, o
+        DataFrame / lista de dicts con las columnas del worksheet responses.
+        El resultado es idéntico a calculate_full_score fila por fila
+        (la confianza suma los mismos términos en el mismo orden).
+        """
+        if isinstance(answers, np.ndarray) and np.issubdtype(answers.dtype, np.integer):
+            codes = answers
+        else:
+            codes = self.encode_answers(answers)
+
+        if codes.ndim != 2 or codes.shape[1] != len(ANSWER_COLUMNS):
+            raise ValueError(f"Se esperaba una matriz (N, {len(ANSWER_COLUMNS)}), recibido {codes.shape}")
+
+        col = {name: codes[:, i] for i, name in enumerate(ANSWER_COLUMNS)}
+
+        def points(field_name: str) -> np.ndarray:
+            return self._batch_points[field_name][col[field_name]]
+
+        decisiones = points("toma_decisiones")
+        procesos = points("procesos_criticos")
+        integracion = points("compartir_informacion")
+        eficiencia = points("tareas_repetitivas")
+        madurez = decisiones + procesos + integracion + eficiencia
+
+        presupuesto = points("presupuesto_rango")
+        historial = points("inversion_reciente")
+        tamano = np.maximum(points("facturacion_rango"), points("empleados_rango"))
+        capacidad = presupuesto + historial + tamano
+
+        problema = points("frustracion_principal")
+        urgencia = points("urgencia")
+        decision = points("proceso_aprobacion")
+        viabilidad = problema + urgencia + decision
+
+        bonus = self._batch_bonus[col["motivacion"]]
+
+        score_final = np.minimum(100, madurez + capacidad + viabilidad + bonus)
+        tier = np.where(
+            score_final >= 70, Tier.A.value,
+            np.where(score_final >= 40, Tier.B.value, Tier.C.value)
+        )
+
+        # Mismos pasos y orden que calculate_confidence
+        no_sabe_tareas = _option_mask(col["tareas_repetitivas"], self.repetitivas.option_index("No tengo idea"))
+        no_sabe_presupuesto = _option_mask(
+            col["presupuesto_rango"],
+            self.presupuesto.option_index("Prefiero no decirlo / No lo sé aún")
+        )
+
+        confidence = np.full(len(codes), 0.5)
+        confidence = np.where((score_final >= 80) | (score_final <= 30), confidence + 0.2, confidence)
+        confidence = np.where(no_sabe_tareas, confidence - 0.1, confidence)
+        confidence = np.where(no_sabe_presupuesto, confidence - 0.1, confidence)
+        confidence = np.where((madurez >= 30) & (capacidad >= 20), confidence + 0.1, confidence)
+        confidence = np.where((viabilidad >= 20) & (urgencia >= 7), confidence + 0.1, confidence)
+        confidence = np.maximum(0.0, np.minimum(1.0, confidence))
+
+        return BatchScores(
+            decisiones_basadas_datos=decisiones,
+            procesos_estandarizados=procesos,
+            sistemas_integrados=integracion,
+            eficiencia_operativa=eficiencia,
+            presupuesto_disponible=presupuesto,
+            historial_inversion=historial,
+            tamano_empresa=tamano,
+            problema_claro=problema,
+            urgencia_real=urgencia,
+            poder_decision=decision,
+            madurez_digital=madurez,
+            capacidad_inversion=capacidad,
+            viabilidad_comercial=viabilidad,
+            bonus_motivacion=bonus,
+            score_final=score_final,
+            tier=tier,
+            confianza_clasificacion=confidence
+        )
+
     def get_score_breakdown(
         self,
         score: DiagnosticScore
@@ -327,3 +560,18 @@ class ScoringEngine:
                 "decision": score.viabilidad_comercial.poder_decision
             }
         }
+
+
+def _index_or_missing(options: Tuple[str, ...], value: Any) -> int:
+    return options.index(value) if value in options else -1
+
+
+def _option_mask(codes: np.ndarray, option_index: int) -> np.ndarray:
+    """codes == option_index, sin confundir una opción inexistente (-1) con respuestas vacías"""
+    if option_index < 0:
+        return np.zeros(len(codes), dtype=bool)
+    return codes == option_index
+
+
+# Singleton global del proceso (falla al importar si la tabla está incompleta)
+scoring_engine = ScoringEngine()
@@ -121,6 +121,39 @@ export const useDiagnostic = () => {
     }
   };
 
+  // Sheets, PDF y email corren en background: consultar su estado hasta que terminen
+  const pollDiagnosticStatus = async (diagnosticId, maxAttempts = 30, intervalMs = 2000) => {
+    const config = useRuntimeConfig();
+
+    for (let attempt = 0; attempt < maxAttempts; attempt++) {
+      try {
+        const status = await $fetch(
+          `${config.public.apiBase}/diagnostic/${diagnosticId}/status`
+        );
+
+        if (result.value && result.value.diagnostic_id === diagnosticId) {
+          result.value = {
+            ...result.value,
+            success: status.stages.sheets?.status === "success",
+            pdf_generated: status.stages.pdf?.status === "success",
+            email_sent: status.stages.email?.status === "success",
+          };
+        }
+
+        if (status.status === "completed" || status.status === "failed") {
+          console.log("📊 STATUS INTEGRACIONES:", status.stages);
+          return status;
+        }
+      } catch (err) {
+        console.warn("[pollDiagnosticStatus]", err);
+      }
+
+      await new Promise((resolve) => setTimeout(resolve, intervalMs));
+    }
+
+    return null;
+  };
+
   const submitDiagnostic = async () => {
     try {
       loading.value = true;
@@ -164,31 +197,16 @@ export const useDiagnostic = () => {
 
       console.log("✅ RESPUESTA RECIBIDA:", response);
 
-      // ===== LOGS DETALLADOS PARA DEBUG =====
-      console.log("📊 STATUS INTEGRACIONES:", {
-        sheets_success: response.success,
-        diagnostic_id: response.diagnostic_id,
-        email_sent: response.email_sent,
-        pdf_generated: response.pdf_generated,
-        tier: response.tier,
-        score: response.score_total,
-      });
-
-      if (!response.success) {
-        console.warn("⚠️ GOOGLE SHEETS NO GUARDÓ");
-        console.warn("   → Revisar logs del backend para detalles");
-        console.warn("   → El diagnóstico continuó (PDF y resultados OK)");
-      } else {
-        console.log("✅ GUARDADO EN GOOGLE SHEETS EXITOSO");
-      }
-
-      result.value = response;
+      // success/pdf_generated/email_sent se actualizan desde /status
+      result.value = { ...response, success: false };
+      pollDiagnosticStatus(response.diagnostic_id);
     } catch (err) {
       console.error("❌ ERROR EN SUBMIT:", err);
 
-      if (err.status === 429) {
+      // Un reenvío idéntico recibe la respuesta original; 409 = el original aún procesa
+      if (err.status === 409) {
         error.value =
-          "Ya procesamos tu diagnóstico recientemente. Por favor espera 5 minutos.";
+          "Tu diagnóstico se está procesando. Intenta de nuevo en unos segundos.";
       } else {
         error.value = err.data?.detail || "Error al procesar diagnóstico";
       }
@@ -7,7 +7,6 @@ import smtplib
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
 from email.mime.application import MIMEApplication
-from pathlib import Path
 from typing import Optional
 import streamlit as st
 import traceback
@@ -31,9 +30,9 @@ class EmailSender:
     def send_confirmation_email(
         self,
         result: DiagnosticResult,
-        pdf_path: Optional[Path] = None
+        pdf_content: Optional[bytes] = None
     ) -> bool:
-        """Enviar email de confirmación según Tier"""
+        """Enviar email de confirmación según Tier (pdf_content: PDF ya renderizado en memoria)"""
 
         try:
             print(f"[EMAIL START] Enviando a {result.prospect_info.contacto_email} | Tier: {result.score.tier.value}")
@@ -52,16 +51,15 @@ class EmailSender:
             msg['Subject'] = subject
             msg.attach(MIMEText(body, 'html'))
 
-            if pdf_path and pdf_path.exists():
-                with open(pdf_path, 'rb') as f:
-                    pdf_attachment = MIMEApplication(f.read(), _subtype='pdf')
-                    pdf_attachment.add_header(
-                        'Content-Disposition',
-                        'attachment',
-                        filename=f'Diagnostico_AI_{result.prospect_info.nombre_empresa}.pdf'
-                    )
-                    msg.attach(pdf_attachment)
-                print(f"[EMAIL PDF] Adjuntando PDF: {pdf_path}")
+            if pdf_content:
+                pdf_attachment = MIMEApplication(pdf_content, _subtype='pdf')
+                pdf_attachment.add_header(
+                    'Content-Disposition',
+                    'attachment',
+                    filename=f'Diagnostico_AI_{result.prospect_info.nombre_empresa}.pdf'
+                )
+                msg.attach(pdf_attachment)
+                print(f"[EMAIL PDF] Adjuntando PDF ({len(pdf_content)} bytes)")
 
             with smtplib.SMTP(self.smtp_server, self.smtp_port, timeout=30) as server:
                 server.set_debuglevel(1)
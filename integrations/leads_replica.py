@@ -0,0 +1,285 @@
+"""
+Réplica local (SQLite) de los worksheets scores y responses para el dashboard
+
+El dashboard lee de aquí a velocidad de disco local en vez de hacer un
+get_all_records por cada rerun de Streamlit. La sincronización es
+incremental: por worksheet se guarda un cursor con la última fila leída
+y solo se piden a Sheets las filas posteriores (los worksheets son
+append-only). Si cambian los headers se reconstruye la tabla completa.
+
+La preparación de reunión (ReunionPrep) no se calcula al enviar el
+formulario: se genera la primera vez que se abre el lead y queda
+memorizada en la tabla reunion_preps.
+"""
+
+import json
+import os
+import sqlite3
+import threading
+from dataclasses import asdict
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from core.classifier import InsightGenerator
+from core.models import ReunionPrep
+from core.outcome_store import outcome_store
+
+DEFAULT_REPLICA_PATH = Path(__file__).parent.parent / "data" / "leads_replica.db"
+
+REPLICATED_WORKSHEETS = ("scores", "responses")
+
+# Columnas que se copian a columnas propias (indexadas) además del JSON de la fila
+INDEXED_COLUMNS = ("diagnostic_id", "timestamp", "tier", "arquetipo_tipo")
+
+# fetch_rows(worksheet_name, start_row) -> (headers, filas desde start_row)
+FetchRowsFn = Callable[[str, int], Tuple[List[str], List[List[Any]]]]
+
+
+def _to_float(value: Any) -> float:
+    """Convertir valores de Sheets ('45', 45, '45%', '') a float"""
+    try:
+        if isinstance(value, str):
+            value = value.replace("%", "").replace(",", "").strip()
+        return float(value) if value not in (None, "") else 0.0
+    except (TypeError, ValueError):
+        return 0.0
+
+
+class LeadsReplica:
+    """
+    Mirror SQLite de scores/responses con sync incremental por cursor de fila
+
+    - sync(): pide a Sheets solo las filas nuevas de cada worksheet
+    - get_all_diagnostics() / get_analytics_summary(): lecturas locales con
+      el mismo formato que SheetsConnector
+    """
+
+    def __init__(self, path: Optional[Path] = None):
+        self.path = Path(path or os.getenv("LEADS_REPLICA_PATH", DEFAULT_REPLICA_PATH))
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._sync_lock = threading.Lock()
+        self._init_schema()
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(str(self.path), timeout=30)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    def _init_schema(self):
+        with self._connect() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS sync_state (
+                    worksheet TEXT PRIMARY KEY,
+                    next_row INTEGER NOT NULL,
+                    headers TEXT NOT NULL,
+                    synced_at TEXT NOT NULL
+                )
+            """)
+            for worksheet in REPLICATED_WORKSHEETS:
+                conn.execute(f"""
+                    CREATE TABLE IF NOT EXISTS {worksheet} (
+                        row_number INTEGER PRIMARY KEY,
+                        diagnostic_id TEXT,
+                        timestamp TEXT,
+                        tier TEXT,
+                        arquetipo_tipo TEXT,
+                        data TEXT NOT NULL
+                    )
+                """)
+                conn.execute(
+                    f"CREATE INDEX IF NOT EXISTS idx_{worksheet}_diagnostic_id ON {worksheet} (diagnostic_id)"
+                )
+                conn.execute(
+                    f"CREATE INDEX IF NOT EXISTS idx_{worksheet}_tier ON {worksheet} (tier, arquetipo_tipo)"
+                )
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS reunion_preps (
+                    diagnostic_id TEXT PRIMARY KEY,
+                    data TEXT NOT NULL,
+                    created_at TEXT NOT NULL
+                )
+            """)
+
+    # ------------------------------------------------------------------
+    # Sync
+    # ------------------------------------------------------------------
+    def sync(self, fetch_rows: FetchRowsFn) -> Dict[str, int]:
+        """
+        Traer filas nuevas de cada worksheet replicado
+
+        Returns: filas nuevas por worksheet
+        """
+        with self._sync_lock:
+            return {
+                worksheet: self._sync_worksheet(worksheet, fetch_rows)
+                for worksheet in REPLICATED_WORKSHEETS
+            }
+
+    def _sync_worksheet(self, worksheet: str, fetch_rows: FetchRowsFn) -> int:
+        next_row, known_headers = self._get_cursor(worksheet)
+        headers, rows = fetch_rows(worksheet, next_row)
+
+        if known_headers is not None and headers != known_headers:
+            # El worksheet se reescribió (cambio de schema): releer desde la fila 2
+            print(f"[REPLICA] ♻️ Headers de {worksheet} cambiaron, resincronizando completo")
+            next_row = 2
+            headers, rows = fetch_rows(worksheet, next_row)
+            with self._connect() as conn:
+                conn.execute(f"DELETE FROM {worksheet}")
+
+        records = []
+        for offset, row in enumerate(rows):
+            record = dict(zip(headers, row))
+            records.append((
+                next_row + offset,
+                *(str(record.get(column, "")) for column in INDEXED_COLUMNS),
+                json.dumps(record, ensure_ascii=False)
+            ))
+
+        now = datetime.now().isoformat()
+        with self._connect() as conn:
+            conn.executemany(
+                f"INSERT OR REPLACE INTO {worksheet} "
+                f"(row_number, {', '.join(INDEXED_COLUMNS)}, data) VALUES (?, ?, ?, ?, ?, ?)",
+                records
+            )
+            conn.execute(
+                """
+                INSERT OR REPLACE INTO sync_state (worksheet, next_row, headers, synced_at)
+                VALUES (?, ?, ?, ?)
+                """,
+                (worksheet, next_row + len(rows), json.dumps(headers, ensure_ascii=False), now)
+            )
+
+        if records:
+            print(f"[REPLICA] ✅ {worksheet}: {len(records)} filas nuevas")
+        return len(records)
+
+    def _get_cursor(self, worksheet: str) -> Tuple[int, Optional[List[str]]]:
+        """Siguiente fila a leer (1-based, la fila 1 son headers) y headers conocidos"""
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT next_row, headers FROM sync_state WHERE worksheet = ?", (worksheet,)
+            ).fetchone()
+
+        if row is None:
+            return 2, None
+        return row[0], json.loads(row[1])
+
+    def reset(self):
+        """Borrar la réplica: el próximo sync relee todo"""
+        with self._sync_lock, self._connect() as conn:
+            conn.execute("DELETE FROM sync_state")
+            for worksheet in REPLICATED_WORKSHEETS:
+                conn.execute(f"DELETE FROM {worksheet}")
+
+    def last_synced_at(self) -> Optional[datetime]:
+        """Momento del último sync completo (el más antiguo entre worksheets)"""
+        with self._connect() as conn:
+            rows = conn.execute("SELECT synced_at FROM sync_state").fetchall()
+
+        if len(rows) < len(REPLICATED_WORKSHEETS):
+            return None
+        return min(datetime.fromisoformat(synced_at) for (synced_at,) in rows)
+
+    # ------------------------------------------------------------------
+    # Lecturas
+    # ------------------------------------------------------------------
+    def get_all_diagnostics(self, limit: Optional[int] = None) -> List[Dict]:
+        """Filas de scores, las más recientes primero (orden de inserción en Sheets)"""
+        query = "SELECT data FROM scores ORDER BY row_number DESC"
+        params: Tuple = ()
+        if limit:
+            query += " LIMIT ?"
+            params = (limit,)
+
+        with self._connect() as conn:
+            return [json.loads(data) for (data,) in conn.execute(query, params)]
+
+    def get_all_responses(self) -> List[Dict]:
+        """Filas de responses en orden de inserción (para re-scoring en batch)"""
+        with self._connect() as conn:
+            return [json.loads(data) for (data,) in conn.execute(
+                "SELECT data FROM responses ORDER BY row_number"
+            )]
+
+    def get_responses(self, diagnostic_id: str) -> Optional[Dict]:
+        """Respuestas raw de un diagnóstico"""
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT data FROM responses WHERE diagnostic_id = ? ORDER BY row_number DESC LIMIT 1",
+                (diagnostic_id,)
+            ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def get_scores(self, diagnostic_id: str) -> Optional[Dict]:
+        """Fila de scores de un diagnóstico (score y arquetipo guardados al enviar)"""
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT data FROM scores WHERE diagnostic_id = ? ORDER BY row_number DESC LIMIT 1",
+                (diagnostic_id,)
+            ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def get_reunion_prep(self, diagnostic_id: str, regenerate: bool = False) -> Optional[ReunionPrep]:
+        """
+        Preparación de reunión del lead (generada la primera vez que se pide)
+
+        regenerate: rehacer la preparación con las reglas actuales (sobre el
+        score y arquetipo guardados) y reemplazar la memorizada
+        Returns: None si el diagnóstico no está en la réplica
+        """
+        if not regenerate:
+            with self._connect() as conn:
+                row = conn.execute(
+                    "SELECT data FROM reunion_preps WHERE diagnostic_id = ?", (diagnostic_id,)
+                ).fetchone()
+            if row:
+                return ReunionPrep(**json.loads(row[0]))
+
+        responses = self.get_responses(diagnostic_id)
+        scores = self.get_scores(diagnostic_id)
+        if responses is None or scores is None:
+            return None
+
+        prep = InsightGenerator().reunion_prep_from_row(responses, scores)
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO reunion_preps (diagnostic_id, data, created_at) VALUES (?, ?, ?)",
+                (diagnostic_id, json.dumps(asdict(prep), ensure_ascii=False), datetime.now().isoformat())
+            )
+        print(f"[REPLICA] ✅ Preparación de reunión generada para {diagnostic_id}")
+        return prep
+
+    def get_analytics_summary(self) -> Dict:
+        """KPIs calculados sobre la réplica (mismas claves que el worksheet analytics)"""
+        total = 0
+        tier_counts = {"A": 0, "B": 0, "C": 0}
+        score_sum = 0.0
+        prob_cierre_sum = 0.0
+        pipeline_value = 0.0
+
+        for row in self.get_all_diagnostics():
+            prob_cierre = _to_float(row.get("probabilidad_cierre"))
+            total += 1
+            tier = str(row.get("tier", ""))
+            tier_counts[tier] = tier_counts.get(tier, 0) + 1
+            score_sum += _to_float(row.get("score_final"))
+            prob_cierre_sum += prob_cierre
+            pipeline_value += (
+                (_to_float(row.get("monto_min")) + _to_float(row.get("monto_max"))) / 2
+                * (prob_cierre / 100)
+            )
+
+        return {
+            "Total Diagnósticos": total,
+            "Tier A": tier_counts.get("A", 0),
+            "Tier B": tier_counts.get("B", 0),
+            "Tier C": tier_counts.get("C", 0),
+            "Score Promedio": f"{score_sum / total:.1f}" if total else "0",
+            "Prob. Cierre Promedio": f"{prob_cierre_sum / total:.1f}%" if total else "0%",
+            "Pipeline Value Estimado": f"${pipeline_value:,.0f} COP",
+            "Conversion Rate (Tier A)": outcome_store.conversion_rate_label("tier", "A")
+        }
@@ -5,14 +5,24 @@ Autor: Andrés - AI Consultant
 """
 
 import gspread
+from gspread.utils import numericise_all, rowcol_to_a1
 from oauth2client.service_account import ServiceAccountCredentials
 from datetime import datetime
-from typing import Dict, List, Optional, Any
+from typing import Dict, List, Optional, Any, Tuple
 import streamlit as st
 import pandas as pd
+import json
+import threading
 import traceback
 
 from core.models import DiagnosticResult
+from core.sheets_schema import SCHEMA_VERSION, RESPONSES_HEADERS, SCORES_HEADERS, ensure_headers
+from core.outcome_store import outcome_store
+
+
+# (sheet, worksheet) ya validados contra SCHEMA_VERSION en este proceso
+_validated_schemas = set()
+_validated_lock = threading.Lock()
 
 
 class SheetsConnector:
@@ -56,6 +66,20 @@ class SheetsConnector:
             print(f"[WORKSHEET] ✅ Created: {worksheet_name}")
         return worksheet
 
+    def _ensure_schema(self, worksheet: gspread.Worksheet, expected_headers: List[str]):
+        """
+        Validar headers una vez por proceso; si difieren, migrar columnas
+        in-place (core.sheets_schema). Nunca se borra el sheet.
+        """
+        key = (self.sheet_name, worksheet.title, SCHEMA_VERSION)
+        with _validated_lock:
+            if key in _validated_schemas:
+                return
+
+        ensure_headers(worksheet, expected_headers)
+        with _validated_lock:
+            _validated_schemas.add(key)
+
     def _format_timestamp(self, dt: datetime) -> str:
         """
         Formatear timestamp de forma consistente para Google Sheets
@@ -93,6 +117,13 @@ class SheetsConnector:
             print(f"[LIST_TO_STRING ERROR] {e}")
             return str(value) if value else ""
 
+    def _format_ranking(self, arquetipo: Any) -> str:
+        """Ranking de arquetipos como JSON {tipo: puntaje}, de mayor a menor"""
+        return json.dumps(
+            {tipo: round(puntaje, 2) for tipo, puntaje in getattr(arquetipo, 'ranking', ())},
+            ensure_ascii=False
+        )
+
     def save_diagnostic(self, result: DiagnosticResult) -> bool:
         """Guardar resultado completo del diagnóstico"""
 
@@ -136,40 +167,8 @@ class SheetsConnector:
 
         worksheet = self._get_or_create_worksheet("responses")
 
-        # ✅ CORRECCIÓN: Headers alineados con nombres reales del modelo
-        expected_headers = [
-            "timestamp",
-            "diagnostic_id",
-            "nombre_empresa",
-            "sector",
-            "facturacion_rango",      # ✅ CORREGIDO
-            "empleados_rango",        # ✅ CORREGIDO
-            "contacto_nombre",
-            "contacto_email",
-            "contacto_telefono",
-            "cargo",
-            "ciudad",
-            "motivacion",
-            "toma_decisiones",
-            "procesos_criticos",
-            "tareas_repetitivas",
-            "compartir_informacion",
-            "equipo_tecnico",
-            "capacidad_implementacion",
-            "inversion_reciente",
-            "frustracion_principal",
-            "urgencia",
-            "proceso_aprobacion",
-            "presupuesto_rango"
-        ]
-
-        existing_headers = worksheet.row_values(1) if worksheet.row_count > 0 else []
-
-        if not existing_headers or existing_headers != expected_headers:
-            print(f"[RESPONSES] Creando/actualizando headers")
-            worksheet.clear()
-            worksheet.append_row(expected_headers)
-            print(f"[RESPONSES] Headers creados: {len(expected_headers)} columnas")
+        expected_headers = RESPONSES_HEADERS
+        self._ensure_schema(worksheet, expected_headers)
 
         timestamp_str = self._format_timestamp(result.created_at)
         motivacion_str = self._safe_list_to_string(result.responses.motivacion)
@@ -233,57 +232,12 @@ class SheetsConnector:
 
         worksheet = self._get_or_create_worksheet("scores")
 
-        # ✅ CORRECCIÓN: Headers alineados con nombres reales del modelo
-        expected_headers = [
-            "timestamp",
-            "diagnostic_id",
-            "nombre_empresa",
-            "sector",
-            "contacto_nombre",
-            "contacto_email",
-            "contacto_telefono",
-            "cargo",
-            "ciudad",
-            "facturacion_rango",      # ✅ CORREGIDO
-            "empleados_rango",        # ✅ CORREGIDO
-            "score_final",
-            "tier",
-            "confianza_clasificacion",
-            "madurez_digital_total",
-            "madurez_decisiones",
-            "madurez_procesos",
-            "madurez_integracion",
-            "madurez_eficiencia",
-            "capacidad_inversion_total",
-            "capacidad_presupuesto",
-            "capacidad_historial",
-            "capacidad_tamano",
-            "viabilidad_total",
-            "viabilidad_problema",
-            "viabilidad_urgencia",
-            "viabilidad_decision",
-            "arquetipo_tipo",
-            "arquetipo_nombre",
-            "arquetipo_confianza",
-            "servicio_sugerido",
-            "monto_min",
-            "monto_max",
-            "probabilidad_cierre",
-            "quick_wins_count",
-            "red_flags_count"
-        ]
-
-        existing_headers = worksheet.row_values(1) if worksheet.row_count > 0 else []
-
-        if not existing_headers or existing_headers != expected_headers:
-            print(f"[SCORES] Creando/actualizando headers")
-            worksheet.clear()
-            worksheet.append_row(expected_headers)
-            print(f"[SCORES] Headers creados: {len(expected_headers)} columnas")
+        expected_headers = SCORES_HEADERS
+        self._ensure_schema(worksheet, expected_headers)
 
         timestamp_str = self._format_timestamp(result.created_at)
         confianza_clasificacion = getattr(result.score, 'confianza_clasificacion', 0.0)
-        probabilidad_cierre = getattr(result.reunion_prep, 'probabilidad_cierre', 50)
+        probabilidad_cierre = result.probabilidad_cierre
 
         row = [
             timestamp_str,
@@ -321,7 +275,9 @@ class SheetsConnector:
             result.monto_sugerido_max,
             probabilidad_cierre,
             len(result.quick_wins),
-            len(result.red_flags)
+            len(result.red_flags),
+            self._format_ranking(result.arquetipo),
+            round(getattr(result.arquetipo, 'margen', 0.0), 2)
         ]
 
         if len(row) != len(expected_headers):
@@ -381,7 +337,7 @@ class SheetsConnector:
                 ["Score Promedio", f"{score_promedio:.1f}", ""],
                 ["Prob. Cierre Promedio", f"{prob_cierre_promedio:.1f}%", ""],
                 ["Pipeline Value Estimado", f"${pipeline_total:,.0f} COP", ""],
-                ["Conversion Rate (Tier A)", f"{tier_a_count/total_diagnosticos*100:.1f}%" if total_diagnosticos > 0 else "0%", ""]
+                ["Conversion Rate (Tier A)", outcome_store.conversion_rate_label("tier", "A"), ""]
             ]
 
             analytics_ws.clear()
@@ -393,6 +349,33 @@ class SheetsConnector:
             print(f"[ANALYTICS] ⚠️ Error (no crítico): {str(e)}")
             print(traceback.format_exc())
 
+    def save_diagnostics_batch(self, results: List[DiagnosticResult]) -> int:
+        """
+        Replay del outbox: guardar solo los diagnostic_id que aún no están en scores
+
+        Returns: cantidad de diagnósticos nuevos guardados
+        """
+        scores_ws = self._get_or_create_worksheet("scores")
+        responses_ws = self._get_or_create_worksheet("responses")
+        existing_ids = set(scores_ws.col_values(2))  # columna diagnostic_id
+        # Un intento anterior pudo escribir responses y fallar en scores
+        existing_responses = set(responses_ws.col_values(2))
+
+        saved = 0
+        for result in results:
+            if result.diagnostic_id in existing_ids:
+                print(f"[SAVE BATCH] {result.diagnostic_id} ya está en Sheets (omitido)")
+                continue
+            if result.diagnostic_id not in existing_responses:
+                self._save_to_responses(result)
+                existing_responses.add(result.diagnostic_id)
+            self._save_to_scores(result)
+            self._update_analytics()
+            existing_ids.add(result.diagnostic_id)
+            saved += 1
+
+        return saved
+
     def get_all_diagnostics(self, limit: Optional[int] = None) -> List[Dict]:
         """Obtener todos los diagnósticos"""
         try:
@@ -410,6 +393,28 @@ class SheetsConnector:
             print(traceback.format_exc())
             return []
 
+    def get_rows_since(self, worksheet_name: str, start_row: int) -> Tuple[List[str], List[List[Any]]]:
+        """
+        Leer headers y las filas desde start_row (1-based) en una sola llamada
+
+        Returns: (headers, filas) con valores numéricos convertidos igual que
+        get_all_records y cada fila rellenada al largo de los headers
+        """
+        worksheet = self._get_or_create_worksheet(worksheet_name)
+        last_col = rowcol_to_a1(1, worksheet.col_count).rstrip("0123456789")
+
+        header_range, data_range = worksheet.batch_get(
+            ["1:1", f"A{start_row}:{last_col}"]
+        )
+        headers = header_range[0] if header_range else []
+
+        rows = []
+        for row in data_range:
+            row = numericise_all(list(row[:len(headers)]))
+            rows.append(row + [""] * (len(headers) - len(row)))
+
+        return headers, rows
+
     def get_tier_a_diagnostics(self) -> List[Dict]:
         """Obtener solo diagnósticos Tier A"""
         all_data = self.get_all_diagnostics()